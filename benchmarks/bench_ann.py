@@ -0,0 +1,83 @@
+"""
+Nearest-neighbour index benchmark.
+
+Builds an IVF index over an embedding store (or synthetic clustered
+vectors), then reports single-query latency and recall@k against brute
+force for several n_probe values.
+
+Usage:
+    uv run python -m benchmarks.bench_ann --store data/logs_embeddings
+    uv run python -m benchmarks.bench_ann --synthetic 1000000 --dim 256
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from src.ann_index import IVFIndex
+from src.embedding_store import EmbeddingStore
+
+
+def synthetic_vectors(count: int, dim: int, seed: int = 0) -> np.ndarray:
+    """
+    Generate clustered vectors that resemble sentence embeddings.
+
+    Args:
+        count (int): Number of vectors.
+        dim (int): Vector width.
+        seed (int): Random seed.
+
+    Returns:
+        np.ndarray: A float32 matrix.
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(1, count // 400), dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, len(centers), count)]
+    vectors += 0.6 * rng.normal(size=(count, dim)).astype(np.float32)
+    return vectors
+
+
+def main():
+    """
+    Run the index benchmark.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--store", help="embedding store directory to index")
+    source.add_argument("--synthetic", type=int, help="number of synthetic vectors")
+    parser.add_argument("--dim", type=int, default=256, help="synthetic vector width")
+    parser.add_argument("--queries", type=int, default=200, help="queries per measurement")
+    parser.add_argument("-k", type=int, default=10, help="neighbours per query")
+    parser.add_argument("--n-lists", type=int, help="index lists (default: 4 * sqrt(N))")
+    args = parser.parse_args()
+
+    if args.store:
+        vectors = EmbeddingStore.open(args.store).embeddings
+    else:
+        vectors = synthetic_vectors(args.synthetic, args.dim)
+    print(f"Benchmarking IVF index on {len(vectors):,} x {vectors.shape[1]} vectors")
+
+    start = time.perf_counter()
+    index = IVFIndex.build(vectors, n_lists=args.n_lists)
+    print(f"  Build: {time.perf_counter() - start:.1f}s ({index.n_lists} lists)")
+
+    rng = np.random.default_rng(1)
+    queries = np.asarray(vectors[np.sort(rng.choice(len(vectors), args.queries, replace=False))],
+                         dtype=np.float32)
+    queries += 0.1 * rng.normal(size=queries.shape).astype(np.float32)
+
+    for n_probe in (1, 4, 8, 16, 32, index.n_lists):
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            index.search(query[None, :], args.k, n_probe)
+            latencies.append(time.perf_counter() - start)
+        label = "brute force" if n_probe == index.n_lists else f"n_probe={n_probe}"
+        print(f"  {label:<12} p50 {np.percentile(latencies, 50) * 1000:.3f} ms, "
+              f"p99 {np.percentile(latencies, 99) * 1000:.3f} ms, "
+              f"recall@{args.k} {index.recall(queries, args.k, n_probe):.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Parser throughput benchmark.
+
+Compares the str-based parse_bgl_line loop with the bytes-level,
+memory-mapped iter_bgl_records parser on a BGL log, checks that both
+produce the same records, and times load_bgl_data with each engine.
+
+Usage:
+    uv run python -m benchmarks.bench_parser data/BGL.log
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import time
+
+from src.data_loader import iter_bgl_records, load_bgl_data, parse_bgl_line
+
+
+def parse_text(file_path: str) -> list:
+    """
+    Parse a log the original way: text-mode lines through parse_bgl_line.
+
+    Args:
+        file_path (str): Path to the BGL log.
+
+    Returns:
+        list: (label, text) records.
+    """
+    records = []
+    with open(file_path, "r", encoding="utf-8", errors="ignore") as file:
+        for line in file:
+            parsed = parse_bgl_line(line.strip())
+            if parsed:
+                records.append((parsed['label'], parsed['text']))
+    return records
+
+
+def parse_mmap(file_path: str) -> list:
+    """
+    Parse a log with the memory-mapped bytes parser.
+
+    Args:
+        file_path (str): Path to the BGL log.
+
+    Returns:
+        list: (label, content bytes) records.
+    """
+    return list(iter_bgl_records(file_path))
+
+
+def best_time(func, repeat: int):
+    """
+    Run a function several times and keep the fastest run.
+
+    Args:
+        func (callable): The function to time.
+        repeat (int): Number of runs.
+
+    Returns:
+        tuple: (best seconds, result of the last run).
+    """
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    """
+    Run the parser benchmark.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument("log_path", help="BGL-format log file to parse")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement")
+    parser.add_argument("--samples", type=int, default=1000,
+                        help="total_samples for the load_bgl_data timings")
+    args = parser.parse_args()
+
+    size_mb = os.path.getsize(args.log_path) / (1024 * 1024)
+    print(f"Benchmarking parsers on {args.log_path} ({size_mb:.1f} MB)")
+
+    text_time, text_records = best_time(lambda: parse_text(args.log_path), args.repeat)
+    mmap_time, mmap_records = best_time(lambda: parse_mmap(args.log_path), args.repeat)
+
+    identical = text_records == [(label, content.decode("utf-8"))
+                                 for label, content in mmap_records]
+    lines = len(text_records)
+    print(f"  parse_bgl_line:   {text_time:.3f}s ({lines / text_time:,.0f} lines/sec, "
+          f"{size_mb / text_time:.1f} MB/s)")
+    print(f"  iter_bgl_records: {mmap_time:.3f}s ({lines / mmap_time:,.0f} lines/sec, "
+          f"{size_mb / mmap_time:.1f} MB/s)")
+    print(f"  Speedup: {text_time / mmap_time:.2f}x, identical records: {identical}")
+
+    for streaming in (False, True):
+        mode = "streaming" if streaming else "full"
+        for engine in ("text", "mmap"):
+            def run(engine=engine, streaming=streaming):
+                with contextlib.redirect_stdout(io.StringIO()):
+                    return load_bgl_data(args.log_path, args.samples, 0.9, 42,
+                                         streaming=streaming, engine=engine)
+            elapsed, _ = best_time(run, args.repeat)
+            print(f"  load_bgl_data ({mode}, {engine}): {elapsed:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
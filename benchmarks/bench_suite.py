@@ -0,0 +1,297 @@
+"""
+End-to-end benchmark suite.
+
+Runs every pipeline stage on a seeded synthetic BGL log: log generation,
+parse_bgl_line, load_bgl_data, Embedder.generate_embeddings (with a tiny
+local model unless --model is given), Trainer and Reporter. Each stage
+runs in a fresh process, so its peak RSS is its own. Throughput, latency
+percentiles and peak RSS per stage are written to a JSON baseline that a
+later run can be compared against.
+
+Usage:
+    uv run python -m benchmarks.bench_suite --lines 100000 --output baseline.json
+    uv run python -m benchmarks.bench_suite --lines 100000 --compare baseline.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from benchmarks.synthetic_bgl import write_log
+
+# Single-item requests timed for the latency percentiles
+LATENCY_REQUESTS = 200
+# Relative change beyond which a stage counts as regressed
+DEFAULT_THRESHOLD = 0.10
+
+
+def _percentiles(latencies: list) -> dict:
+    """Summarize per-request latencies in milliseconds."""
+    latencies = np.array(latencies) * 1000
+    return {'latency_p50_ms': float(np.percentile(latencies, 50)),
+            'latency_p99_ms': float(np.percentile(latencies, 99))}
+
+
+def stage_generate(workdir: str, options: dict) -> dict:
+    """Write the synthetic log."""
+    start = time.perf_counter()
+    write_log(os.path.join(workdir, "BGL.log"), options['lines'], options['seed'])
+    return {'items': options['lines'], 'seconds': time.perf_counter() - start}
+
+
+def stage_parse(workdir: str, _options: dict) -> dict:
+    """Parse every line with parse_bgl_line."""
+    # pylint: disable-next=import-outside-toplevel
+    from src.data_loader import parse_bgl_line
+
+    start = time.perf_counter()
+    with open(os.path.join(workdir, "BGL.log"), "r", encoding="utf-8") as file:
+        lines = sum(1 for line in file if parse_bgl_line(line.strip()))
+    seconds = time.perf_counter() - start
+    return {'items': lines, 'seconds': seconds}
+
+
+def stage_load(workdir: str, options: dict) -> dict:
+    """Parse, deduplicate and sample the log with load_bgl_data."""
+    # pylint: disable-next=import-outside-toplevel
+    from src.data_loader import load_bgl_data
+
+    start = time.perf_counter()
+    dataset = load_bgl_data(os.path.join(workdir, "BGL.log"), options['samples'], 0.9,
+                            options['seed'], engine=options['engine'])
+    seconds = time.perf_counter() - start
+    with open(os.path.join(workdir, "dataset.json"), "w", encoding="utf-8") as file:
+        json.dump(dataset, file)
+    return {'items': options['lines'], 'seconds': seconds}
+
+
+# pylint: disable-next=too-many-locals
+def stage_embed(workdir: str, options: dict) -> dict:
+    """Embed the sampled dataset and save it as an embedding store."""
+    # pylint: disable=import-outside-toplevel
+    from benchmarks.tiny_model import build_tiny_model, log_texts
+    from src.embedder import Embedder
+    from src.embedding_store import EmbeddingStore
+
+    model = options['model']
+    if model is None:
+        model = os.path.join(workdir, "tiny-model")
+        if not os.path.exists(model):
+            build_tiny_model(model, log_texts(os.path.join(workdir, "BGL.log")))
+    with open(os.path.join(workdir, "dataset.json"), "r", encoding="utf-8") as file:
+        dataset = json.load(file)
+    texts = [sample['text'] for sample in dataset]
+
+    embedder = Embedder(model)
+    start = time.perf_counter()
+    embeddings = embedder.generate_embeddings(texts, batch_size=options['batch_size'])
+    seconds = time.perf_counter() - start
+    EmbeddingStore.save(os.path.join(workdir, "store"), dataset, embeddings)
+
+    latencies = []
+    for text in texts[:LATENCY_REQUESTS]:
+        began = time.perf_counter()
+        embedder.encode_batch([text])
+        latencies.append(time.perf_counter() - began)
+    return {'items': len(texts), 'seconds': seconds, **_percentiles(latencies)}
+
+
+def stage_train(workdir: str, _options: dict) -> dict:
+    """Train and evaluate Logistic Regression and the SVM."""
+    # pylint: disable=import-outside-toplevel
+    from src.embedding_store import EmbeddingStore
+    from src.trainer import Trainer
+
+    start = time.perf_counter()
+    trainer = Trainer(EmbeddingStore.open(os.path.join(workdir, "store")))
+    trainer.train_logistic_regression()
+    trainer.train_svm()
+    results = trainer.evaluate()
+    seconds = time.perf_counter() - start
+    with open(os.path.join(workdir, "results.json"), "w", encoding="utf-8") as file:
+        json.dump(results, file)
+
+    model = trainer.models['logistic_regression']
+    latencies = []
+    for row in trainer.x_test[:LATENCY_REQUESTS]:
+        began = time.perf_counter()
+        model.predict(row[None, :])
+        latencies.append(time.perf_counter() - began)
+    return {'items': len(trainer.x_train), 'seconds': seconds, **_percentiles(latencies)}
+
+
+def stage_report(workdir: str, _options: dict) -> dict:
+    """Render the PDF report."""
+    # pylint: disable-next=import-outside-toplevel
+    from src.reporter import Reporter
+
+    with open(os.path.join(workdir, "results.json"), "r", encoding="utf-8") as file:
+        results = json.load(file)
+    start = time.perf_counter()
+    Reporter(os.path.join(workdir, "report.pdf")).generate_report(results)
+    return {'items': len(results), 'seconds': time.perf_counter() - start}
+
+
+STAGES = {
+    'generate': stage_generate,
+    'parse_bgl_line': stage_parse,
+    'load_bgl_data': stage_load,
+    'embed': stage_embed,
+    'train': stage_train,
+    'report': stage_report,
+}
+
+
+def _run_stage(name: str, workdir: str, options: dict) -> dict:
+    """Process pool entry point: run one stage quietly, keeping the fastest run."""
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        result = min((STAGES[name](workdir, options) for _ in range(options['repeat'])),
+                     key=lambda run: run['seconds'])
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    result['peak_rss_mb'] = peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    result['items_per_sec'] = result['items'] / max(result['seconds'], 1e-9)
+    return result
+
+
+def run_suite(workdir: str, options: dict, stages: list) -> dict:
+    """
+    Run benchmark stages, each in a fresh process.
+
+    Args:
+        workdir (str): Directory for the log, dataset, store and report.
+        options (dict): lines, samples, seed, engine, model, batch_size and
+            repeat (runs per stage, the fastest is kept).
+        stages (list): Stage names to run, in pipeline order.
+
+    Returns:
+        dict: Measurements per stage.
+    """
+    os.makedirs(workdir, exist_ok=True)
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    for name in stages:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            results[name] = executor.submit(_run_stage, name, workdir, options).result()
+        stage = results[name]
+        latency = (f", p50 {stage['latency_p50_ms']:.2f}ms p99 {stage['latency_p99_ms']:.2f}ms"
+                   if 'latency_p50_ms' in stage else "")
+        print(f"  {name:<15} {stage['seconds']:>8.2f}s {stage['items_per_sec']:>12,.0f} items/s "
+              f"{stage['peak_rss_mb']:>8.0f} MB peak{latency}")
+    return results
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    """
+    Compare stage measurements against a baseline.
+
+    Args:
+        current (dict): Stage measurements of this run.
+        baseline (dict): Stage measurements of the baseline run.
+        threshold (float): Relative change that counts as a regression.
+
+    Returns:
+        list: Names of the stages whose throughput dropped, or whose
+            latency or peak RSS grew, by more than the threshold.
+    """
+    regressions = []
+    print(f"Comparison against baseline (threshold {threshold:.0%}):")
+    for name, stage in current.items():
+        if name not in baseline:
+            continue
+        old = baseline[name]
+        changes = {
+            'throughput': stage['items_per_sec'] / old['items_per_sec'] - 1,
+            'peak RSS': stage['peak_rss_mb'] / old['peak_rss_mb'] - 1,
+        }
+        if 'latency_p50_ms' in stage and 'latency_p50_ms' in old:
+            changes['p50 latency'] = stage['latency_p50_ms'] / old['latency_p50_ms'] - 1
+        regressed = (changes['throughput'] < -threshold or
+                     any(change > threshold for key, change in changes.items()
+                         if key != 'throughput'))
+        if regressed:
+            regressions.append(name)
+        summary = ", ".join(f"{key} {change:+.1%}" for key, change in changes.items())
+        print(f"  {name:<15} {summary}{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def _commit() -> str:
+    """Return the current git commit, or an empty string outside a checkout."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def main():
+    """
+    Run the benchmark suite.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument("--lines", type=int, default=100000,
+                        help="synthetic log lines (1e4 to 1e7)")
+    parser.add_argument("--samples", type=int, default=2000, help="total_samples to embed")
+    parser.add_argument("--seed", type=int, default=42, help="random seed")
+    parser.add_argument("--engine", default="mmap", help="load_bgl_data parse engine")
+    parser.add_argument("--model", help="embedding model (default: a tiny local model)")
+    parser.add_argument("--batch-size", type=int, default=64, help="embedding batch size")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="runs per stage; the fastest is kept")
+    parser.add_argument("--stages", default=",".join(STAGES),
+                        help="comma-separated stages to run, in order")
+    parser.add_argument("--workdir", default="output/benchmarks/work",
+                        help="directory for intermediate files")
+    parser.add_argument("--output", default="output/benchmarks/latest.json",
+                        help="JSON file to write the measurements to")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="relative change reported as a regression")
+    args = parser.parse_args()
+
+    stages = args.stages.split(",")
+    unknown = [name for name in stages if name not in STAGES]
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(unknown)}")
+
+    options = {'lines': args.lines, 'samples': args.samples, 'seed': args.seed,
+               'engine': args.engine, 'model': args.model, 'batch_size': args.batch_size,
+               'repeat': args.repeat}
+    print(f"Benchmarking {len(stages)} stages on {args.lines:,} synthetic lines")
+    report = {
+        'commit': _commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'machine': {'python': platform.python_version(), 'platform': platform.platform(),
+                    'cpus': os.cpu_count()},
+        'options': options,
+        'stages': run_suite(args.workdir, options, stages),
+    }
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+    print(f"Measurements saved to {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+        if baseline.get('options') != options:
+            print("Warning: the baseline was recorded with different options")
+        if compare(report['stages'], baseline['stages'], args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
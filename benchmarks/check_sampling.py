@@ -0,0 +1,108 @@
+"""
+Sampling regression check.
+
+Writes a small BGL log in which one text appears as a normal line early
+on and later as an alert next to another alert text, then checks that
+load_bgl_data returns the same samples for every worker count and parse
+engine, in full and in streaming mode. A text keeps the label of its
+first occurrence in both modes, so the only alert that can be sampled is
+the second one.
+
+Usage:
+    uv run python -m benchmarks.check_sampling
+"""
+
+import argparse
+import contextlib
+import io
+import itertools
+import os
+import sys
+import tempfile
+
+from src.data_loader import PARSE_ENGINES, load_bgl_data, seeded_digest
+
+LOG_LINE = ("{label} 1117838571 2005.06.03 R34-M1-N3-C:J00-U07 2005-06-03-22.42.51.556501 "
+            "R34-M1-N3-C:J00-U07 RAS KERNEL INFO {text}\n")
+# Normal lines before and after the alerts, so that with several workers
+# the two alerts fall in the same part, after the part of the first line
+FILLER_BEFORE = 225
+FILLER_AFTER = 175
+WORKER_COUNTS = (1, 2, 4)
+
+
+def write_cross_label_log(path: str, seed: int) -> str:
+    """
+    Write the cross-label log.
+
+    The text seen first as a normal line has the smaller priority, so a
+    part reservoir with room for one alert keeps it over the other alert.
+
+    Args:
+        path (str): The file to write.
+        seed (int): The sampling seed the priorities are computed with.
+
+    Returns:
+        str: The alert text that should be sampled.
+    """
+    shared, other = sorted(("msg 3", "msg 4"), key=lambda text: seeded_digest(text.encode(), seed))
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(LOG_LINE.format(label="-", text=shared))
+        for i in range(FILLER_BEFORE):
+            file.write(LOG_LINE.format(label="-", text=f"filler {i}"))
+        file.write(LOG_LINE.format(label="KERNDTLB", text=shared))
+        file.write(LOG_LINE.format(label="KERNDTLB", text=other))
+        for i in range(FILLER_BEFORE, FILLER_BEFORE + FILLER_AFTER):
+            file.write(LOG_LINE.format(label="-", text=f"filler {i}"))
+    return other
+
+
+def load_samples(path: str, seed: int, **options) -> list:
+    """
+    Sample the log quietly.
+
+    Args:
+        path (str): The log file.
+        seed (int): Random seed.
+        **options: Keyword arguments for load_bgl_data.
+
+    Returns:
+        list: Sorted (label, text) pairs of the samples.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        dataset = load_bgl_data(path, 10, 0.9, seed, **options)
+    return sorted((sample['label'], sample['text']) for sample in dataset)
+
+
+def main():
+    """
+    Run the sampling regression check.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument("--seed", type=int, default=42, help="sampling seed")
+    args = parser.parse_args()
+
+    failures = 0
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "BGL.log")
+        expected = write_cross_label_log(path, args.seed)
+        for streaming, engine in itertools.product((False, True), PARSE_ENGINES):
+            mode = "streaming" if streaming else "full"
+            results = {workers: load_samples(path, args.seed, streaming=streaming,
+                                             workers=workers, engine=engine)
+                       for workers in WORKER_COUNTS}
+            for workers, samples in results.items():
+                alerts = [text for label, text in samples if label]
+                ok = samples == results[1] and alerts == [expected]
+                failures += not ok
+                print(f"  {mode} ({engine}, {workers} workers): alerts {alerts} "
+                      f"{'ok' if ok else 'MISMATCH'}")
+
+    if failures:
+        print(f"{failures} sampling mismatches")
+        sys.exit(1)
+    print("Samples match for every worker count in both modes")
+
+
+if __name__ == "__main__":
+    main()
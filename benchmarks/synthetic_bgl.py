@@ -0,0 +1,177 @@
+"""
+Synthetic BGL log generator.
+
+Writes seeded BGL-format logs with the real field layout (label, epoch
+timestamp, date, node, timestamp, node, type, component, level and
+message) and roughly the real label mix: about 7.3% alert lines spread
+over the most common BGL alert categories. Messages are drawn from
+templates with variable fields, so deduplication and template mining see
+realistic repetition.
+
+Usage:
+    uv run python -m benchmarks.synthetic_bgl data/synthetic.log --lines 1000000
+"""
+
+import argparse
+import os
+
+import numpy as np
+
+# Share of alert lines in the real BGL log (348,460 of 4,747,963)
+ANOMALY_RATIO = 0.0734
+# Lines generated per vectorized chunk
+CHUNK_LINES = 100000
+FIRST_EPOCH = 1117838570
+
+# (component, level, message template, weight) of non-alert lines
+NORMAL_TEMPLATES = (
+    ("KERNEL", "INFO", "instruction cache parity error corrected", 0.30),
+    ("KERNEL", "INFO", "{i} ddr error(s) detected and corrected on rank 0, symbol {i}, bit {i}",
+     0.15),
+    ("KERNEL", "INFO", "total of {i} ddr error(s) detected and corrected", 0.12),
+    ("KERNEL", "INFO", "CE sym {i}, at 0x{h}, mask 0x{h}", 0.12),
+    ("KERNEL", "INFO", "generating core.{i}", 0.10),
+    ("APP", "INFO", "ciod: generated {i} core files for program /bgl/apps/run{i}/a.out", 0.06),
+    ("KERNEL", "INFO", "{i} floating point alignment exceptions", 0.05),
+    ("MMCS", "INFO", "idoproxydb hit ASSERT condition: ASSERT expression=0 Source file="
+                     "idotransportmgr.cpp Source line={i} Function=int IdoTransportMgr::"
+                     "SendPacket(IdoUdpMgr*, BglCtlPcktHeader*)", 0.04),
+    ("KERNEL", "WARNING", "critical input interrupt (unit=0x0b bit=0x{h}): warning for torus "
+                          "z- wire", 0.03),
+    ("DISCOVERY", "SEVERE", "Node card is not fully functional", 0.03),
+)
+
+# (label, component, level, message template, weight) of alert lines
+ANOMALY_TEMPLATES = (
+    ("KERNDTLB", "KERNEL", "FATAL", "data TLB error interrupt", 0.437),
+    ("KERNSTOR", "KERNEL", "FATAL", "data storage interrupt", 0.181),
+    ("APPSEV", "APP", "FATAL", "ciod: Error reading message prefix after LOGIN_MESSAGE on "
+                               "CioStream socket to 172.16.{i}.{i}:{i}", 0.141),
+    ("KERNMNTF", "KERNEL", "FATAL", "Lustre mount FAILED : bglio{i} : block_id : location",
+     0.089),
+    ("KERNTERM", "KERNEL", "FATAL", "rts: kernel terminated for reason {i}", 0.057),
+    ("KERNREC", "KERNEL", "FATAL", "Error receiving packet on tree network, expecting type {i} "
+                                   "instead of type {i} (softheader={h} {h} {h} {h})", 0.030),
+    ("APPREAD", "APP", "FATAL", "ciod: failed to read message prefix on control stream "
+                                "(CioStream socket to 172.16.{i}.{i}:{i}", 0.017),
+    ("KERNRTSP", "KERNEL", "FATAL", "rts panic! - stopping execution", 0.011),
+    ("APPCHILD", "APP", "FATAL", "ciod: Error creating node map from file /p/gb{i}/map{i}", 0.010),
+    ("KERNPOW", "KERNEL", "FATAL", "Power deactivated: R{i}-M{i}", 0.009),
+    ("MONILL", "MONITOR", "FAILURE", "monitor caught java.lang.IllegalStateException: while "
+                                     "executing query", 0.008),
+    ("KERNSOCK", "KERNEL", "FATAL", "MailboxMonitor::serviceMailboxes() lib_ido_error: -1019 "
+                                    "socket closed", 0.010),
+)
+
+
+def _weights(templates) -> np.ndarray:
+    weights = np.array([template[-1] for template in templates])
+    return weights / weights.sum()
+
+
+def _compile(template: str) -> str:
+    """Turn {i}/{h} placeholders into positional format fields."""
+    parts = template.split("{")
+    compiled = [parts[0]]
+    for position, part in enumerate(parts[1:]):
+        spec = ":08x" if part[0] == "h" else ""
+        compiled.append(f"{{{position}{spec}}}{part[2:]}")
+    return "".join(compiled)
+
+
+# pylint: disable-next=too-many-locals
+def generate_lines(lines: int, seed: int = 0, anomaly_ratio: float = ANOMALY_RATIO):
+    """
+    Generate synthetic BGL log lines.
+
+    Args:
+        lines (int): Number of lines.
+        seed (int): Random seed; the same seed always gives the same log.
+        anomaly_ratio (float): Share of alert lines.
+
+    Yields:
+        str: One log line per iteration, without the newline.
+    """
+    rng = np.random.default_rng(seed)
+    normal = [(component, level, _compile(template))
+              for component, level, template, _ in NORMAL_TEMPLATES]
+    anomalies = [(label, component, level, _compile(template))
+                 for label, component, level, template, _ in ANOMALY_TEMPLATES]
+    fields = max(template.count("{") for *_, template, _ in NORMAL_TEMPLATES + ANOMALY_TEMPLATES)
+    micros = FIRST_EPOCH * 1_000_000
+
+    for start in range(0, lines, CHUNK_LINES):
+        count = min(CHUNK_LINES, lines - start)
+        is_anomaly = (rng.random(count) < anomaly_ratio).tolist()
+        normal_choice = rng.choice(len(normal), count, p=_weights(NORMAL_TEMPLATES)).tolist()
+        anomaly_choice = rng.choice(len(anomalies), count,
+                                    p=_weights(ANOMALY_TEMPLATES)).tolist()
+        values = rng.integers(0, 256, size=(count, fields)).tolist()
+        nodes = rng.integers(0, [64, 2, 16, 18, 12], size=(count, 5)).tolist()
+
+        stamps = micros + np.cumsum(rng.integers(1, 4_000_000, count))
+        micros = int(stamps[-1])
+        epochs = (stamps // 1_000_000).tolist()
+        # 'YYYY-MM-DDTHH:MM:SS.ffffff'
+        iso = np.datetime_as_string(stamps.astype("datetime64[us]")).tolist()
+
+        for i in range(count):
+            rack, midplane, card, jack, unit = nodes[i]
+            node = f"R{rack:02d}-M{midplane}-N{card:X}-C:J{jack:02d}-U{unit:02d}"
+            if is_anomaly[i]:
+                label, component, level, template = anomalies[anomaly_choice[i]]
+            else:
+                component, level, template = normal[normal_choice[i]]
+                label = "-"
+            stamp = iso[i]
+            date = stamp[:10]
+            yield (f"{label} {epochs[i]} {date.replace('-', '.')} {node} "
+                   f"{date}-{stamp[11:13]}.{stamp[14:16]}.{stamp[17:]} {node} RAS "
+                   f"{component} {level} {template.format(*values[i])}")
+
+
+def write_log(path: str, lines: int, seed: int = 0, anomaly_ratio: float = ANOMALY_RATIO) -> str:
+    """
+    Write a synthetic BGL log file.
+
+    Args:
+        path (str): The file to write.
+        lines (int): Number of lines.
+        seed (int): Random seed.
+        anomaly_ratio (float): Share of alert lines.
+
+    Returns:
+        str: The path of the written log.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as file:
+        buffer = []
+        for line in generate_lines(lines, seed, anomaly_ratio):
+            buffer.append(line)
+            if len(buffer) >= CHUNK_LINES:
+                file.write("\n".join(buffer) + "\n")
+                buffer = []
+        if buffer:
+            file.write("\n".join(buffer) + "\n")
+    return path
+
+
+def main():
+    """
+    Write a synthetic BGL log.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument("path", help="log file to write")
+    parser.add_argument("--lines", type=int, default=100000, help="number of lines")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument("--anomaly-ratio", type=float, default=ANOMALY_RATIO,
+                        help="share of alert lines")
+    args = parser.parse_args()
+
+    write_log(args.path, args.lines, args.seed, args.anomaly_ratio)
+    size_mb = os.path.getsize(args.path) / (1024 * 1024)
+    print(f"Wrote {args.lines:,} lines ({size_mb:.1f} MB) to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Tiny local embedding model.
+
+Builds a small, randomly initialized BERT sentence encoder with a word-level
+vocabulary learned from a log file and saves it as a SentenceTransformer
+directory. Embedder loads it by path, so benchmarks exercise the real
+tokenize/forward/pooling code path without downloading anything. Its
+embeddings are meaningless; only its cost profile matters.
+
+Usage:
+    uv run python -m benchmarks.tiny_model output/benchmarks/tiny-model data/synthetic.log
+"""
+
+import argparse
+import itertools
+import os
+
+from src.data_loader import parse_bgl_line
+
+SPECIAL_TOKENS = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"]
+MAX_SEQ_LENGTH = 128
+# Log lines read to learn the vocabulary
+VOCAB_LINES = 100000
+
+
+# pylint: disable-next=too-many-arguments,too-many-positional-arguments,too-many-locals
+def build_tiny_model(
+    path: str,
+    texts,
+    dim: int = 64,
+    layers: int = 2,
+    vocab_size: int = 8000,
+    seed: int = 0
+) -> str:
+    """
+    Build and save a tiny sentence encoder.
+
+    Args:
+        path (str): The model directory to write.
+        texts (iterable): Texts to learn the word-level vocabulary from.
+        dim (int): Hidden and embedding width.
+        layers (int): Number of transformer layers.
+        vocab_size (int): Maximum vocabulary size.
+        seed (int): Seed for the random weights.
+
+    Returns:
+        str: The model directory, loadable with Embedder(path).
+    """
+    # pylint: disable=import-outside-toplevel
+    import torch
+    from sentence_transformers import SentenceTransformer, models
+    from tokenizers import Tokenizer, pre_tokenizers, processors
+    from tokenizers.models import WordLevel
+    from tokenizers.trainers import WordLevelTrainer
+    from transformers import BertConfig, BertModel, PreTrainedTokenizerFast
+
+    tokenizer = Tokenizer(WordLevel(unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = pre_tokenizers.Whitespace()
+    tokenizer.train_from_iterator(
+        texts, WordLevelTrainer(vocab_size=vocab_size, special_tokens=SPECIAL_TOKENS)
+    )
+    tokenizer.post_processor = processors.TemplateProcessing(
+        single="[CLS] $A [SEP]",
+        special_tokens=[(token, tokenizer.token_to_id(token)) for token in ("[CLS]", "[SEP]")]
+    )
+
+    encoder_dir = os.path.join(path, "encoder")
+    PreTrainedTokenizerFast(
+        tokenizer_object=tokenizer, model_max_length=MAX_SEQ_LENGTH,
+        pad_token="[PAD]", unk_token="[UNK]", cls_token="[CLS]", sep_token="[SEP]",
+        mask_token="[MASK]"
+    ).save_pretrained(encoder_dir)
+
+    torch.manual_seed(seed)
+    BertModel(BertConfig(
+        vocab_size=tokenizer.get_vocab_size(), hidden_size=dim, num_hidden_layers=layers,
+        num_attention_heads=max(dim // 32, 1), intermediate_size=dim * 4,
+        max_position_embeddings=MAX_SEQ_LENGTH
+    )).save_pretrained(encoder_dir)
+
+    transformer = models.Transformer(encoder_dir, max_seq_length=MAX_SEQ_LENGTH)
+    pooling = models.Pooling(dim, pooling_mode="mean")
+    SentenceTransformer(modules=[transformer, pooling], device="cpu").save(path)
+    return path
+
+
+def log_texts(log_path: str, limit: int = VOCAB_LINES):
+    """
+    Read message texts from a BGL log.
+
+    Args:
+        log_path (str): The BGL-format log.
+        limit (int): Maximum number of lines to read.
+
+    Yields:
+        str: The message of each parsable line.
+    """
+    with open(log_path, "r", encoding="utf-8", errors="ignore") as file:
+        for line in itertools.islice(file, limit):
+            parsed = parse_bgl_line(line.strip())
+            if parsed:
+                yield parsed['text']
+
+
+def main():
+    """
+    Build the tiny model from a log file.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument("path", help="model directory to write")
+    parser.add_argument("log_path", help="BGL-format log to learn the vocabulary from")
+    parser.add_argument("--dim", type=int, default=64, help="embedding width")
+    parser.add_argument("--layers", type=int, default=2, help="transformer layers")
+    args = parser.parse_args()
+
+    build_tiny_model(args.path, log_texts(args.log_path), dim=args.dim, layers=args.layers)
+    print(f"Saved tiny embedding model to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,101 +4,440 @@ Main entry point for the sysadmin log classifier POC.
 
 from __future__ import annotations
 
+import argparse
+import contextlib
 import json
 import os
+import sys
+import time
 from typing import TYPE_CHECKING
 
+from src import profiling
 from src.config import load_config
-from src.downloader import download_bgl
-from src.data_loader import load_bgl_data
+from src.stage_cache import StageCache
 
 if TYPE_CHECKING:
-    from src.embedder import Embedder
+    from src.compression import Compressor
+    from src.embedding_store import EmbeddingStore
     from src.trainer import Trainer
-    from src.reporter import Reporter
+
+# Config keys whose values change each stage's output; settings that only
+# affect speed (workers, batch sizes, the ingestion pipeline) are left out
+STAGE_CONFIG_KEYS = {
+    'parse': ('dataset_url', 'data', 'sampling', 'embedding.by_template'),
+    'embed': ('embedding_model', 'embedding.by_template', 'embedding.store_dtype',
+              'embedding.backend', 'embedding.precision', 'embedding.max_seq_length', 'ann'),
+    'features': ('features.windows', 'features.columns_path', 'features.path'),
+    'train': ('classifiers', 'training', 'compression', 'sampling.seed', 'artifact', 'features'),
+    'report': ('report',),
+}
 
 
 def get_embeddings_path(config: dict) -> str:
     """
-    Get the path to the embeddings file.
+    Get the path to the embedding store directory.
+
+    Args:
+        config (dict): The configuration dictionary.
+
+    Returns:
+        str: The path to the embedding store.
+    """
+    return config['data']['output_path'].replace(".json", "_embeddings")
+
+
+def get_legacy_embeddings_path(config: dict) -> str:
+    """
+    Get the path to the legacy JSON file with embeddings.
 
     Args:
         config (dict): The configuration dictionary.
 
     Returns:
-        str: The path to the JSON file with embeddings.
+        str: The path to the legacy JSON file with embeddings.
     """
     return config['data']['output_path'].replace(".json", "_with_embeddings.json")
 
 
+def get_embedder_options(config: dict) -> dict:
+    """
+    Get the Embedder settings that change the embeddings.
+
+    Args:
+        config (dict): The configuration dictionary.
+
+    Returns:
+        dict: The backend, precision and max_seq_length.
+    """
+    embedding_config = config.get('embedding', {})
+    return {
+        'backend': embedding_config.get('backend', 'torch'),
+        'precision': embedding_config.get('precision', 'fp32'),
+        'max_seq_length': embedding_config.get('max_seq_length'),
+    }
+
+
+def get_embedding_variant(options: dict) -> str:
+    """
+    Describe Embedder settings that differ from the reference model.
+
+    Args:
+        options (dict): Settings from get_embedder_options.
+
+    Returns:
+        str: e.g. 'backend=onnx,precision=int8', or an empty string for the
+            PyTorch fp32 model at its own token limit, so stores and caches
+            built before these settings existed stay valid.
+    """
+    defaults = {'backend': 'torch', 'precision': 'fp32', 'max_seq_length': None}
+    return ",".join(f"{key}={value}" for key, value in options.items()
+                    if value != defaults.get(key))
+
+
+def load_embedder(config: dict, model_name: str = None, options: dict = None):
+    """
+    Load an Embedder with the configured backend, threads and export directory.
+
+    Args:
+        config (dict): The configuration dictionary.
+        model_name (str): The model to load (default: embedding_model).
+        options (dict): Settings from get_embedder_options, e.g. those an
+            artifact was trained with (default: the configured ones).
+
+    Returns:
+        Embedder: The loaded embedder.
+    """
+    from src.embedder import Embedder
+
+    embedding_config = config.get('embedding', {})
+    return Embedder(
+        model_name or config['embedding_model'],
+        **(get_embedder_options(config) if options is None else options),
+        threads=embedding_config.get('threads'),
+        export_dir=embedding_config.get('export_dir', 'data/onnx_models')
+    )
+
+
+def encode_texts(config: dict, texts: list):
+    """
+    Load the configured embedding model and encode texts with it.
+
+    Args:
+        config (dict): The configuration dictionary.
+        texts (list): The texts to encode.
+
+    Returns:
+        np.ndarray: A float32 matrix with one embedding per text.
+    """
+    embedding_config = config.get('embedding', {})
+    batch_size = embedding_config.get('batch_size', 1)
+    max_batch_tokens = embedding_config.get('max_batch_tokens')
+
+    workers = embedding_config.get('workers', 1)
+    if workers > 1:
+        from src.sharded_embedder import embed_sharded
+
+        return embed_sharded(
+            texts, config['embedding_model'],
+            shard_dir=embedding_config.get('shard_dir', 'data/embedding_shards'),
+            workers=workers,
+            threads_per_worker=embedding_config.get('threads_per_worker'),
+            shard_size=embedding_config.get('shard_size', 10000),
+            batch_size=max(batch_size, 1), max_batch_tokens=max_batch_tokens,
+            embedder_options=get_embedder_options(config),
+            export_dir=embedding_config.get('export_dir', 'data/onnx_models')
+        )
+
+    embedder = load_embedder(config)
+
+    parity_samples = embedding_config.get('parity_check_samples', 0)
+    if parity_samples and batch_size > 1:
+        embedder.check_batch_parity(texts[:parity_samples], batch_size, max_batch_tokens)
+    backend_samples = embedding_config.get('backend_check_samples', 0)
+    if backend_samples and get_embedding_variant(get_embedder_options(config)):
+        embedder.check_backend_parity(load_embedder(config, options={}), texts[:backend_samples],
+                                      max(batch_size, 1), max_batch_tokens)
+
+    return embedder.generate_embeddings(
+        texts, batch_size=batch_size, max_batch_tokens=max_batch_tokens
+    )
+
+
+def embed_pipelined(config: dict, dataset: list, texts: list, cache, writer) -> EmbeddingStore:
+    """
+    Embed texts and write the store with the concurrent ingestion pipeline.
+
+    Args:
+        config (dict): The configuration dictionary.
+        dataset (list): The list of parsed log dictionaries.
+        texts (list): The text to embed for each sample.
+        cache (EmbeddingCache): The embedding cache, or None.
+        writer (EmbeddingStoreWriter): The store to fill.
+
+    Returns:
+        EmbeddingStore: The written store.
+    """
+    from src.pipeline import IngestPipeline
+
+    embedding_config = config.get('embedding', {})
+    pipeline = IngestPipeline(
+        load_embedder(config), cache=cache,
+        chunk_size=embedding_config.get('chunk_size', 1024),
+        batch_size=max(embedding_config.get('batch_size', 1), 1),
+        max_batch_tokens=embedding_config.get('max_batch_tokens'),
+        queue_size=embedding_config.get('queue_size', 4)
+    )
+    return pipeline.run(dataset, texts, writer)
+
+
+# pylint: disable-next=too-many-locals
 def run_embedding_generation(config: dict, dataset: list) -> str:
     """
-    Convert logs to embeddings and save to JSON.
+    Convert logs to embeddings and save them to the embedding store.
 
     Args:
         config (dict): The configuration dictionary.
         dataset (list): The list of parsed log dictionaries.
 
     Returns:
-        str: The path to the JSON file with embeddings.
+        str: The path to the embedding store.
     """
-    from src.embedder import Embedder
+    from src.embedding_cache import EmbeddingCache, embed_with_cache
+    from src.embedding_store import EmbeddingStore, EmbeddingStoreWriter, fingerprint_dataset
 
     output_path = get_embeddings_path(config)
-
-    if os.path.exists(output_path):
+    embedding_config = config.get('embedding', {})
+    dtype = embedding_config.get('store_dtype', 'float32')
+    model_name = config['embedding_model']
+    by_template = embedding_config.get('by_template', False)
+    options = get_embedder_options(config)
+    variant = get_embedding_variant(options)
+    fingerprint = fingerprint_dataset(dataset, model_name, variant="|".join(
+        part for part in ("by_template" if by_template else "", variant) if part
+    ))
+
+    legacy_path = get_legacy_embeddings_path(config)
+    if not EmbeddingStore.exists(output_path) and os.path.exists(legacy_path):
+        EmbeddingStore.import_legacy_json(legacy_path, output_path, dtype=dtype,
+                                          model_name=model_name)
+        print(f"Imported legacy embeddings into {output_path}")
+
+    meta = EmbeddingStore.read_meta(output_path)
+    if meta is not None and meta.get('fingerprint') == fingerprint:
         print(f"Embeddings already exist at {output_path}, skipping generation.")
         return output_path
+    if meta is not None:
+        print(f"Embeddings at {output_path} are stale (dataset or model changed), rebuilding.")
 
     print("Starting embedding generation...")
-    embedder = Embedder(config['embedding_model'])
-    texts = [sample['text'] for sample in dataset]
-    embeddings = embedder.generate_embeddings(texts)
-
-    for i, sample in enumerate(dataset):
-        sample['embedding'] = embeddings[i]
-
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(dataset, f, indent=2)
+    if by_template:
+        # Embed each template once; lines of a template share its vector
+        texts = [sample['template'] for sample in dataset]
+        print(f"Embedding {len(set(texts))} unique templates for {len(texts)} samples")
+    else:
+        texts = [sample['text'] for sample in dataset]
+
+    cache = None
+    if embedding_config.get('cache_dir'):
+        max_mb = embedding_config.get('cache_max_mb')
+        # Other backends give slightly different vectors, so they get their own cache
+        cache = EmbeddingCache(
+            embedding_config['cache_dir'], f"{model_name}@{variant}" if variant else model_name,
+            max_bytes=int(max_mb * 1024 * 1024) if max_mb else None
+        )
+
+    meta = {'embedding_model': model_name, 'fingerprint': fingerprint,
+            'by_template': by_template, 'embedding_options': options}
+    with profiling.stage("embed", items=len(dataset)):
+        if embedding_config.get('pipeline', False):
+            embed_pipelined(config, dataset, texts, cache,
+                            EmbeddingStoreWriter(output_path, len(dataset), dtype=dtype,
+                                                 meta=meta))
+        else:
+            embeddings = embed_with_cache(texts, lambda missing: encode_texts(config, missing),
+                                          cache)
+            EmbeddingStore.save(output_path, dataset, embeddings, dtype=dtype, meta=meta)
 
     print(f"Added embeddings to {len(dataset)} samples and saved to {output_path}")
     return output_path
 
-def run_training(config: dict, data_path: str) -> dict:
+def run_index_build(config: dict, data_path: str) -> str:
+    """
+    Build the nearest-neighbour index over the embedding store.
+
+    Args:
+        config (dict): The configuration dictionary.
+        data_path (str): The path to the embedding store.
+
+    Returns:
+        str: The path to the index.
+    """
+    from src.ann_index import IVFIndex
+    from src.embedding_store import EmbeddingStore
+
+    ann_config = config.get('ann', {})
+    index_path = ann_config.get('path', 'data/logs_index')
+    store = EmbeddingStore.open(data_path)
+
+    if os.path.exists(index_path):
+        try:
+            index = IVFIndex.load(index_path)
+        except FileNotFoundError:
+            index = None
+        if index is not None and index.meta.get('fingerprint') == store.meta.get('fingerprint'):
+            print(f"Index already exists at {index_path}, skipping build.")
+            return index_path
+
+    print(f"Building nearest-neighbour index over {len(store)} embeddings...")
+    start = time.perf_counter()
+    with profiling.stage("index", items=len(store)):
+        index = IVFIndex.build(
+            store.embeddings, n_lists=ann_config.get('n_lists'), seed=config['sampling']['seed'],
+            meta={'store': data_path, 'fingerprint': store.meta.get('fingerprint')}
+        )
+        index.save(index_path)
+    print(f"Indexed {len(index)} embeddings in {index.n_lists} lists "
+          f"({time.perf_counter() - start:.1f}s), saved to {index_path}")
+
+    sample = store.embeddings[:min(len(store), 1000)]
+    k = ann_config.get('k', 10)
+    print(f"Index recall@{k} at n_probe={ann_config.get('n_probe', 8)}: "
+          f"{index.recall(sample, k, ann_config.get('n_probe', 8)):.4f}")
+    return index_path
+
+# pylint: disable-next=too-many-locals
+def run_training(config: dict, data_path: str, features_path: str = None) -> dict:
     """
     Train models and evaluate performance.
 
     Args:
         config (dict): The configuration dictionary.
-        data_path (str): The path to the JSON file with embeddings.
+        data_path (str): The path to the embedding store.
+        features_path (str): Window features to join onto the embeddings,
+            or None.
 
     Returns:
         dict: Evaluation results.
     """
-    from src.trainer import Trainer
+    from src.compression import Compressor, compare_compression
+    from src.embedding_store import EmbeddingStore
+    from src.trainer import IncrementalTrainer, Trainer
+    from src.window_features import WindowFeatures
 
     print("Starting model training...")
-    with open(data_path, 'r', encoding='utf-8') as f:
-        dataset = json.load(f)
+    store = EmbeddingStore.open(data_path)
+    window_features = WindowFeatures.load(features_path) if features_path else None
+
+    training_config = config.get('training', {})
+    compression_config = config.get('compression', {})
+
+    def make_trainer(compressor: Compressor) -> Trainer:
+        return Trainer(store, compressor=compressor,
+                       calibration_fraction=training_config.get('calibration_fraction', 0.2),
+                       window_features=window_features,
+                       feature_weight=config.get('features', {}).get('weight', 1.0))
+
+    if compression_config.get('compare', False):
+        compare_compression(
+            make_trainer,
+            compression_config.get('sweep', []),
+            model=compression_config.get('compare_model', 'logistic_regression')
+        )
+    compressor = Compressor(
+        method=compression_config.get('method', 'none'),
+        dim=compression_config.get('dim'),
+        quantize=compression_config.get('quantize', 'none')
+    )
 
-    trainer = Trainer(dataset)
-    if 'logistic_regression' in config['classifiers']:
-        trainer.train_logistic_regression()
-    if 'svm' in config['classifiers']:
-        trainer.train_svm()
+    if training_config.get('mode', 'batch') == 'incremental':
+        if window_features is not None:
+            print("Window features are not used by incremental training")
+        trainer = IncrementalTrainer(
+            store,
+            batch_size=training_config.get('batch_size', 1024),
+            epochs=training_config.get('epochs', 5),
+            checkpoint_dir=training_config.get('checkpoint_dir'),
+            checkpoint_every=training_config.get('checkpoint_every', 100),
+            seed=config['sampling']['seed'],
+            compressor=compressor
+        )
+        for name in config['classifiers']:
+            if name not in IncrementalTrainer.LOSSES:
+                print(f"Skipping {name}: not supported by incremental training")
+                continue
+            with profiling.stage(f"train/{name}", items=len(store)):
+                trainer.train(name, alpha=training_config.get('alpha', 1e-4))
+    elif training_config.get('search', False):
+        trainer = make_trainer(compressor)
+        classifiers = config['classifiers']
+        with profiling.stage("train/search", items=len(trainer.x_train)):
+            trainer.search(
+                classifiers if isinstance(classifiers, dict) else dict.fromkeys(classifiers),
+                n_jobs=training_config.get('search_jobs', -1),
+                validation_fraction=training_config.get('validation_fraction', 0.2)
+            )
+    else:
+        trainer = make_trainer(compressor)
+        for name in ('logistic_regression', 'svm', 'knn'):
+            if name in config['classifiers']:
+                with profiling.stage(f"train/{name}", items=len(trainer.x_train)):
+                    getattr(trainer, f"train_{name}")()
+
+    trainer.save_artifact(
+        config.get('artifact', {}).get('dir', 'output/artifacts'),
+        metadata={
+            'embedding_model': store.meta.get('embedding_model', config['embedding_model']),
+            'data_fingerprint': store.meta.get('fingerprint', ''),
+            'by_template': config.get('embedding', {}).get('by_template', False),
+            'embedding_options': store.meta.get('embedding_options', {}),
+        }
+    )
 
-    results = trainer.evaluate()
+    with profiling.stage("evaluate") as record:
+        results = trainer.evaluate()
+        record['items'] = len(next(iter(results.values()))['y_test']) if results else None
+    run_cross_validation(config, trainer, results)
     for name, metrics in results.items():
         print(f"\nResults for {name}:")
         print(f"  Accuracy:  {metrics['accuracy']:.4f}")
         print(f"  Macro Precision: {metrics['macro_precision']:.4f}")
         print(f"  Macro Recall:    {metrics['macro_recall']:.4f}")
         print(f"  Macro F1-Score:  {metrics['macro_f1_score']:.4f}")
+        if 'brier_score' in metrics:
+            print(f"  Brier Score:     {metrics['brier_score']:.4f}")
+            print(f"  Calibration ECE: {metrics['expected_calibration_error']:.4f}")
 
     return results
 
+def run_cross_validation(config: dict, trainer, results: dict):
+    """
+    Cross-validate every classifier candidate if training.cv_folds is set.
+
+    Args:
+        config (dict): The configuration dictionary.
+        trainer (Trainer | IncrementalTrainer): The trainer holding the data.
+        results (dict): Evaluation results; the rows of every evaluated
+            model are added as its 'cross_validation' entry.
+    """
+    training_config = config.get('training', {})
+    folds = training_config.get('cv_folds', 0)
+    if folds <= 1:
+        return
+    if not hasattr(trainer, 'cross_validate'):
+        print("Cross-validation is not supported by incremental training")
+        return
+
+    classifiers = config['classifiers']
+    with profiling.stage("cross_validate", items=len(trainer.labels)):
+        summary = trainer.cross_validate(
+            classifiers if isinstance(classifiers, dict) else dict.fromkeys(classifiers),
+            folds=folds,
+            n_jobs=training_config.get('cv_jobs', -1)
+        )
+    for name, rows in summary.items():
+        if name in results:
+            results[name]['cross_validation'] = rows
+
 def run_reporting(config: dict, results: dict):
     """
     Generate the PDF report.
@@ -110,46 +449,323 @@ def run_reporting(config: dict, results: dict):
     from src.reporter import Reporter
 
     print("Generating report...")
-    reporter = Reporter(config['report']['output_path'])
-    reporter.generate_report(results)
-
-def main():
-    """
-    Main function to run the POC pipeline.
+    reporter = Reporter(config['report']['output_path'],
+                        workers=config['report'].get('workers'))
+    with profiling.stage("report", items=len(results)):
+        reporter.generate_report(
+            results, performance=list(profiling.get_profiler().records.values())
+        )
+
+def stage_parse(config: dict, cache: StageCache, force: bool = False) -> tuple:
     """
-    config_path = "config/config.yaml"
-    if not os.path.exists(config_path):
-        print(f"Error: Config file not found at {config_path}")
-        return
+    Download and parse the logs unless an up-to-date parse is cached.
 
-    config = load_config(config_path)
+    Args:
+        config (dict): The configuration dictionary.
+        cache (StageCache): The stage cache.
+        force (bool): Rebuild even if the cached parse is up to date.
 
-    # Step 1: Download dataset if not present
-    log_file = config['data']['log_path']
-    data_dir = os.path.dirname(log_file)
-    download_bgl(config['dataset_url'], data_dir)
+    Returns:
+        tuple: (stage key, outputs with the 'dataset' file path).
+    """
+    from src.log_sources import resolve_inputs
+
+    log_path = config['data']['log_path']
+    try:
+        log_files = resolve_inputs(log_path)
+    except FileNotFoundError:
+        from src.downloader import download_bgl
+        download = config.get('download', {})
+        with profiling.stage("download"):
+            download_bgl(config['dataset_url'], os.path.dirname(log_path),
+                         checksum=download.get('checksum'),
+                         workers=download.get('workers', 1),
+                         chunk_mb=download.get('chunk_mb', 16),
+                         retries=download.get('retries', 3),
+                         compress=log_path.endswith(".gz"))
+        log_files = resolve_inputs(log_path)
+
+    key = StageCache.key(config, STAGE_CONFIG_KEYS['parse'], files=log_files)
+    outputs = None if force else cache.get('parse', key)
+    if outputs is not None:
+        print(f"Stage 'parse' is up to date ({outputs['samples']} samples), skipping.")
+        return key, outputs
+
+    from src.data_loader import load_bgl_data
 
-    # Step 2: Parse log data
     dataset = load_bgl_data(
-        log_file,
+        log_files,
         total_samples=config['sampling']['total_samples'],
         normal_ratio=config['sampling']['normal_ratio'],
-        seed=config['sampling']['seed']
+        seed=config['sampling']['seed'],
+        mine_templates=config.get('embedding', {}).get('by_template', False),
+        streaming=config['sampling'].get('streaming', False),
+        workers=config.get('parsing', {}).get('workers', 1),
+        engine=config.get('parsing', {}).get('engine', 'text')
     )
-
     if not dataset:
-        print("Error: No data loaded.")
-        return
+        raise SystemExit("Error: No data loaded.")
+
+    dataset_path = config['data']['output_path']
+    os.makedirs(os.path.dirname(dataset_path) or ".", exist_ok=True)
+    with open(dataset_path, 'w', encoding='utf-8') as f:
+        json.dump(dataset, f)
+
+    outputs = {'dataset': dataset_path, 'samples': len(dataset)}
+    cache.put('parse', key, outputs, paths=(dataset_path,))
+    return key, outputs
+
+
+def stage_embed(config: dict, cache: StageCache, force: bool = False) -> tuple:
+    """
+    Embed the parsed logs (and index them) unless the store is up to date.
+
+    Args:
+        config (dict): The configuration dictionary.
+        cache (StageCache): The stage cache.
+        force (bool): Rebuild even if the cached store is up to date.
+
+    Returns:
+        tuple: (stage key, outputs with the 'store' path).
+    """
+    parse_key, parse_outputs = stage_parse(config, cache)
+    key = StageCache.key(config, STAGE_CONFIG_KEYS['embed'], upstream=(parse_key,))
+    outputs = None if force else cache.get('embed', key)
+    if outputs is not None:
+        print(f"Stage 'embed' is up to date ({outputs['store']}), skipping.")
+        return key, outputs
+
+    with open(parse_outputs['dataset'], 'r', encoding='utf-8') as f:
+        dataset = json.load(f)
+    store_path = run_embedding_generation(config, dataset)
+    outputs = {'store': store_path}
+    if config.get('ann', {}).get('enabled', False):
+        outputs['index'] = run_index_build(config, store_path)
+
+    cache.put('embed', key, outputs, paths=tuple(outputs.values()))
+    return key, outputs
+
+
+# pylint: disable-next=too-many-locals
+def stage_features(config: dict, cache: StageCache, force: bool = False) -> tuple:
+    """
+    Count sliding-window node and component events unless they are up to date.
+
+    Args:
+        config (dict): The configuration dictionary.
+        cache (StageCache): The stage cache.
+        force (bool): Recount even if the cached features are up to date.
 
-    # Step 3: Generate embeddings
-    embedded_data_path = run_embedding_generation(config, dataset)
+    Returns:
+        tuple: (stage key, outputs with the 'features' file path).
+    """
+    parse_key, parse_outputs = stage_parse(config, cache)
+    key = StageCache.key(config, STAGE_CONFIG_KEYS['features'], upstream=(parse_key,))
+    outputs = None if force else cache.get('features', key)
+    if outputs is not None:
+        print(f"Stage 'features' is up to date ({outputs['features']}), skipping.")
+        return key, outputs
+
+    from src.log_sources import resolve_inputs
+    from src.window_features import LogColumns, extract_window_features
+
+    features_config = config.get('features', {})
+    with open(parse_outputs['dataset'], 'r', encoding='utf-8') as f:
+        dataset = json.load(f)
+    columns_path = features_config.get('columns_path')
+    columns = LogColumns() if columns_path else None
+
+    print("Counting sliding-window node and component events...")
+    with profiling.stage("features") as record:
+        features = extract_window_features(
+            resolve_inputs(config['data']['log_path']), dataset,
+            windows=tuple(features_config.get('windows', (60, 3600))), columns=columns
+        )
+        record['items'] = features.lines
+    features_path = features_config.get('path', 'data/window_features.npz')
+    features.save(features_path)
+    outputs = {'features': features_path}
+    if columns is not None:
+        columns.save(columns_path)
+        outputs['columns'] = columns_path
+        print(f"Saved the header fields of {len(columns)} lines to {columns_path}")
+    print(f"Saved {len(features.names)} window features of {len(features)} samples "
+          f"to {features_path}")
+
+    cache.put('features', key, outputs, paths=tuple(outputs.values()))
+    return key, outputs
+
+
+def stage_train(config: dict, cache: StageCache, force: bool = False) -> tuple:
+    """
+    Train and evaluate the classifiers unless the results are up to date.
+
+    Args:
+        config (dict): The configuration dictionary.
+        cache (StageCache): The stage cache.
+        force (bool): Retrain even if the cached results are up to date.
+
+    Returns:
+        tuple: (stage key, outputs with the 'results' file path).
+    """
+    embed_key, embed_outputs = stage_embed(config, cache)
+    upstream, features_path = [embed_key], None
+    if config.get('features', {}).get('enabled', False):
+        features_key, features_outputs = stage_features(config, cache)
+        upstream.append(features_key)
+        features_path = features_outputs['features']
+    key = StageCache.key(config, STAGE_CONFIG_KEYS['train'], upstream=upstream)
+    outputs = None if force else cache.get('train', key)
+    if outputs is not None:
+        print(f"Stage 'train' is up to date ({outputs['results']}), skipping.")
+        return key, outputs
+
+    results = run_training(config, embed_outputs['store'], features_path)
+    results_path = os.path.join(cache.root, "results.json")
+    os.makedirs(cache.root, exist_ok=True)
+    with open(results_path, 'w', encoding='utf-8') as f:
+        json.dump(results, f)
+
+    outputs = {'results': results_path}
+    cache.put('train', key, outputs, paths=(results_path,))
+    return key, outputs
+
+
+def stage_report(config: dict, cache: StageCache, force: bool = False) -> tuple:
+    """
+    Generate the PDF report unless it is up to date.
 
-    # Step 4: Train classifiers
-    results = run_training(config, embedded_data_path)
+    Args:
+        config (dict): The configuration dictionary.
+        cache (StageCache): The stage cache.
+        force (bool): Regenerate even if the cached report is up to date.
 
-    # Step 5: Generate report
+    Returns:
+        tuple: (stage key, outputs with the 'report' path).
+    """
+    train_key, train_outputs = stage_train(config, cache)
+    key = StageCache.key(config, STAGE_CONFIG_KEYS['report'], upstream=(train_key,))
+    outputs = None if force else cache.get('report', key)
+    if outputs is not None:
+        print(f"Stage 'report' is up to date ({outputs['report']}), skipping.")
+        return key, outputs
+
+    with open(train_outputs['results'], 'r', encoding='utf-8') as f:
+        results = json.load(f)
     run_reporting(config, results)
 
+    outputs = {'report': config['report']['output_path']}
+    cache.put('report', key, outputs, paths=(outputs['report'],))
+    return key, outputs
+
+
+# pylint: disable-next=too-many-locals
+def run_prediction(config: dict, texts: list, model: str = None, artifact: str = None):
+    """
+    Classify log messages with a trained artifact and print JSON lines.
+
+    Args:
+        config (dict): The configuration dictionary.
+        texts (list): The log messages to classify.
+        model (str): The model to use (default: the first in the artifact).
+        artifact (str): The artifact directory (default: the latest one).
+    """
+    import numpy as np
+
+    from src.data_loader import LABEL_ANOMALY, TemplateMiner
+    from src.predictor import Predictor
+
+    predictor = Predictor(artifact or config.get('artifact', {}).get('dir', 'output/artifacts'))
+    if predictor.feature_joiner is not None:
+        raise SystemExit("Error: this artifact was trained with window features, which need "
+                         "whole log lines; classify them with tail.py instead.")
+    model = model or next(iter(predictor.models))
+    if predictor.manifest.get('by_template'):
+        texts_to_embed = [TemplateMiner.mask(text) for text in texts]
+    else:
+        texts_to_embed = texts
+
+    # stdout carries the predictions, so keep loading messages off it
+    with contextlib.redirect_stdout(sys.stderr):
+        embeddings = load_embedder(config, predictor.embedding_model,
+                                   predictor.embedding_options).encode_batch(texts_to_embed)
+
+    labels, scores = predictor.predict_and_score(embeddings, model, LABEL_ANOMALY)
+    for text, label, score in zip(texts, np.asarray(labels).tolist(), scores):
+        print(json.dumps({'text': text, 'label': label, 'anomaly_score': round(float(score), 4),
+                          'model': model}))
+
+
+STAGES = {
+    'parse': stage_parse,
+    'embed': stage_embed,
+    'features': stage_features,
+    'train': stage_train,
+    'report': stage_report,
+}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """
+    Build the command-line parser.
+
+    Returns:
+        argparse.ArgumentParser: The parser with one subcommand per stage.
+    """
+    parser = argparse.ArgumentParser(
+        description="Sysadmin log classifier POC. Each stage runs the stages it depends "
+                    "on and skips those whose inputs have not changed."
+    )
+    parser.add_argument("--config", default="config/config.yaml", help="config file")
+    parser.add_argument("--profile", action="append", metavar="STAGE",
+                        help="capture a stage with cProfile, e.g. parse or train/svm "
+                             "(repeatable; default: profiling.profile in the config)")
+    commands = parser.add_subparsers(dest="command", metavar="command")
+
+    descriptions = {
+        'parse': "download and parse the BGL logs",
+        'embed': "embed the parsed logs (and build the index if enabled)",
+        'features': "count sliding-window node and component events",
+        'train': "train and evaluate the classifiers",
+        'report': "generate the PDF report (default)",
+    }
+    for name, description in descriptions.items():
+        command = commands.add_parser(name, help=description, description=description)
+        command.add_argument("--force", action="store_true",
+                             help="rebuild this stage even if it is up to date")
+
+    predict = commands.add_parser("predict", help="classify log messages with a trained model")
+    predict.add_argument("texts", nargs="*", help="log messages (default: one per line on stdin)")
+    predict.add_argument("--model", help="model name (default: the first in the artifact)")
+    predict.add_argument("--artifact",
+                         help="artifact directory (default: the latest in artifact.dir)")
+    return parser
+
+
+def main():
+    """
+    Main function to run the POC pipeline.
+    """
+    args = build_parser().parse_args()
+    if not os.path.exists(args.config):
+        print(f"Error: Config file not found at {args.config}")
+        return
+
+    config = load_config(args.config)
+    if args.command == "predict":
+        texts = args.texts or [line.strip() for line in sys.stdin if line.strip()]
+        run_prediction(config, texts, model=args.model, artifact=args.artifact)
+        return
+
+    profiling_config = config.get('profiling', {})
+    profiling.configure(
+        metrics_path=profiling_config.get('metrics_path', 'output/metrics.json'),
+        profile=args.profile or profiling_config.get('profile') or (),
+        profile_dir=profiling_config.get('profile_dir', 'output/profiles')
+    )
+    cache = StageCache(config.get('stages', {}).get('dir', 'output/stages'))
+    STAGES[args.command or 'report'](config, cache, force=getattr(args, 'force', False))
+
 
 if __name__ == "__main__":
     main()
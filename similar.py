@@ -0,0 +1,11 @@
+"""
+Similar-incident lookup entry point for the sysadmin log classifier POC.
+
+Prints the past log lines most similar to a message, with their labels.
+"""
+
+from src.ann_index import main
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,429 @@
+"""
+Approximate nearest-neighbour index module.
+
+This module provides an inverted-file (IVF) index over log embeddings,
+written in plain numpy. Vectors are normalized and grouped by their
+nearest k-means centroid, and a query only scans the lists of its closest
+centroids. The index supports incremental inserts and is persisted as
+memory-mappable ``.npy`` files. A kNN classifier and a "similar past log
+lines" lookup are built on top of it.
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+CENTROIDS_FILE = "centroids.npy"
+VECTORS_FILE = "vectors.npy"
+IDS_FILE = "ids.npy"
+OFFSETS_FILE = "offsets.npy"
+META_FILE = "meta.json"
+LABELS_FILE = "labels.npy"
+# k-means is trained on at most this many points per list
+TRAIN_POINTS_PER_LIST = 64
+# Rows assigned to centroids at a time, to bound temporary memory
+ASSIGN_CHUNK = 65536
+
+
+def default_n_lists(count: int) -> int:
+    """
+    Pick a number of inverted lists for a collection size.
+
+    Args:
+        count (int): The number of vectors to index.
+
+    Returns:
+        int: About 4 * sqrt(count), keeping at least 39 points per list.
+    """
+    return max(1, min(int(4 * np.sqrt(count)), count // 39))
+
+
+def _normalize(vectors) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class IVFIndex:
+    """
+    An inverted-file index for cosine similarity search.
+    """
+
+    def __init__(self, centroids: np.ndarray, meta: dict = None):
+        """
+        Create an empty index around trained centroids.
+
+        Args:
+            centroids (np.ndarray): One normalized centroid per list.
+            meta (dict): Extra metadata saved with the index.
+        """
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.meta = dict(meta or {})
+        n_lists, dim = self.centroids.shape
+        self._vectors = [np.empty((0, dim), dtype=np.float32) for _ in range(n_lists)]
+        self._ids = [np.empty(0, dtype=np.int64) for _ in range(n_lists)]
+        # Inserted rows waiting to be merged into their lists
+        self._pending = [[] for _ in range(n_lists)]
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def n_lists(self) -> int:
+        """int: The number of inverted lists."""
+        return len(self.centroids)
+
+    @property
+    def dim(self) -> int:
+        """int: The vector width."""
+        return self.centroids.shape[1]
+
+    @classmethod
+    def train(cls, vectors, n_lists: int = None, n_iter: int = 10, seed: int = 42,
+              meta: dict = None) -> "IVFIndex":
+        """
+        Train centroids with spherical k-means on a sample of the vectors.
+
+        Args:
+            vectors: A 2-D array (or memory-mapped matrix) of vectors.
+            n_lists (int): The number of lists, or None for default_n_lists.
+            n_iter (int): k-means iterations.
+            seed (int): Seed for the sample and the initial centroids.
+            meta (dict): Extra metadata saved with the index.
+
+        Returns:
+            IVFIndex: An empty index with trained centroids.
+        """
+        n_lists = n_lists or default_n_lists(len(vectors))
+        rng = np.random.default_rng(seed)
+        sample_size = min(len(vectors), n_lists * TRAIN_POINTS_PER_LIST)
+        sample = _normalize(vectors[np.sort(rng.choice(len(vectors), sample_size,
+                                                       replace=False))])
+
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)]
+        for _ in range(n_iter):
+            assignment = _nearest(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            empty = np.bincount(assignment, minlength=n_lists) == 0
+            # Restart empty lists from random points
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+            centroids = _normalize(sums)
+        return cls(centroids, meta)
+
+    @classmethod
+    def build(cls, vectors, n_lists: int = None, seed: int = 42,
+              meta: dict = None) -> "IVFIndex":
+        """
+        Train an index and insert every vector, with row numbers as ids.
+
+        Args:
+            vectors: A 2-D array (or memory-mapped matrix) of vectors.
+            n_lists (int): The number of lists, or None for default_n_lists.
+            seed (int): Seed for k-means.
+            meta (dict): Extra metadata saved with the index.
+
+        Returns:
+            IVFIndex: The populated index.
+        """
+        index = cls.train(vectors, n_lists=n_lists, seed=seed, meta=meta)
+        for start in range(0, len(vectors), ASSIGN_CHUNK):
+            chunk = vectors[start:start + ASSIGN_CHUNK]
+            index.add(chunk, ids=np.arange(start, start + len(chunk)))
+        return index
+
+    def add(self, vectors, ids=None):
+        """
+        Insert vectors.
+
+        Args:
+            vectors: A 2-D array of vectors.
+            ids: One integer id per vector, or None to continue from len(self).
+        """
+        vectors = _normalize(vectors)
+        if ids is None:
+            ids = np.arange(self._count, self._count + len(vectors))
+        ids = np.asarray(ids, dtype=np.int64)
+
+        assignment = _nearest(vectors, self.centroids)
+        order = np.argsort(assignment, kind='stable')
+        bounds = np.searchsorted(assignment[order], np.arange(self.n_lists + 1))
+        for list_id in np.flatnonzero(np.diff(bounds)):
+            rows = order[bounds[list_id]:bounds[list_id + 1]]
+            self._pending[list_id].append((vectors[rows], ids[rows]))
+        self._count += len(vectors)
+
+    def search(self, queries, k: int = 10, n_probe: int = 8) -> tuple:
+        """
+        Find the most similar indexed vectors.
+
+        Args:
+            queries: A 2-D array with one query vector per row.
+            k (int): Neighbours returned per query.
+            n_probe (int): Lists scanned per query; n_lists makes it exact.
+
+        Returns:
+            tuple: (similarities, ids), both of shape (len(queries), k) and
+                sorted by decreasing cosine similarity. Missing neighbours
+                have id -1.
+        """
+        self._merge_pending()
+        queries = _normalize(queries)
+        n_probe = min(n_probe, self.n_lists)
+        probes = np.argpartition(-(queries @ self.centroids.T), n_probe - 1,
+                                 axis=1)[:, :n_probe]
+
+        similarities = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        ids = np.full((len(queries), k), -1, dtype=np.int64)
+        for row, query in enumerate(queries):
+            candidates = [self._vectors[p] @ query for p in probes[row]]
+            scores = np.concatenate(candidates)
+            if scores.size == 0:
+                continue
+            top = min(k, len(scores))
+            best = np.argpartition(-scores, top - 1)[:top]
+            best = best[np.argsort(-scores[best])]
+            candidate_ids = np.concatenate([self._ids[p] for p in probes[row]])
+            similarities[row, :top] = scores[best]
+            ids[row, :top] = candidate_ids[best]
+        return similarities, ids
+
+    def recall(self, queries, k: int = 10, n_probe: int = 8) -> float:
+        """
+        Measure recall@k of approximate search against brute force.
+
+        Args:
+            queries: A 2-D array with one query vector per row.
+            k (int): Neighbours compared per query.
+            n_probe (int): Lists scanned by the approximate search.
+
+        Returns:
+            float: The mean share of the exact top-k that was found.
+        """
+        _, approximate = self.search(queries, k, n_probe)
+        _, exact = self.search(queries, k, self.n_lists)
+        found = [len(np.intersect1d(a[a >= 0], e[e >= 0])) / max(1, (e >= 0).sum())
+                 for a, e in zip(approximate, exact)]
+        return float(np.mean(found))
+
+    def save(self, path: str):
+        """
+        Write the index to a directory.
+
+        Args:
+            path (str): The index directory to create or overwrite.
+        """
+        self._merge_pending()
+        os.makedirs(path, exist_ok=True)
+        meta_path = os.path.join(path, META_FILE)
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+
+        offsets = np.concatenate([[0], np.cumsum([len(ids) for ids in self._ids])])
+        np.save(os.path.join(path, CENTROIDS_FILE), self.centroids)
+        np.save(os.path.join(path, VECTORS_FILE), np.concatenate(self._vectors))
+        np.save(os.path.join(path, IDS_FILE), np.concatenate(self._ids))
+        np.save(os.path.join(path, OFFSETS_FILE), offsets)
+
+        # Written last, so its presence marks a complete index
+        with open(meta_path, 'w', encoding='utf-8') as f:
+            json.dump({**self.meta, 'count': self._count, 'dim': self.dim,
+                       'n_lists': self.n_lists}, f, indent=2)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "IVFIndex":
+        """
+        Open a saved index.
+
+        Args:
+            path (str): The index directory.
+            mmap (bool): Memory-map the vectors read-only instead of reading them.
+
+        Returns:
+            IVFIndex: The loaded index; new inserts are kept in memory.
+
+        Raises:
+            FileNotFoundError: If the index is missing or incomplete.
+        """
+        meta_path = os.path.join(path, META_FILE)
+        if not os.path.exists(meta_path):
+            raise FileNotFoundError(f"No index at {path}")
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+
+        mmap_mode = 'r' if mmap else None
+        index = cls(np.load(os.path.join(path, CENTROIDS_FILE)),
+                    {key: value for key, value in meta.items()
+                     if key not in ('count', 'dim', 'n_lists')})
+        vectors = np.load(os.path.join(path, VECTORS_FILE), mmap_mode=mmap_mode)
+        ids = np.load(os.path.join(path, IDS_FILE), mmap_mode=mmap_mode)
+        offsets = np.load(os.path.join(path, OFFSETS_FILE))
+        index._vectors = [vectors[start:end] for start, end in zip(offsets, offsets[1:])]
+        index._ids = [ids[start:end] for start, end in zip(offsets, offsets[1:])]
+        index._count = meta['count']
+        return index
+
+    def _merge_pending(self):
+        for list_id, pending in enumerate(self._pending):
+            if pending:
+                self._vectors[list_id] = np.concatenate(
+                    [self._vectors[list_id]] + [vectors for vectors, _ in pending])
+                self._ids[list_id] = np.concatenate(
+                    [self._ids[list_id]] + [ids for _, ids in pending])
+                self._pending[list_id] = []
+
+
+def _nearest(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Return the most similar centroid of every (normalized) vector."""
+    return np.concatenate([
+        (vectors[start:start + ASSIGN_CHUNK] @ centroids.T).argmax(axis=1)
+        for start in range(0, len(vectors), ASSIGN_CHUNK)
+    ]) if len(vectors) else np.empty(0, dtype=np.int64)
+
+
+class KNNClassifier:
+    """
+    A k-nearest-neighbour classifier backed by an IVF index.
+
+    Follows the scikit-learn fit/predict/predict_proba conventions so it
+    can be trained, searched and evaluated like the other classifiers.
+    """
+
+    def __init__(self, k: int = 10, n_lists: int = None, n_probe: int = 8, seed: int = 42):
+        """
+        Args:
+            k (int): Neighbours voting per prediction.
+            n_lists (int): Index lists, or None for default_n_lists.
+            n_probe (int): Lists scanned per query.
+            seed (int): Seed for the index k-means.
+        """
+        self.k = k
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.seed = seed
+        self.index = None
+        self.labels_ = None
+        self.classes_ = None
+
+    def fit(self, x, y) -> "KNNClassifier":
+        """
+        Index the training vectors.
+
+        Args:
+            x: A 2-D array of training vectors.
+            y: One encoded label per vector.
+
+        Returns:
+            KNNClassifier: self.
+        """
+        self.labels_ = np.asarray(y)
+        self.classes_ = np.unique(self.labels_)
+        self.index = IVFIndex.build(x, n_lists=self.n_lists, seed=self.seed)
+        return self
+
+    def predict_proba(self, x) -> np.ndarray:
+        """
+        Get the share of neighbours in every class.
+
+        Args:
+            x: A 2-D array of query vectors.
+
+        Returns:
+            np.ndarray: One row of class vote shares per query.
+        """
+        _, ids = self.index.search(x, self.k, self.n_probe)
+        found = ids >= 0
+        votes = np.searchsorted(self.classes_, self.labels_[np.where(found, ids, 0)])
+        counts = np.zeros((len(ids), len(self.classes_)))
+        for column in range(ids.shape[1]):
+            np.add.at(counts, (np.arange(len(ids)), votes[:, column]), found[:, column])
+        return counts / np.maximum(counts.sum(axis=1, keepdims=True), 1)
+
+    def predict(self, x) -> np.ndarray:
+        """
+        Predict the majority label of the nearest neighbours.
+
+        Args:
+            x: A 2-D array of query vectors.
+
+        Returns:
+            np.ndarray: One encoded label per query.
+        """
+        return self.classes_[self.predict_proba(x).argmax(axis=1)]
+
+    def save(self, path: str):
+        """
+        Write the fitted classifier to a directory.
+
+        Args:
+            path (str): The directory to create or overwrite.
+        """
+        self.index.meta.update({'k': self.k, 'n_probe': self.n_probe})
+        self.index.save(path)
+        np.save(os.path.join(path, LABELS_FILE), self.labels_)
+
+    @classmethod
+    def load(cls, path: str) -> "KNNClassifier":
+        """
+        Open a classifier saved with save().
+
+        Args:
+            path (str): The classifier directory.
+
+        Returns:
+            KNNClassifier: The loaded classifier.
+        """
+        index = IVFIndex.load(path)
+        model = cls(k=index.meta['k'], n_lists=index.n_lists, n_probe=index.meta['n_probe'])
+        model.index = index
+        model.labels_ = np.load(os.path.join(path, LABELS_FILE))
+        model.classes_ = np.unique(model.labels_)
+        return model
+
+
+def main():  # pylint: disable=too-many-locals
+    """
+    Print the indexed log lines most similar to a query.
+    """
+    # pylint: disable=import-outside-toplevel
+    from src.config import load_config
+    from src.data_loader import TemplateMiner
+    from src.embedding_store import EmbeddingStore
+
+    parser = argparse.ArgumentParser(
+        description="Show the most similar past log lines and their labels."
+    )
+    parser.add_argument("text", help="log message to look up")
+    parser.add_argument("--config", default="config/config.yaml", help="config file")
+    parser.add_argument("-k", type=int, help="neighbours to show (default: ann.k)")
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    ann_config = config.get('ann', {})
+    index = IVFIndex.load(ann_config.get('path', 'data/logs_index'))
+    store = EmbeddingStore.open(index.meta['store'])
+
+    from src.embedder import Embedder
+    embedding_config = config.get('embedding', {})
+    embedder = Embedder(store.meta['embedding_model'], **store.meta.get('embedding_options', {}),
+                        threads=embedding_config.get('threads'),
+                        export_dir=embedding_config.get('export_dir', 'data/onnx_models'))
+    text = TemplateMiner.mask(args.text) if store.meta.get('by_template') else args.text
+
+    start = time.perf_counter()
+    query = embedder.encode_batch([text])
+    encoded = time.perf_counter()
+    similarities, ids = index.search(query, args.k or ann_config.get('k', 10),
+                                     ann_config.get('n_probe', 8))
+    searched = time.perf_counter()
+
+    print(f"Encoded in {(encoded - start) * 1000:.1f} ms, "
+          f"searched {len(index)} vectors in {(searched - encoded) * 1000:.2f} ms")
+    for similarity, row in zip(similarities[0], ids[0]):
+        if row >= 0:
+            record = store.records[row]
+            print(f"{similarity:.4f}  {record['label']:<8} {record['text']}")
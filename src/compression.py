@@ -0,0 +1,240 @@
+"""
+Embedding compression module.
+
+This module sits between the embedder and the classifiers. It shrinks
+embeddings by Matryoshka-style truncation or PCA (fitted on the training
+split only) and optionally quantizes them to int8 or single bits, and it
+compares compression settings against the uncompressed baseline.
+"""
+
+import contextlib
+import io
+import time
+
+import numpy as np
+
+METHODS = ("none", "truncate", "pca")
+QUANTIZERS = ("none", "int8", "binary")
+# Rows processed at a time while fitting, to bound temporary memory
+FIT_CHUNK = 65536
+
+
+class Compressor:
+    """
+    Reduces and quantizes embeddings.
+
+    ``encode`` produces the compact representation (float32, int8 or packed
+    bits) and ``decode`` maps it back to float32 for the classifiers, so
+    ``transform`` shows the classifiers exactly what survives compression.
+    """
+
+    def __init__(self, method: str = "none", dim: int = None, quantize: str = "none"):
+        """
+        Args:
+            method (str): 'none', 'truncate' (keep the first dim values and
+                re-normalize) or 'pca' (project on the top dim components).
+            dim (int): The reduced width; ignored for 'none'.
+            quantize (str): 'none', 'int8' (per-dimension scale) or 'binary'
+                (sign bits).
+
+        Raises:
+            ValueError: If the method or quantizer is unknown.
+        """
+        if method not in METHODS:
+            raise ValueError(f"Unknown compression method: {method}")
+        if quantize not in QUANTIZERS:
+            raise ValueError(f"Unknown quantization: {quantize}")
+        self.method = method
+        self.dim = dim if method != "none" else None
+        self.quantize = quantize
+        self.params = {}
+
+    @property
+    def settings(self) -> dict:
+        """dict: The constructor arguments, e.g. for an artifact manifest."""
+        return {'method': self.method, 'dim': self.dim, 'quantize': self.quantize}
+
+    @property
+    def enabled(self) -> bool:
+        """bool: Whether the compressor changes its input at all."""
+        return self.method != "none" or self.quantize != "none"
+
+    def __str__(self) -> str:
+        if not self.enabled:
+            return "none"
+        parts = [f"{self.method}-{self.dim}"] if self.method != "none" else []
+        if self.quantize != "none":
+            parts.append(self.quantize)
+        return "+".join(parts)
+
+    def bytes_per_vector(self, input_dim: int) -> float:
+        """
+        Get the storage size of one encoded vector.
+
+        Args:
+            input_dim (int): The uncompressed embedding width.
+
+        Returns:
+            float: Bytes per vector.
+        """
+        width = self.dim or input_dim
+        if self.quantize == "binary":
+            return -(-width // 8)
+        return width * (1 if self.quantize == "int8" else 4)
+
+    def fit(self, x) -> "Compressor":
+        """
+        Fit the projection and quantization scales on training vectors.
+
+        Args:
+            x: A 2-D array (or memory-mapped matrix) of training embeddings.
+
+        Returns:
+            Compressor: self.
+        """
+        self.params = {}
+        if self.method == "pca":
+            mean = np.zeros(x.shape[1])
+            scatter = np.zeros((x.shape[1], x.shape[1]))
+            for start in range(0, len(x), FIT_CHUNK):
+                chunk = np.asarray(x[start:start + FIT_CHUNK], dtype=np.float64)
+                mean += chunk.sum(axis=0)
+                scatter += chunk.T @ chunk
+            mean /= len(x)
+            covariance = scatter / len(x) - np.outer(mean, mean)
+            _, vectors = np.linalg.eigh(covariance)
+            self.params['mean'] = mean.astype(np.float32)
+            # eigh sorts ascending; keep the largest components first
+            self.params['components'] = vectors[:, ::-1][:, :self.dim].astype(np.float32)
+
+        if self.quantize == "int8":
+            peak = np.zeros(self.dim or x.shape[1], dtype=np.float32)
+            for start in range(0, len(x), FIT_CHUNK):
+                reduced = self._reduce(x[start:start + FIT_CHUNK])
+                peak = np.maximum(peak, np.abs(reduced).max(axis=0))
+            self.params['scale'] = np.maximum(peak, 1e-12) / 127
+        return self
+
+    def encode(self, x) -> np.ndarray:
+        """
+        Compress embeddings.
+
+        Args:
+            x: A 2-D array of embeddings.
+
+        Returns:
+            np.ndarray: float32 rows, int8 rows or packed sign bits.
+        """
+        reduced = self._reduce(x)
+        if self.quantize == "int8":
+            return np.clip(np.rint(reduced / self.params['scale']), -127, 127).astype(np.int8)
+        if self.quantize == "binary":
+            return np.packbits(reduced > 0, axis=1)
+        return reduced
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        """
+        Expand compressed embeddings to float32 classifier inputs.
+
+        Args:
+            codes (np.ndarray): The output of encode().
+
+        Returns:
+            np.ndarray: One float32 row per embedding.
+        """
+        if self.quantize == "int8":
+            return codes.astype(np.float32) * self.params['scale']
+        if self.quantize == "binary":
+            width = self.dim or codes.shape[1] * 8
+            bits = np.unpackbits(codes, axis=1, count=width)
+            return bits.astype(np.float32) * 2 - 1
+        return codes
+
+    def transform(self, x) -> np.ndarray:
+        """
+        Compress and expand embeddings in one step.
+
+        Args:
+            x: A 2-D array of embeddings.
+
+        Returns:
+            np.ndarray: One float32 row per embedding.
+        """
+        return self.decode(self.encode(x))
+
+    def _reduce(self, x) -> np.ndarray:
+        x = np.asarray(x, dtype=np.float32)
+        if self.method == "truncate":
+            prefix = x[:, :self.dim]
+            return prefix / np.maximum(np.linalg.norm(prefix, axis=1, keepdims=True), 1e-12)
+        if self.method == "pca":
+            return (x - self.params['mean']) @ self.params['components']
+        return x
+
+    @classmethod
+    def from_params(cls, settings: dict, params: dict) -> "Compressor":
+        """
+        Rebuild a fitted compressor.
+
+        Args:
+            settings (dict): The settings property of the fitted compressor.
+            params (dict): Its fitted arrays (see the params attribute).
+
+        Returns:
+            Compressor: The fitted compressor.
+        """
+        compressor = cls(**settings)
+        compressor.params = {key: np.asarray(value) for key, value in params.items()}
+        return compressor
+
+
+def compare_compression(
+    trainer_factory,
+    settings: list,
+    model: str = "logistic_regression"
+) -> list:
+    """
+    Train one classifier per compression setting and compare them.
+
+    Args:
+        trainer_factory (callable): Maps a Compressor to a new Trainer.
+        settings (list): Compressor keyword arguments, one dict per setting;
+            the uncompressed baseline is always added first.
+        model (str): The classifier to train, e.g. 'logistic_regression'.
+
+    Returns:
+        list: One dictionary per setting with the macro F1 and accuracy
+            deltas against the baseline, the bytes per vector and the
+            memory and training-time savings.
+    """
+    rows = []
+    for setting in [{}] + list(settings):
+        compressor = Compressor(**setting)
+        with contextlib.redirect_stdout(io.StringIO()):
+            trainer = trainer_factory(compressor)
+            start = time.perf_counter()
+            getattr(trainer, f"train_{model}")()
+            fit_seconds = time.perf_counter() - start
+            metrics = trainer.evaluate()[model]
+        rows.append({
+            'setting': str(compressor),
+            'bytes_per_vector': compressor.bytes_per_vector(trainer.embeddings.shape[1]),
+            'fit_seconds': fit_seconds,
+            'accuracy': metrics['accuracy'],
+            'macro_f1_score': metrics['macro_f1_score'],
+        })
+
+    baseline = rows[0]
+    print(f"Compression comparison ({model}):")
+    print(f"  {'setting':<22} {'bytes/vec':>9} {'memory':>7} {'fit':>8} "
+          f"{'accuracy':>14} {'macro F1':>14}")
+    for row in rows:
+        row['accuracy_delta'] = row['accuracy'] - baseline['accuracy']
+        row['macro_f1_delta'] = row['macro_f1_score'] - baseline['macro_f1_score']
+        row['memory_saving'] = 1 - row['bytes_per_vector'] / baseline['bytes_per_vector']
+        row['time_saving'] = 1 - row['fit_seconds'] / max(baseline['fit_seconds'], 1e-9)
+        print(f"  {row['setting']:<22} {row['bytes_per_vector']:>9.0f} "
+              f"{-row['memory_saving']:>+7.1%} {row['fit_seconds']:>7.2f}s "
+              f"{row['accuracy']:.4f} ({row['accuracy_delta']:+.4f}) "
+              f"{row['macro_f1_score']:.4f} ({row['macro_f1_delta']:+.4f})")
+    return rows
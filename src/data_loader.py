@@ -2,17 +2,128 @@
 BGL log parser module.
 
 This module provides functions to parse the BGL log format and convert
-it into a standardized format for training.
+it into a standardized format for training. Logs may be plain text or
+gzip, xz or zstd compressed, and several files can be read at once.
 """
 
+import hashlib
+import heapq
+import io
+import mmap
+import os
 import random
-from collections import defaultdict
+import re
+from array import array
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from src import profiling
+from src.log_sources import detect_compression, iter_decompressed_blocks, resolve_inputs
 
 # Constants
 LABEL_NORMAL = 0
 LABEL_ANOMALY = 1
 MIN_BGL_TOKENS = 10
 CONTENT_START_INDEX = 9
+LABEL_NAMES = {LABEL_NORMAL: "NORMAL", LABEL_ANOMALY: "ANOMALY"}
+# Pending digests buffered before they are merged into a DigestSet
+DIGEST_FLUSH_SIZE = 1 << 20
+# Byte ranges per parse worker (for load balancing) and the largest range
+# a worker reads into memory at once
+CHUNKS_PER_WORKER = 4
+MAX_CHUNK_BYTES = 64 * 1024 * 1024
+# Reservoir size of each part relative to the target, so that parts can
+# drop texts an earlier part saw first and still fill their quota
+PART_SAMPLE_HEADROOM = 2
+# Bytes of a memory-mapped log handled per block by iter_bgl_records
+MMAP_BLOCK_BYTES = 16 * 1024 * 1024
+# Whitespace that str.split() treats specially (tabs, line breaks and
+# separators); lines containing any of it take the str-based slow path
+SPECIAL_WHITESPACE = (b"\t", b"\r", b"\x0b", b"\x0c", b"\x1c", b"\x1d", b"\x1e", b"\x1f")
+PARSE_ENGINES = ("text", "mmap")
+
+# Variable parts of BGL content, replaced by their group name when mining
+# templates. Alternatives are tried left to right, so more specific
+# patterns (hex, IPs, node IDs, paths) come before plain numbers.
+TEMPLATE_MASK = re.compile(
+    r"(?P<HEX>0x[0-9a-fA-F]+|\b(?=[0-9a-fA-F]*\d)[0-9a-fA-F]{8,}\b)"
+    r"|(?P<IP>\d{1,3}(?:\.\d{1,3}){3}(?::\d+)?)"
+    r"|(?P<NODE>R\d\d-M\d-N[0-9A-F]+(?:-[A-Z]:J\d\d-U\d\d)?)"
+    r"|(?P<PATH>(?<![\w.])/[^\s:,()]+)"
+    r"|(?P<NUM>\d+)"
+)
+
+
+class TemplateMiner:
+    """
+    Online log template miner based on masking variable tokens.
+
+    Every line is reduced to a template by masking numbers, hex values,
+    IP addresses, node IDs and paths. Templates do not depend on the order
+    in which lines are seen, so IDs are stable across runs and inputs.
+    """
+
+    def __init__(self):
+        self.counts = {}
+        self._interned = {}
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    @staticmethod
+    def template_id(template: str) -> str:
+        """
+        Compute the stable ID of a template.
+
+        Args:
+            template (str): The masked template text.
+
+        Returns:
+            str: A 16-character hex ID.
+        """
+        return hashlib.blake2b(template.encode('utf-8'), digest_size=8).hexdigest()
+
+    @staticmethod
+    def mask(text: str) -> str:
+        """
+        Reduce a log line to its template without counting it.
+
+        Args:
+            text (str): The log content.
+
+        Returns:
+            str: The masked template.
+        """
+        return TEMPLATE_MASK.sub(lambda match: f"<{match.lastgroup}>", text)
+
+    def add(self, text: str) -> str:
+        """
+        Mine the template of a log line and count it.
+
+        Args:
+            text (str): The log content.
+
+        Returns:
+            str: The template, shared with all lines of the same template.
+        """
+        return self.record(self.mask(text))
+
+    def record(self, template: str) -> str:
+        """
+        Count an already masked template.
+
+        Args:
+            template (str): The masked template.
+
+        Returns:
+            str: The template, shared with all lines of the same template.
+        """
+        # Intern so that lines of the same template share one string
+        template = self._interned.setdefault(template, template)
+        self.counts[template] = self.counts.get(template, 0) + 1
+        return template
 
 
 def parse_bgl_line(line: str) -> dict:
@@ -44,11 +155,247 @@ def parse_bgl_line(line: str) -> dict:
     return {"text": content, "label": label}
 
 
+def iter_bgl_records(file_path: str, start: int = 0, end: int = None):
+    """
+    Parse a BGL log straight from a memory-mapped file.
+
+    Works on bytes and splits each line only up to the content field, so
+    no per-token strings are built. Lines that are printable ASCII with
+    single spaces take this fast path. Any other line falls back to
+    parse_bgl_line on its decoded text, so results match reading the file
+    in text mode and calling parse_bgl_line on every line, including the
+    MIN_BGL_TOKENS rule.
+
+    Args:
+        file_path (str): Path to the BGL.log file.
+        start (int): First byte to parse; must be at a line start.
+        end (int): Byte after the last one to parse, or None for the end
+            of the file; must be at a line start or the end of the file.
+
+    Yields:
+        tuple: (label, content) with the content as UTF-8 bytes.
+    """
+    with open(file_path, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            end = len(mapped) if end is None else end
+            position = start
+            while position < end:
+                block_end = min(position + MMAP_BLOCK_BYTES, end)
+                if block_end < end:
+                    newline = mapped.find(b"\n", block_end - 1, end)
+                    block_end = end if newline < 0 else newline + 1
+                yield from _parse_block(mapped[position:block_end])
+                position = block_end
+
+
+def _parse_block(block: bytes):
+    """Parse a block of whole lines into (label, content bytes) records."""
+    # Checking the whole block first lets clean blocks skip per-line checks
+    clean = block.isascii() and not any(char in block for char in SPECIAL_WHITESPACE)
+    content_field = CONTENT_START_INDEX
+
+    for line in block.split(b"\n"):
+        line = line.strip()
+        if b"  " not in line and (clean or (
+                line.isascii() and not any(char in line for char in SPECIAL_WHITESPACE))):
+            parts = line.split(b" ", content_field)
+            if len(parts) > content_field:
+                yield (LABEL_NORMAL if parts[0] == b"-" else LABEL_ANOMALY), parts[content_field]
+            continue
+
+        # Text mode also breaks lines at lone carriage returns
+        for text_line in line.decode("utf-8", errors="ignore").split("\r"):
+            parsed = parse_bgl_line(text_line.strip())
+            if parsed:
+                yield parsed['label'], parsed['text'].encode("utf-8")
+
+
+class DigestSet:
+    """
+    Compact set of fixed-width 64-bit digests.
+
+    Digests are appended to a C-level array and periodically merged into a
+    sorted, deduplicated numpy array, costing 8 bytes per distinct entry
+    instead of a Python string and set slot per line.
+    """
+
+    def __init__(self):
+        self._pending = array('Q')
+        self._merged = np.empty(0, dtype=np.uint64)
+
+    def __len__(self) -> int:
+        self._flush()
+        return len(self._merged)
+
+    def __contains__(self, digest: int) -> bool:
+        digest = np.uint64(digest)
+        index = np.searchsorted(self._merged, digest)
+        if index < len(self._merged) and self._merged[index] == digest:
+            return True
+        return bool(self._pending) and bool(
+            (np.frombuffer(self._pending, dtype=np.uint64) == digest).any()
+        )
+
+    def add(self, digest: int):
+        """
+        Add a digest to the set.
+
+        Args:
+            digest (int): An unsigned 64-bit digest.
+        """
+        self._pending.append(digest)
+        if len(self._pending) >= DIGEST_FLUSH_SIZE:
+            self._flush()
+
+    def update(self, other: "DigestSet"):
+        """
+        Add every digest of another set.
+
+        Args:
+            other (DigestSet): The set to merge in.
+        """
+        other._flush()  # pylint: disable=protected-access
+        self._flush()
+        self._merged = np.union1d(self._merged, other._merged)  # pylint: disable=protected-access
+
+    def _flush(self):
+        if self._pending:
+            pending = np.frombuffer(self._pending, dtype=np.uint64)
+            self._merged = np.union1d(self._merged, pending)
+            self._pending = array('Q')
+
+
+class ReservoirSampler:
+    """
+    Per-label bottom-k reservoir sampler.
+
+    Every candidate carries a priority derived from a seeded digest of its
+    text, and each label keeps the candidates with the smallest priorities.
+    This draws a uniform sample of distinct texts that is reproducible
+    under the seed, ignores duplicates without remembering every line, and
+    does not depend on the order in which candidates arrive.
+    """
+
+    def __init__(self, targets: dict):
+        """
+        Args:
+            targets (dict): Maps each label to the number of samples to keep.
+        """
+        self.targets = targets
+        self._heaps = {label: [] for label in targets}
+        self._kept = {label: {} for label in targets}
+
+    def accepts(self, label: int, priority: int) -> bool:
+        """
+        Check whether a candidate would currently be kept.
+
+        Args:
+            label (int): The candidate label.
+            priority (int): The candidate priority.
+
+        Returns:
+            bool: True if offering the candidate would add it.
+        """
+        heap = self._heaps.get(label)
+        if heap is None or priority in self._kept[label] or not self.targets[label]:
+            return False
+        return len(heap) < self.targets[label] or priority < -heap[0]
+
+    def offer(self, label: int, priority: int, item) -> bool:
+        """
+        Offer a candidate to the reservoir of its label.
+
+        Args:
+            label (int): The candidate label.
+            priority (int): The candidate priority.
+            item: The candidate to keep, e.g. a parsed log dictionary.
+
+        Returns:
+            bool: True if the candidate was kept.
+        """
+        if not self.accepts(label, priority):
+            return False
+        heap = self._heaps[label]
+        kept = self._kept[label]
+        if len(heap) < self.targets[label]:
+            heapq.heappush(heap, -priority)
+        else:
+            del kept[-heapq.heapreplace(heap, -priority)]
+        kept[priority] = item
+        return True
+
+    def merge(self, other: "ReservoirSampler", seen: "DigestSet" = None) -> list:
+        """
+        Merge another reservoir with the same labels into this one.
+
+        Args:
+            other (ReservoirSampler): The reservoir to merge in. Its targets
+                may be larger than ours, but not smaller.
+            seen (DigestSet): Priorities seen before the other reservoir's
+                candidates, which are skipped, or None.
+
+        Returns:
+            list: Labels whose skipped candidates left the other reservoir
+                short of our target after it had dropped candidates, so
+                the merged sample of those labels may be incomplete.
+        """
+        short = []
+        for label, kept in other._kept.items():  # pylint: disable=protected-access
+            merged = 0
+            for priority, item in kept.items():
+                if seen is None or priority not in seen:
+                    self.offer(label, priority, item)
+                    merged += 1
+            if merged < self.targets[label] and len(kept) >= other.targets[label]:
+                short.append(label)
+        return short
+
+    def samples(self, label: int) -> list:
+        """
+        Get the kept candidates of a label, ordered by priority.
+
+        Args:
+            label (int): The label.
+
+        Returns:
+            list: The kept items.
+        """
+        return [item for _, item in sorted(self._kept.get(label, {}).items())]
+
+
+def seeded_digest(data: bytes, seed: int) -> int:
+    """
+    Hash data into an unsigned 64-bit integer keyed by a seed.
+
+    Args:
+        data (bytes): The data to hash.
+        seed (int): The random seed.
+
+    Returns:
+        int: The digest.
+    """
+    hasher = _seeded_hasher(seed)
+    hasher.update(data)
+    return int.from_bytes(hasher.digest(), 'little')
+
+
+def _seeded_hasher(seed: int):
+    """Create a keyed hasher; copying it is cheaper than re-keying per line."""
+    return hashlib.blake2b(digest_size=8, key=str(seed).encode('ascii'))
+
+
+# pylint: disable-next=too-many-arguments,too-many-positional-arguments,too-many-locals
 def load_bgl_data(
     file_path: str,
     total_samples: int,
     normal_ratio: float,
-    seed: int
+    seed: int,
+    mine_templates: bool = False,
+    streaming: bool = False,
+    workers: int = 1,
+    engine: str = "text"
 ) -> list:
     """
     Load and parse BGL log data, then create stratified random subsamples.
@@ -58,68 +405,87 @@ def load_bgl_data(
     Deduplicates samples by text content to prevent data leakage between
     train and dev sets.
 
+    In streaming mode the file is read in a single pass with a per-label
+    ReservoirSampler, so only the samples being kept are held in memory.
+    Duplicates are counted with a DigestSet of fixed-width text digests.
+
+    With more than one worker the file is split into newline-aligned byte
+    ranges that are parsed in a process pool. Partial results are merged
+    in file order (full mode) or through the reservoirs (streaming mode),
+    so the output for a given seed does not depend on the worker count.
+
+    Compressed logs (gzip, xz or zstd, detected from their leading bytes)
+    are decompressed as they are parsed, in a background thread, and
+    several files (a list or glob pattern) are read as one log. A worker
+    pool splits plain files into byte ranges and parses compressed files
+    whole, one per worker.
+
     Args:
-        file_path (str): Path to the BGL.log file.
+        file_path (str | list): Path to the BGL.log file, optionally
+            compressed, a glob pattern, or a list of them.
         total_samples (int): Target total number of samples in output.
         normal_ratio (float): Ratio of NORMAL samples.
         seed (int): Random seed for reproducibility.
+        mine_templates (bool): Add 'template' and 'template_id' to every
+            sample using a TemplateMiner.
+        streaming (bool): Sample in a single bounded-memory pass.
+        workers (int): Number of parse processes.
+        engine (str): 'text' parses decoded lines with parse_bgl_line,
+            'mmap' parses bytes from a memory-mapped file with
+            iter_bgl_records. Both give the same samples.
 
     Returns:
         list: A list of parsed log dictionaries.
     """
     random.seed(seed)
 
-    print(f"Parsing entire BGL data from {file_path}...")
-
-    samples_by_label = defaultdict(list)
-    seen_texts = set()
-    duplicates_removed = 0
+    # Calculate target counts
+    normal_count = int(total_samples * normal_ratio)
+    targets = {LABEL_NORMAL: normal_count, LABEL_ANOMALY: total_samples - normal_count}
+    miner = TemplateMiner() if mine_templates else None
 
     try:
-        with open(file_path, "r", encoding="utf-8", errors="ignore") as file:
-            for line in file:
-                parsed = parse_bgl_line(line.strip())
-                if parsed:
-                    text = parsed['text']
-                    if text not in seen_texts:
-                        seen_texts.add(text)
-                        samples_by_label[parsed['label']].append(parsed)
-                    else:
-                        duplicates_removed += 1
-    except FileNotFoundError:
-        print(f"Error: BGL log file not found at {file_path}")
+        with profiling.stage("parse") as record:
+            files = resolve_inputs(file_path)
+            source = files[0] if len(files) == 1 else f"{len(files)} files"
+            if streaming:
+                print(f"Streaming BGL data from {source}...")
+                samples_by_label, record['items'] = _collect_streaming(
+                    files, targets, seed, workers, engine
+                )
+                if miner is not None:
+                    for samples in samples_by_label.values():
+                        for sample in samples:
+                            sample['template'] = miner.add(sample['text'])
+            else:
+                print(f"Parsing entire BGL data from {source}...")
+                samples_by_label, record['items'] = _collect_full(files, miner, workers, engine)
+    except FileNotFoundError as error:
+        print(f"Error: BGL log file not found at {error.filename or error}")
         return []
 
-    print(f"Parsed {sum(len(v) for v in samples_by_label.values())} unique samples "
-          f"({duplicates_removed} duplicates removed)")
-    print(f"  NORMAL ({LABEL_NORMAL}): {len(samples_by_label.get(LABEL_NORMAL, []))} samples")
-    print(f"  ANOMALY ({LABEL_ANOMALY}): {len(samples_by_label.get(LABEL_ANOMALY, []))} samples")
+    if miner is not None:
+        print(f"  Mined {len(miner)} templates")
 
-    # Calculate target counts
-    normal_count = int(total_samples * normal_ratio)
-    anomaly_count = total_samples - normal_count
-
-    # Sample from each class
-    dataset = []
-
-    # Sample NORMAL
-    normal_samples = samples_by_label.get(LABEL_NORMAL, [])
-    if len(normal_samples) >= normal_count:
-        dataset.extend(random.sample(normal_samples, normal_count))
-    else:
-        dataset.extend(normal_samples)
-        print(f"Warning: Only {len(normal_samples)} NORMAL samples available")
-
-    # Sample ANOMALY
-    anomaly_samples = samples_by_label.get(LABEL_ANOMALY, [])
-    if len(anomaly_samples) >= anomaly_count:
-        dataset.extend(random.sample(anomaly_samples, anomaly_count))
-    else:
-        dataset.extend(anomaly_samples)
-        print(f"Warning: Only {len(anomaly_samples)} ANOMALY samples available")
-
-    # Shuffle the final dataset
-    random.shuffle(dataset)
+    with profiling.stage("sample") as record:
+        # Sample from each class
+        dataset = []
+        for label, count in targets.items():
+            samples = samples_by_label.get(label, [])
+            if len(samples) >= count:
+                # Reservoirs already hold exactly the target count
+                dataset.extend(samples if streaming else random.sample(samples, count))
+            else:
+                dataset.extend(samples)
+                print(f"Warning: Only {len(samples)} {LABEL_NAMES[label]} samples available")
+
+        # Shuffle the final dataset
+        random.shuffle(dataset)
+
+        if miner is not None:
+            for sample in dataset:
+                sample['template_id'] = TemplateMiner.template_id(sample['template'])
+        record['items'] = len(dataset)
 
     print(f"\nFinal dataset: {len(dataset)} samples")
     normal_final = sum(1 for s in dataset if s['label'] == LABEL_NORMAL)
@@ -130,3 +496,236 @@ def load_bgl_data(
           f"({anomaly_final / len(dataset) * 100:.1f}%)")
 
     return dataset
+
+
+def _collect_full(files: list, miner: TemplateMiner = None, workers: int = 1,
+                  engine: str = "text") -> tuple:
+    """Parse the whole log; return every unique sample by label and the line count."""
+    samples_by_label = defaultdict(list)
+    seen_texts = set()
+    duplicates_removed = 0
+
+    # Ranges come back in file order, so keeping the first occurrence of
+    # each text reproduces the single-process result exactly
+    for result in _scan_files(files, workers, engine, mine_templates=miner is not None):
+        duplicates_removed += result['duplicates']
+        for label, samples in result['samples'].items():
+            for parsed in samples:
+                text = parsed['text']
+                if text not in seen_texts:
+                    seen_texts.add(text)
+                    if miner is not None:
+                        parsed['template'] = miner.record(parsed['template'])
+                    samples_by_label[label].append(parsed)
+                else:
+                    duplicates_removed += 1
+
+    print(f"Parsed {sum(len(v) for v in samples_by_label.values())} unique samples "
+          f"({duplicates_removed} duplicates removed)")
+    print(f"  NORMAL ({LABEL_NORMAL}): {len(samples_by_label.get(LABEL_NORMAL, []))} samples")
+    print(f"  ANOMALY ({LABEL_ANOMALY}): {len(samples_by_label.get(LABEL_ANOMALY, []))} samples")
+    unique = sum(len(samples) for samples in samples_by_label.values())
+    return samples_by_label, unique + duplicates_removed
+
+
+def _collect_streaming(files: list, targets: dict, seed: int, workers: int = 1,
+                       engine: str = "text") -> tuple:
+    """Stream the log through per-label reservoirs; return them and the line count."""
+    sampler = ReservoirSampler(targets)
+    seen = DigestSet()
+    label_counts = Counter()
+    parsed_lines = 0
+
+    tasks = _scan_tasks(files, workers, engine, targets=targets, seed=seed)
+    # Later parts keep extra candidates, since the texts an earlier part
+    # saw first are skipped when they are merged
+    headroom = {label: count * PART_SAMPLE_HEADROOM for label, count in targets.items()}
+    tasks[1:] = [_with_scan_args(task, targets=headroom) for task in tasks[1:]]
+
+    # Parts come back in file order, so the digests of earlier parts tell
+    # which texts a part did not see first. A part left short of candidates
+    # by skipping them is scanned again without them, so the samples do not
+    # depend on how the log was split.
+    for task, result in zip(tasks, _run_scans(tasks, workers)):
+        if sampler.merge(result['sampler'], seen):
+            rescan = _scan_range(_with_scan_args(task, targets=targets, exclude=seen))
+            sampler.merge(rescan['sampler'])
+        for digests in result['digests'].values():
+            seen.update(digests)
+        parsed_lines += result['parsed_lines']
+        label_counts.update(result['label_counts'])
+
+    print(f"Parsed {len(seen)} unique samples "
+          f"({parsed_lines - len(seen)} duplicates removed)")
+    print(f"  NORMAL ({LABEL_NORMAL}): {label_counts[LABEL_NORMAL]} lines")
+    print(f"  ANOMALY ({LABEL_ANOMALY}): {label_counts[LABEL_ANOMALY]} lines")
+    return {label: sampler.samples(label) for label in targets}, parsed_lines
+
+
+def _scan_files(files: list, workers: int, engine: str = "text", **scan_args) -> list:
+    """
+    Scan files in one process, or in parts across a process pool.
+
+    Returns the per-part scan results in file order. Scans sample into
+    reservoirs when ``targets`` and ``seed`` are given, and collect every
+    unique line otherwise.
+    """
+    return _run_scans(_scan_tasks(files, workers, engine, **scan_args), workers)
+
+
+def _scan_tasks(files: list, workers: int, engine: str = "text", **scan_args) -> list:
+    """
+    Split files into scan tasks, in file order.
+
+    Plain files are split into byte ranges when there is more than one
+    worker; compressed files cannot be split and are one task each.
+    """
+    if engine not in PARSE_ENGINES:
+        raise ValueError(f"Unknown parse engine: {engine}")
+
+    tasks = []
+    for file_path in files:
+        compression = detect_compression(file_path)
+        if compression is not None or workers <= 1:
+            tasks.append((file_path, 0, os.path.getsize(file_path), compression, engine,
+                          scan_args))
+        else:
+            tasks.extend((file_path, start, end, None, engine, scan_args)
+                         for start, end in _byte_ranges(file_path, workers))
+    return tasks
+
+
+def _with_scan_args(task: tuple, **scan_args) -> tuple:
+    """Copy a scan task with some of its scan arguments replaced."""
+    return task[:-1] + (dict(task[-1], **scan_args),)
+
+
+def _run_scans(tasks: list, workers: int) -> list:
+    """Run scan tasks in one process or a process pool; return results in task order."""
+    if workers <= 1 or len(tasks) == 1:
+        return [_scan_range(task) for task in tasks]
+
+    files = len({task[0] for task in tasks})
+    print(f"  Parsing {len(tasks)} parts of {files} files with {workers} workers")
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_scan_range, tasks))
+
+
+def _byte_ranges(file_path: str, workers: int) -> list:
+    """Split a file into newline-aligned (start, end) byte ranges."""
+    size = os.path.getsize(file_path)
+    count = max(workers * CHUNKS_PER_WORKER, -(-size // MAX_CHUNK_BYTES))
+
+    bounds = [0]
+    with open(file_path, "rb") as file:
+        for i in range(1, count):
+            # Start one byte early so a boundary already on a line start stays put
+            file.seek(max(size * i // count - 1, 0))
+            file.readline()
+            if bounds[-1] < file.tell() < size:
+                bounds.append(file.tell())
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _scan_range(task: tuple) -> dict:
+    """Process pool entry point: scan one byte range of a file, or a compressed file."""
+    file_path, start, end, compression, engine, scan_args = task
+    if compression is not None:
+        blocks = iter_decompressed_blocks(file_path, compression)
+        return _scan_records(_block_records(blocks, engine), **scan_args)
+
+    if engine == "mmap":
+        return _scan_records(iter_bgl_records(file_path, start, end), **scan_args)
+
+    if start == 0 and end == os.path.getsize(file_path):
+        with open(file_path, "r", encoding="utf-8", errors="ignore") as file:
+            return _scan_records(_text_records(file), **scan_args)
+
+    with open(file_path, "rb") as file:
+        file.seek(start)
+        data = file.read(end - start)
+    # Same decoding and newline handling as reading the file in text mode
+    lines = io.TextIOWrapper(io.BytesIO(data), encoding="utf-8", errors="ignore")
+    return _scan_records(_text_records(lines), **scan_args)
+
+
+def _block_records(blocks, engine: str):
+    """Parse blocks of whole lines into records, as the engine would parse the file."""
+    for block in blocks:
+        if engine == "mmap":
+            yield from _parse_block(block)
+        else:
+            # Blocks end at a line break, so decoding them one at a time
+            # matches reading the whole file in text mode
+            yield from _text_records(
+                io.TextIOWrapper(io.BytesIO(block), encoding="utf-8", errors="ignore")
+            )
+
+
+def _text_records(lines):
+    """Parse text lines with parse_bgl_line into (label, text) records."""
+    for line in lines:
+        parsed = parse_bgl_line(line.strip())
+        if parsed:
+            yield parsed['label'], parsed['text']
+
+
+def _as_text(content) -> str:
+    return content if isinstance(content, str) else content.decode("utf-8")
+
+
+def _scan_records(records, targets: dict = None, seed: int = None,
+                  mine_templates: bool = False, exclude: DigestSet = None) -> dict:
+    """
+    Collect unique samples, or sample into reservoirs if targets are given.
+
+    Records are (label, content) pairs whose content is text or UTF-8
+    bytes. Content is only decoded for samples that are kept.
+    """
+    if targets is not None:
+        return _scan_records_streaming(records, targets, seed, exclude)
+
+    samples_by_label = defaultdict(list)
+    seen = set()
+    duplicates = 0
+    for label, content in records:
+        if content not in seen:
+            seen.add(content)
+            parsed = {"text": _as_text(content), "label": label}
+            if mine_templates:
+                parsed['template'] = TemplateMiner.mask(parsed['text'])
+            samples_by_label[label].append(parsed)
+        else:
+            duplicates += 1
+    return {'samples': samples_by_label, 'duplicates': duplicates}
+
+
+def _scan_records_streaming(records, targets: dict, seed: int,
+                            exclude: DigestSet = None) -> dict:
+    """Offer every record to per-label reservoirs, skipping excluded digests."""
+    sampler = ReservoirSampler(targets)
+    digests = defaultdict(DigestSet)
+    label_counts = defaultdict(int)
+    parsed_lines = 0
+    seeded = _seeded_hasher(seed)
+    for label, content in records:
+        parsed_lines += 1
+        label_counts[label] += 1
+        hasher = seeded.copy()
+        hasher.update(content.encode("utf-8") if isinstance(content, str) else content)
+        priority = int.from_bytes(hasher.digest(), 'little')
+        # A text keeps the label of its first occurrence, as in full mode;
+        # repeats under the same label are already refused by the reservoir.
+        # Only candidates the reservoir would keep pay for the lookups.
+        if (sampler.accepts(label, priority)
+                and not any(priority in other for key, other in digests.items() if key != label)
+                and (exclude is None or priority not in exclude)):
+            sampler.offer(label, priority, {"text": _as_text(content), "label": label})
+        digests[label].add(priority)
+    return {
+        'sampler': sampler,
+        'digests': dict(digests),
+        'label_counts': dict(label_counts),
+        'parsed_lines': parsed_lines,
+    }
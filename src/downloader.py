@@ -3,13 +3,38 @@ Dataset downloader module.
 
 This module handles downloading and extracting the BGL dataset
 if it is not already present in the data directory.
+
+By default the compressed archive is streamed straight into tar
+extraction of BGL.log, so no tarball is written and there is no second
+extraction pass; a dropped connection is resumed with an HTTP Range
+request. With several workers the archive is instead fetched in parallel
+byte ranges into a resumable partial file, then extracted.
 """
 
+import gzip
+import hashlib
+import http.client
+import io
+import json
 import os
+import shutil
+import string
 import sys
 import tarfile
-import urllib.request
+import threading
+import time
 import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+LOG_MEMBER = "BGL.log"
+# Bytes moved per read while streaming
+BLOCK_SIZE = 1024 * 1024
+TIMEOUT = 60
+# gzip level for a log kept compressed; fast enough to keep pace with the download
+GZIP_LEVEL = 1
+# Algorithm of a checksum given as a bare hex digest
+DEFAULT_CHECKSUM_ALGORITHM = "sha256"
 
 
 def _make_progress_hook():
@@ -37,47 +62,329 @@ def _make_progress_hook():
     return hook
 
 
-def download_bgl(url: str, data_dir: str = "data"):
+def _parse_checksum(checksum: str) -> tuple:
+    """
+    Split a checksum such as 'md5:<hex>' or 'sha256:<hex>' into its parts.
+
+    A bare hex digest is taken to be DEFAULT_CHECKSUM_ALGORITHM.
+
+    Args:
+        checksum (str): The checksum string.
+
+    Returns:
+        tuple: The hashlib algorithm name and the lowercase hex digest.
+
+    Raises:
+        ValueError: If the algorithm is unknown or the digest is not a hex
+            digest of that algorithm.
+    """
+    algorithm, _, digest = checksum.strip().rpartition(":")
+    algorithm = algorithm.lower() or DEFAULT_CHECKSUM_ALGORITHM
+    digest = digest.lower()
+    if algorithm not in hashlib.algorithms_available:
+        raise ValueError(f"Unknown checksum algorithm {algorithm!r} in {checksum!r}")
+    if (any(char not in string.hexdigits for char in digest)
+            or len(digest) != hashlib.new(algorithm).digest_size * 2):
+        raise ValueError(f"Checksum {checksum!r} is not a {algorithm} hex digest")
+    return algorithm, digest
+
+
+def _make_hasher(expected: tuple):
+    """Create a hasher for a parsed (algorithm, digest) checksum, or None."""
+    return hashlib.new(expected[0]) if expected else None
+
+
+def _verify(hasher, expected: tuple):
+    """Compare a finished hasher with the parsed expected checksum."""
+    if hasher is None:
+        return
+    algorithm, digest = expected
+    if hasher.hexdigest() != digest:
+        raise ValueError(f"Checksum mismatch: expected {algorithm}:{digest}, "
+                         f"got {algorithm}:{hasher.hexdigest()}")
+    print(f"  Checksum verified ({algorithm}:{digest})")
+
+
+def _open_url(url: str, start: int = 0, end: int = None):
+    """Open a URL, requesting the byte range [start, end] when one is given."""
+    headers = {}
+    if start or end is not None:
+        headers['Range'] = f"bytes={start}-{'' if end is None else end}"
+    response = urllib.request.urlopen(  # pylint: disable=consider-using-with
+        urllib.request.Request(url, headers=headers), timeout=TIMEOUT
+    )
+    if headers and response.status != 206:
+        response.close()
+        raise urllib.error.URLError("server does not support range requests")
+    return response
+
+
+class ResumableStream(io.RawIOBase):
+    """
+    A readable HTTP response body that survives dropped connections.
+
+    When a read fails, the stream reconnects with a Range request for the
+    remaining bytes, so the consumer (e.g. a decompressor) sees one
+    uninterrupted byte stream. Bytes are hashed as they are read.
+    """
+
+    def __init__(self, url: str, retries: int = 3, hasher=None, progress=None):
+        """
+        Args:
+            url (str): The URL to stream.
+            retries (int): Reconnections allowed per read.
+            hasher: A hashlib object updated with every byte, or None.
+            progress (callable): A urllib-style progress hook, or None.
+        """
+        super().__init__()
+        self.url = url
+        self.retries = retries
+        self.hasher = hasher
+        self.progress = progress
+        self.position = 0
+        self.total = None
+        self._response = None
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        for attempt in range(self.retries + 1):
+            try:
+                if self._response is None:
+                    self._response = _open_url(self.url, self.position)
+                    if self.total is None:
+                        # A missing or malformed length only disables the progress bar
+                        length = self._response.headers.get('Content-Length', '').strip()
+                        self.total = int(length) if length.isdigit() else None
+                count = self._response.readinto(buffer)
+                if count == 0 and self.total is not None and self.position < self.total:
+                    raise http.client.IncompleteRead(b"", self.total - self.position)
+                break
+            except (OSError, http.client.HTTPException) as error:
+                self._close_response()
+                if attempt == self.retries:
+                    raise
+                print(f"\n  Connection lost after {self.position / (1024 * 1024):.1f} MB "
+                      f"({error}), resuming...")
+                time.sleep(min(2 ** attempt, 30))
+
+        if self.hasher is not None:
+            self.hasher.update(memoryview(buffer)[:count])
+        self.position += count
+        if self.progress is not None and self.total:
+            self.progress(self.position, 1, self.total)
+        return count
+
+    def close(self):
+        self._close_response()
+        super().close()
+
+    def _close_response(self):
+        if self._response is not None:
+            self._response.close()
+            self._response = None
+
+
+def extract_member(fileobj, member_name: str, dest: str, compress: bool = False) -> bool:
+    """
+    Extract one file from a gzip-compressed tar stream as it is read.
+
+    Args:
+        fileobj: A readable binary stream of the .tar.gz archive.
+        member_name (str): The file name to extract, matched on its basename.
+        dest (str): Where to write the file.
+        compress (bool): Write the file gzip-compressed.
+
+    Returns:
+        bool: Whether the member was found.
+    """
+    # 'r|gz' reads the archive strictly sequentially, without seeking
+    with tarfile.open(fileobj=fileobj, mode="r|gz") as tar:
+        for member in tar:
+            if member.isfile() and os.path.basename(member.name) == member_name:
+                with tar.extractfile(member) as source, \
+                        (gzip.open(dest, "wb", compresslevel=GZIP_LEVEL) if compress
+                         else open(dest, "wb")) as target:
+                    shutil.copyfileobj(source, target, BLOCK_SIZE)
+                return True
+    return False
+
+
+def _content_length(url: str) -> int:
+    """
+    Return the size of a resource that supports range requests, else None.
+
+    Any failure to learn the size (an HTTP or connection error, or a
+    missing or malformed Content-Range) returns None, so the caller falls
+    back to a single resumable stream.
+    """
+    try:
+        with _open_url(url, 0, 0) as response:
+            content_range = response.headers.get('Content-Range', '')
+    except (OSError, http.client.HTTPException, ValueError):
+        return None
+    total = content_range.rpartition("/")[2].strip()
+    return int(total) if total.isdigit() and int(total) > 0 else None
+
+
+# pylint: disable-next=too-many-arguments,too-many-positional-arguments,too-many-locals
+def fetch_ranges(url: str, path: str, total: int, workers: int, chunk_size: int,
+                 retries: int = 3):
+    """
+    Download a resource in parallel byte ranges into a file.
+
+    Completed ranges are recorded in a sidecar file, so an interrupted
+    download resumes with only the missing ranges.
+
+    Args:
+        url (str): The URL to download.
+        path (str): The file to write; preallocated to the full size.
+        total (int): The size of the resource in bytes.
+        workers (int): Concurrent connections.
+        chunk_size (int): Bytes per range request.
+        retries (int): Retries per range.
+    """
+    state_path = f"{path}.ranges"
+    done = set()
+    if os.path.exists(path) and os.path.exists(state_path):
+        with open(state_path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        if state.get('total') == total and state.get('chunk_size') == chunk_size:
+            done = set(state['done'])
+    if not done:
+        with open(path, "wb") as f:
+            f.truncate(total)
+
+    chunks = [index for index in range(-(-total // chunk_size)) if index not in done]
+    if done:
+        print(f"  Resuming: {len(done)} of {len(done) + len(chunks)} ranges already downloaded")
+    lock = threading.Lock()
+    received = [len(done) * chunk_size]
+    progress = _make_progress_hook()
+
+    def fetch(index: int):
+        start = index * chunk_size
+        length = min(chunk_size, total - start)
+        for attempt in range(retries + 1):
+            written = 0
+            try:
+                with _open_url(url, start, start + length - 1) as response, \
+                        open(path, "r+b") as f:
+                    f.seek(start)
+                    while block := response.read(BLOCK_SIZE):
+                        f.write(block)
+                        written += len(block)
+                        with lock:
+                            received[0] += len(block)
+                            progress(min(received[0], total), 1, total)
+                if written != length:
+                    raise http.client.IncompleteRead(b"", length - written)
+                break
+            except (OSError, http.client.HTTPException):
+                with lock:
+                    received[0] -= written
+                if attempt == retries:
+                    raise
+                time.sleep(min(2 ** attempt, 30))
+        with lock:
+            done.add(index)
+            with open(f"{state_path}.tmp", "w", encoding="utf-8") as f:
+                json.dump({'total': total, 'chunk_size': chunk_size, 'done': sorted(done)}, f)
+            os.replace(f"{state_path}.tmp", state_path)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for future in [executor.submit(fetch, index) for index in chunks]:
+            future.result()
+    os.remove(state_path)
+
+
+# pylint: disable-next=too-many-arguments,too-many-positional-arguments,too-many-locals
+def download_bgl(
+    url: str,
+    data_dir: str = "data",
+    checksum: str = None,
+    workers: int = 1,
+    chunk_mb: int = 16,
+    retries: int = 3,
+    compress: bool = False
+):
     """
     Download and extract the BGL dataset if BGL.log is missing.
 
     Args:
         url (str): The URL to download the BGL dataset from.
         data_dir (str): The directory to store the dataset in.
+        checksum (str): Expected archive checksum such as 'md5:<hex>' (a
+            bare hex digest is taken as sha256), or None to skip
+            verification.
+        workers (int): 1 streams the archive straight into extraction;
+            more fetch it in that many parallel byte ranges first.
+        chunk_mb (int): Range size in MB when fetching in parallel.
+        retries (int): Reconnections allowed per read or range.
+        compress (bool): Keep the log gzip-compressed as BGL.log.gz, which
+            load_bgl_data reads directly.
 
     Raises:
-        SystemExit: If the download fails after retries.
+        ValueError: If the checksum string is malformed.
+        SystemExit: If the download fails after retries or the checksum
+            does not match.
     """
-    log_file = os.path.join(data_dir, "BGL.log")
+    log_file = os.path.join(data_dir, f"{LOG_MEMBER}.gz" if compress else LOG_MEMBER)
     if os.path.exists(log_file):
         print(f"Dataset already exists at {log_file}")
         return
+    # Reject a malformed checksum before anything is downloaded
+    expected = _parse_checksum(checksum) if checksum else None
 
     os.makedirs(data_dir, exist_ok=True)
     tar_path = os.path.join(data_dir, "BGL.tar.gz")
+    # The log only takes its final name once it is complete and verified
+    part_path = f"{log_file}.part"
 
     print(f"Downloading BGL dataset from {url}...")
     print("  (This may take a few minutes depending on your connection)")
 
-    max_retries = 3
-    for attempt in range(1, max_retries + 1):
-        try:
-            urllib.request.urlretrieve(url, tar_path, _make_progress_hook())
-            break
-        except urllib.error.URLError as e:
-            if attempt < max_retries:
-                print(f"\n  Download failed (attempt {attempt}/{max_retries}): {e}")
-                print("  Retrying...")
-            else:
-                print(f"\n  Download failed after {max_retries} attempts: {e}")
-                print("  Please check your internet connection and try again.")
-                sys.exit(1)
-
-    print("Extracting dataset...")
-    with tarfile.open(tar_path, "r:gz") as tar:
-        tar.extractall(path=data_dir, filter="data")
-
-    print(f"Dataset ready at {log_file}")
+    try:
+        total = _content_length(url) if workers > 1 else None
+        if total is None:
+            if workers > 1:
+                print("  Server does not support range requests, streaming instead")
+            hasher = _make_hasher(expected)
+            stream = ResumableStream(url, retries, hasher, _make_progress_hook())
+            with io.BufferedReader(stream, BLOCK_SIZE) as reader:
+                found = extract_member(reader, LOG_MEMBER, part_path, compress)
+                # Read the archive's trailing padding so the checksum covers every byte
+                while reader.read(BLOCK_SIZE):
+                    pass
+        else:
+            print(f"  Fetching {total / (1024 * 1024):.1f} MB in parallel ranges "
+                  f"with {workers} connections")
+            fetch_ranges(url, tar_path, total, workers, chunk_mb * 1024 * 1024, retries)
+            hasher = _make_hasher(expected)
+            if hasher is not None:
+                with open(tar_path, "rb") as f:
+                    while block := f.read(BLOCK_SIZE):
+                        hasher.update(block)
+            print("Extracting dataset...")
+            with open(tar_path, "rb") as f:
+                found = extract_member(f, LOG_MEMBER, part_path, compress)
+        _verify(hasher, expected)
+    except (OSError, http.client.HTTPException, tarfile.TarError, ValueError) as e:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        if isinstance(e, ValueError) and os.path.exists(tar_path):
+            # A corrupt archive must be fetched again, not resumed
+            os.remove(tar_path)
+        print(f"\n  Download failed: {e}")
+        print("  Please check your internet connection and try again.")
+        sys.exit(1)
 
     if os.path.exists(tar_path):
         os.remove(tar_path)
+    if not found:
+        print(f"  The archive does not contain {LOG_MEMBER}")
+        sys.exit(1)
+
+    os.replace(part_path, log_file)
+    print(f"Dataset ready at {log_file}")
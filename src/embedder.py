@@ -2,43 +2,371 @@
 Embedding generator module.
 
 This module converts text logs into numerical embeddings using a
-pre-trained model from Sentence Transformers.
+pre-trained model from Sentence Transformers, run either by PyTorch or,
+for faster CPU inference, by ONNX Runtime from an exported and optionally
+int8-quantized copy of the model.
 """
 
+import glob
+import os
+import platform
+import re
+import time
+
+import numpy as np
+import torch
 from sentence_transformers import SentenceTransformer
+from sentence_transformers.util import batch_to_device
 from tqdm import tqdm
 
+# Rough characters-per-token ratio used to bucket texts by length without
+# tokenizing them twice
+CHARS_PER_TOKEN = 4
+# Inference backends: the reference PyTorch model, or an ONNX Runtime export
+BACKENDS = ('torch', 'onnx')
+# Weight precisions; int8 dynamically quantizes the ONNX export
+PRECISIONS = ('fp32', 'int8')
 
-class Embedder:
+
+def quantization_config() -> str:
     """
-    Handles generation of text embeddings.
+    Pick the ONNX Runtime dynamic quantization config for this CPU.
+
+    Returns:
+        str: 'arm64', 'avx512_vnni', 'avx512' or 'avx2'.
+    """
+    if platform.machine().lower() in ('arm64', 'aarch64'):
+        return 'arm64'
+    try:
+        with open('/proc/cpuinfo', 'r', encoding='utf-8') as f:
+            flags = f.read()
+    except OSError:
+        flags = ''
+    if 'avx512_vnni' in flags:
+        return 'avx512_vnni'
+    return 'avx512' if 'avx512f' in flags else 'avx2'
+
+
+def _find_file(directory: str, name: str) -> str:
+    """Return the path of a file below a directory, relative to it, or None."""
+    matches = sorted(glob.glob(os.path.join(directory, '**', name), recursive=True))
+    return os.path.relpath(matches[0], directory) if matches else None
+
+
+def export_onnx(model_name: str, export_dir: str, precision: str = 'fp32') -> tuple:
     """
+    Export a model to ONNX once, dynamically quantizing it for int8.
 
-    # pylint: disable=too-few-public-methods
+    Later calls find the export on disk and return right away, so processes
+    sharing an export directory should export it once up front.
 
-    def __init__(self, model_name: str):
+    Args:
+        model_name (str): The name or path of the model.
+        export_dir (str): The root directory of ONNX exports.
+        precision (str): 'fp32' or 'int8'.
+
+    Returns:
+        tuple: (export directory, ONNX file name relative to it).
+    """
+    directory = os.path.join(export_dir, re.sub(r'[^A-Za-z0-9_.-]', '_', model_name))
+    config = quantization_config()
+    name = 'model.onnx' if precision == 'fp32' else f'model_qint8_{config}.onnx'
+    file_name = _find_file(directory, name)
+    if file_name is not None:
+        return directory, file_name
+
+    print(f"Exporting {model_name} to ONNX ({precision}) in {directory}...")
+    # pylint: disable-next=import-outside-toplevel
+    from sentence_transformers import export_dynamic_quantized_onnx_model
+
+    model = SentenceTransformer(directory if _find_file(directory, 'model.onnx') else model_name,
+                                backend='onnx', trust_remote_code=True)
+    model.save_pretrained(directory)
+    if precision == 'int8':
+        export_dynamic_quantized_onnx_model(model, config, directory, file_suffix=f"qint8_{config}")
+    return directory, _find_file(directory, name)
+
+
+class Embedder:
+    """
+    Handles generation of text embeddings.
+    """
 
+    # pylint: disable-next=too-many-arguments,too-many-positional-arguments
+    def __init__(
+        self,
+        model_name: str,
+        backend: str = 'torch',
+        precision: str = 'fp32',
+        max_seq_length: int = None,
+        threads: int = None,
+        export_dir: str = 'data/onnx_models'
+    ):
         """
         Initialize the embedder with a specific model.
 
         Args:
             model_name (str): The name or path of the model to load.
+            backend (str): 'torch' runs the model with PyTorch; 'onnx' runs
+                an ONNX export of it with ONNX Runtime.
+            precision (str): 'fp32', or 'int8' for a dynamically quantized
+                ONNX export.
+            max_seq_length (int): Tokens kept per text, or None for the
+                model's own limit.
+            threads (int): Intra-op CPU threads, or None for the default.
+            export_dir (str): Where ONNX exports are kept.
+
+        Raises:
+            ValueError: For an unknown backend or precision, or int8 without
+                the onnx backend.
+            ImportError: For the onnx backend without ONNX Runtime.
         """
-        print(f"Loading embedding model: {model_name}...")
-        self.model = SentenceTransformer(model_name, trust_remote_code=True)
+        if backend not in BACKENDS or precision not in PRECISIONS:
+            raise ValueError(f"Unknown embedding backend/precision: {backend}/{precision}")
+        if precision == 'int8' and backend != 'onnx':
+            raise ValueError("int8 precision needs the onnx backend")
+        self.backend = backend
+        self.precision = precision
+
+        print(f"Loading embedding model: {model_name} ({backend}, {precision})...")
+        if threads:
+            torch.set_num_threads(threads)
+        if backend == 'torch':
+            self.model = SentenceTransformer(model_name, trust_remote_code=True)
+        else:
+            try:
+                import onnxruntime  # pylint: disable=import-outside-toplevel
+            except ImportError as error:
+                raise ImportError("The onnx embedding backend needs ONNX Runtime and Optimum "
+                                  "(pip install 'sentence-transformers[onnx]')") from error
+            session_options = onnxruntime.SessionOptions()
+            if threads:
+                session_options.intra_op_num_threads = threads
+            directory, file_name = export_onnx(model_name, export_dir, precision)
+            self.model = SentenceTransformer(
+                directory, backend='onnx', trust_remote_code=True,
+                model_kwargs={'file_name': file_name, 'provider': 'CPUExecutionProvider',
+                              'session_options': session_options}
+            )
+        if max_seq_length:
+            # Log lines are short; a lower cap bounds the cost of the odd long one
+            self.model.max_seq_length = max_seq_length
 
-    def generate_embeddings(self, texts: list) -> list:
+    def generate_embeddings(
+        self,
+        texts: list,
+        batch_size: int = 1,
+        max_batch_tokens: int = None
+    ) -> np.ndarray:
         """
-        Generate embeddings for a list of texts one by one.
+        Generate embeddings for a list of texts.
+
+        With ``batch_size`` of 1 every text is encoded on its own. Larger
+        values switch to batched encoding, where texts are sorted by their
+        estimated token length so that each batch holds texts of similar
+        size and wastes little work on padding. Results are always returned
+        in input order.
 
         Args:
             texts (list): A list of strings to embed.
+            batch_size (int): Maximum number of texts per forward pass.
+            max_batch_tokens (int): Maximum padded tokens per forward pass,
+                as estimated from character counts, or None for no token
+                budget.
 
         Returns:
-            list: A list of embeddings (each embedding is a list of floats).
+            np.ndarray: A float32 matrix with one embedding per row.
+        """
+        start = time.perf_counter()
+        if batch_size <= 1:
+            embeddings = np.array([
+                self.model.encode(text, show_progress_bar=False)
+                for text in tqdm(texts, desc="Generating embeddings")
+            ], dtype=np.float32)
+        else:
+            embeddings = self._encode_batched(texts, batch_size, max_batch_tokens)
+
+        elapsed = time.perf_counter() - start
+        if texts and elapsed > 0:
+            print(f"Embedded {len(texts)} lines in {elapsed:.1f}s "
+                  f"({len(texts) / elapsed:.1f} lines/sec)")
+        return embeddings
+
+    def encode_batch(self, texts: list) -> np.ndarray:
         """
-        embeddings = []
-        for text in tqdm(texts, desc="Generating embeddings"):
-            embedding = self.model.encode(text, show_progress_bar=False)
-            embeddings.append(embedding.tolist())
+        Encode a small batch in a single forward pass without progress output.
+
+        Args:
+            texts (list): A list of strings to embed.
+
+        Returns:
+            np.ndarray: A float32 matrix with one embedding per row.
+        """
+        return np.asarray(
+            self.model.encode(texts, batch_size=max(len(texts), 1), show_progress_bar=False,
+                              convert_to_numpy=True),
+            dtype=np.float32
+        )
+
+    def tokenize_batches(self, texts: list, batch_size: int, max_batch_tokens: int = None):
+        """
+        Tokenize texts in length-bucketed batches, ready for encode_tokens.
+
+        Args:
+            texts (list): A list of strings to embed.
+            batch_size (int): Maximum number of texts per batch.
+            max_batch_tokens (int): Maximum padded tokens per batch, or None.
+
+        Yields:
+            tuple: (indices into texts, tokenized features) per batch.
+        """
+        for batch in self._make_batches(texts, batch_size, max_batch_tokens):
+            yield batch, self.model.tokenize([texts[i] for i in batch])
+
+    def encode_tokens(self, features: dict) -> np.ndarray:
+        """
+        Run the model on one batch from tokenize_batches.
+
+        Args:
+            features (dict): Tokenized features of a batch.
+
+        Returns:
+            np.ndarray: A float32 matrix with one embedding per text.
+        """
+        features = batch_to_device(features, self.model.device)
+        with torch.inference_mode():
+            embeddings = self.model.forward(features)['sentence_embedding']
+        return embeddings.float().cpu().numpy()
+
+    def check_batch_parity(
+        self,
+        texts: list,
+        batch_size: int,
+        max_batch_tokens: int = None,
+        atol: float = 1e-3
+    ) -> float:
+        """
+        Compare batched encoding against the per-line path.
+
+        Args:
+            texts (list): A (small) list of strings to encode both ways.
+            batch_size (int): Batch size for the batched path.
+            max_batch_tokens (int): Token budget for the batched path.
+            atol (float): Largest tolerated absolute difference.
+
+        Returns:
+            float: The largest absolute difference between the two paths.
+        """
+        reference = np.array([
+            self.model.encode(text, show_progress_bar=False) for text in texts
+        ])
+        batched = self._encode_batched(texts, batch_size, max_batch_tokens)
+        max_diff = float(np.max(np.abs(reference - batched))) if texts else 0.0
+
+        status = "OK" if max_diff <= atol else "MISMATCH"
+        print(f"Batch parity on {len(texts)} lines: max abs diff {max_diff:.2e} "
+              f"(tolerance {atol:.0e}) {status}")
+        return max_diff
+
+    def check_backend_parity(
+        self,
+        reference: 'Embedder',
+        texts: list,
+        batch_size: int,
+        max_batch_tokens: int = None,
+        min_cosine: float = 0.99
+    ) -> dict:
+        """
+        Compare this embedder against a reference backend and time both.
+
+        Args:
+            reference (Embedder): Typically the PyTorch fp32 model.
+            texts (list): A (small) list of strings to encode with both.
+            batch_size (int): Batch size for both.
+            max_batch_tokens (int): Token budget for both.
+            min_cosine (float): Lowest tolerated cosine similarity of a row.
+
+        Returns:
+            dict: The mean and minimum row cosine similarity and the
+                lines/sec of both embedders.
+        """
+        report = {}
+        outputs = []
+        for name, embedder in (('reference', reference), ('candidate', self)):
+            # Warm up, so one-off allocations do not count
+            embedder.encode_batch(texts[:batch_size])
+            start = time.perf_counter()
+            # pylint: disable-next=protected-access
+            outputs.append(embedder._encode_batched(texts, batch_size, max_batch_tokens))
+            report[f"{name}_lines_per_sec"] = len(texts) / max(time.perf_counter() - start, 1e-9)
+
+        norms = np.linalg.norm(outputs[0], axis=1) * np.linalg.norm(outputs[1], axis=1)
+        cosine = (outputs[0] * outputs[1]).sum(axis=1) / np.maximum(norms, 1e-12)
+        report['cosine_mean'] = float(cosine.mean()) if texts else 1.0
+        report['cosine_min'] = float(cosine.min()) if texts else 1.0
+        report['speedup'] = report['candidate_lines_per_sec'] / report['reference_lines_per_sec']
+
+        status = "OK" if report['cosine_min'] >= min_cosine else "MISMATCH"
+        print(f"Backend parity on {len(texts)} lines ({self.backend}/{self.precision}, "
+              f"{self.model.max_seq_length} tokens vs {reference.backend}/{reference.precision}): "
+              f"cosine mean {report['cosine_mean']:.4f}, min {report['cosine_min']:.4f} "
+              f"(threshold {min_cosine}) {status}")
+        print(f"  {report['reference_lines_per_sec']:.1f} vs "
+              f"{report['candidate_lines_per_sec']:.1f} lines/sec ({report['speedup']:.2f}x)")
+        return report
+
+    def _token_estimates(self, texts: list) -> list:
+        """
+        Estimate the number of tokens the model will see for each text.
+
+        Character counts are a cheap proxy: tokenizing every text here would
+        double the tokenizer work, since each batch is tokenized again for
+        the forward pass.
+        """
+        limit = self.model.max_seq_length or float('inf')
+        return [min(len(text) // CHARS_PER_TOKEN + 1, limit) for text in texts]
+
+    def _make_batches(self, texts: list, batch_size: int, max_batch_tokens: int) -> list:
+        """
+        Group text indices into length-bucketed batches.
+
+        Texts are visited longest first, so the first text of a batch sets
+        its (estimated) padded length and the token budget can be checked
+        up front.
+        """
+        lengths = self._token_estimates(texts)
+        order = sorted(range(len(texts)), key=lambda i: lengths[i], reverse=True)
+
+        batches = []
+        current = []
+        for index in order:
+            padded_tokens = lengths[current[0]] * (len(current) + 1) if current else 0
+            if current and (len(current) >= batch_size or
+                            (max_batch_tokens and padded_tokens > max_batch_tokens)):
+                batches.append(current)
+                current = []
+            current.append(index)
+        if current:
+            batches.append(current)
+        return batches
+
+    def _encode_batched(self, texts: list, batch_size: int, max_batch_tokens: int) -> np.ndarray:
+        """Encode texts in length-bucketed batches and restore input order."""
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+
+        batches = self._make_batches(texts, batch_size, max_batch_tokens)
+        embeddings = None
+        with tqdm(total=len(texts), desc="Generating embeddings") as progress:
+            for batch in batches:
+                encoded = self.model.encode(
+                    [texts[i] for i in batch],
+                    batch_size=len(batch),
+                    show_progress_bar=False,
+                    convert_to_numpy=True
+                )
+                if embeddings is None:
+                    embeddings = np.empty((len(texts), encoded.shape[1]), dtype=np.float32)
+                embeddings[batch] = encoded
+                progress.update(len(batch))
         return embeddings
@@ -0,0 +1,249 @@
+"""
+Embedding cache module.
+
+This module keeps a persistent, content-addressed cache of embeddings so
+that texts already embedded with a given model are never encoded again.
+Entries are keyed by the model name and a digest of the text.
+"""
+
+import hashlib
+import json
+import os
+import re
+
+import numpy as np
+
+DIGEST_SIZE = 16
+KEYS_FILE = "keys.bin"
+VECTORS_FILE = "vectors.bin"
+META_FILE = "meta.json"
+# Fraction of max_bytes kept after an eviction, so evictions are not
+# triggered again by the very next insert
+EVICTION_TARGET = 0.9
+
+
+def text_digest(text: str) -> bytes:
+    """
+    Compute the fixed-width digest used as a cache key.
+
+    Args:
+        text (str): The text to hash.
+
+    Returns:
+        bytes: A 16-byte BLAKE2b digest.
+    """
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=DIGEST_SIZE).digest()
+
+
+class EmbeddingCache:
+    """
+    Append-only on-disk embedding cache for a single model.
+
+    Each model gets its own directory with two append-only files: the
+    concatenated text digests and the matching float32 vectors. An
+    optional size limit evicts the least recently used entries.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+    def __init__(self, cache_dir: str, model_name: str, max_bytes: int = None):
+        """
+        Open (or create) the cache for a model.
+
+        Args:
+            cache_dir (str): The root cache directory.
+            model_name (str): The embedding model the vectors belong to.
+            max_bytes (int): Size limit of the vector file, or None for no limit.
+        """
+        safe_name = re.sub(r'[^A-Za-z0-9_.-]', '_', model_name)
+        self.path = os.path.join(cache_dir, safe_name)
+        self.model_name = model_name
+        self.max_bytes = max_bytes
+        self.dim = None
+        self.hits = 0
+        self.misses = 0
+
+        self._index = {}
+        self._last_used = {}
+        self._tick = 0
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    @property
+    def stats(self) -> dict:
+        """dict: Hit/miss counters and the current size of the cache."""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': len(self._index),
+            'bytes': len(self._index) * self._row_bytes(),
+        }
+
+    def get_many(self, texts: list) -> list:
+        """
+        Look up cached embeddings.
+
+        Args:
+            texts (list): The texts to look up.
+
+        Returns:
+            list: One float32 vector per text, or None for cache misses.
+        """
+        vectors = self._open_vectors()
+        results = []
+        for text in texts:
+            row = self._index.get(text_digest(text))
+            if row is None:
+                self.misses += 1
+                results.append(None)
+            else:
+                self.hits += 1
+                self._touch(row)
+                results.append(np.array(vectors[row]))
+        return results
+
+    def put_many(self, texts: list, embeddings):
+        """
+        Append embeddings for texts that are not cached yet.
+
+        Args:
+            texts (list): The embedded texts.
+            embeddings: A 2-D array with one row per text.
+
+        Raises:
+            ValueError: If the embedding width does not match the cache.
+        """
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        if not texts:
+            return
+        if self.dim is None:
+            self.dim = matrix.shape[1]
+            os.makedirs(self.path, exist_ok=True)
+            with open(os.path.join(self.path, META_FILE), 'w', encoding='utf-8') as f:
+                json.dump({'model': self.model_name, 'dim': self.dim, 'dtype': 'float32'}, f)
+        elif matrix.shape[1] != self.dim:
+            raise ValueError(f"Cache holds {self.dim}-d vectors, got {matrix.shape[1]}-d")
+
+        new_keys = []
+        new_rows = []
+        for text, vector in zip(texts, matrix):
+            digest = text_digest(text)
+            if digest in self._index:
+                continue
+            self._index[digest] = len(self._index)
+            self._touch(self._index[digest])
+            new_keys.append(digest)
+            new_rows.append(vector)
+
+        if new_keys:
+            # Vectors go first so a crash never leaves a key without its row
+            with open(os.path.join(self.path, VECTORS_FILE), 'ab') as f:
+                f.write(np.asarray(new_rows, dtype=np.float32).tobytes())
+            with open(os.path.join(self.path, KEYS_FILE), 'ab') as f:
+                f.write(b"".join(new_keys))
+
+        if self.max_bytes and len(self._index) * self._row_bytes() > self.max_bytes:
+            self._evict()
+
+    def _row_bytes(self) -> int:
+        return (self.dim or 0) * np.dtype(np.float32).itemsize
+
+    def _touch(self, row: int):
+        self._tick += 1
+        self._last_used[row] = self._tick
+
+    def _open_vectors(self):
+        """Memory-map the vector file, or return None if it is empty."""
+        vectors_path = os.path.join(self.path, VECTORS_FILE)
+        if not self._index:
+            return None
+        return np.memmap(vectors_path, dtype=np.float32, mode='r',
+                         shape=(len(self._index), self.dim))
+
+    def _load(self):
+        """Read the key file and drop any partially written tail."""
+        meta_path = os.path.join(self.path, META_FILE)
+        if not os.path.exists(meta_path):
+            return
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            self.dim = json.load(f)['dim']
+
+        keys_path = os.path.join(self.path, KEYS_FILE)
+        vectors_path = os.path.join(self.path, VECTORS_FILE)
+        if not os.path.exists(keys_path) or not os.path.exists(vectors_path):
+            return
+
+        with open(keys_path, 'rb') as f:
+            keys = f.read()
+        vectors_size = os.path.getsize(vectors_path)
+        rows = min(len(keys) // DIGEST_SIZE, vectors_size // self._row_bytes())
+
+        for row in range(rows):
+            self._index[keys[row * DIGEST_SIZE:(row + 1) * DIGEST_SIZE]] = row
+
+        # Entries loaded from disk start out least recently used, oldest first
+        self._last_used = {row: row - rows for row in range(rows)}
+
+        if rows * DIGEST_SIZE != len(keys) or rows * self._row_bytes() != vectors_size:
+            self._rewrite(list(range(rows)))
+
+    def _evict(self):
+        """Keep the most recently used entries that fit in the size limit."""
+        keep_count = int(self.max_bytes * EVICTION_TARGET) // self._row_bytes()
+        by_recency = sorted(self._index.values(), key=lambda row: self._last_used[row])
+        keep = sorted(by_recency[len(by_recency) - keep_count:]) if keep_count else []
+        evicted = len(self._index) - len(keep)
+        self._rewrite(keep)
+        print(f"Embedding cache: evicted {evicted} entries, {len(self._index)} remain")
+
+    def _rewrite(self, keep_rows: list):
+        """Rewrite the cache files with only the given rows, in order."""
+        digests = {row: digest for digest, row in self._index.items()}
+        vectors = np.array(self._open_vectors()[keep_rows]) if keep_rows else np.empty(
+            (0, self.dim), dtype=np.float32)
+
+        for name, payload in ((VECTORS_FILE, vectors.tobytes()),
+                              (KEYS_FILE, b"".join(digests[row] for row in keep_rows))):
+            tmp_path = os.path.join(self.path, name + ".tmp")
+            with open(tmp_path, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp_path, os.path.join(self.path, name))
+
+        self._index = {digests[row]: new_row for new_row, row in enumerate(keep_rows)}
+        self._last_used = {new_row: self._last_used.get(row, 0)
+                           for new_row, row in enumerate(keep_rows)}
+
+
+def embed_with_cache(texts: list, encode, cache: EmbeddingCache = None) -> np.ndarray:
+    """
+    Embed texts, encoding only those missing from the cache.
+
+    Args:
+        texts (list): The texts to embed.
+        encode (callable): Maps a list of texts to a 2-D embedding array.
+        cache (EmbeddingCache): The cache to consult and fill, or None.
+
+    Returns:
+        np.ndarray: A float32 matrix with one embedding per text, in order.
+    """
+    cached = cache.get_many(texts) if cache is not None else [None] * len(texts)
+
+    missing = list(dict.fromkeys(text for text, vector in zip(texts, cached) if vector is None))
+    fresh = {}
+    if missing:
+        encoded = np.asarray(encode(missing), dtype=np.float32)
+        fresh = dict(zip(missing, encoded))
+        if cache is not None:
+            cache.put_many(missing, encoded)
+
+    if cache is not None:
+        stats = cache.stats
+        print(f"Embedding cache: {stats['hits']} hits, {stats['misses']} misses "
+              f"({stats['hit_rate'] * 100:.1f}% hit rate), {stats['entries']} entries")
+
+    return np.array([
+        vector if vector is not None else fresh[text] for text, vector in zip(texts, cached)
+    ], dtype=np.float32)
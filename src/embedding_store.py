@@ -0,0 +1,369 @@
+"""
+Embedding store module.
+
+This module persists embeddings as a binary ``.npy`` matrix next to a
+compact JSON-lines sidecar holding the text and label of every row, so
+the matrix can be memory-mapped instead of parsed from JSON. The labels
+are also kept as a small memory-mapped array, so training can read them
+without parsing the sidecar. Stores can be
+written in one go or incrementally, chunk by chunk.
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+MATRIX_FILE = "embeddings.npy"
+RECORDS_FILE = "records.jsonl"
+LABELS_FILE = "labels.npy"
+# One code per row, indexing the sorted label names in the metadata
+LABEL_DTYPE = "int16"
+# Label codes rewritten at a time when close() sorts the label names
+LABEL_REMAP_ROWS = 1 << 20
+META_FILE = "meta.json"
+SUPPORTED_DTYPES = ("float32", "float16")
+# Sample fields kept in the sidecar; optional ones are written when present
+RECORD_FIELDS = ("text", "label", "template_id")
+
+
+def fingerprint_dataset(dataset: list, model_name: str, variant: str = "") -> str:
+    """
+    Fingerprint the rows of a dataset together with the embedding model.
+
+    Args:
+        dataset (list): Parsed log dictionaries with 'text' and 'label'.
+        model_name (str): The embedding model used for the rows.
+        variant (str): Any other setting that changes the embeddings,
+            e.g. embedding templates instead of raw text.
+
+    Returns:
+        str: A hex digest that changes whenever the rows or the model change.
+    """
+    seed = f"{model_name}|{variant}" if variant else model_name
+    digest = hashlib.blake2b(seed.encode('utf-8'), digest_size=16)
+    for sample in dataset:
+        digest.update(f"{sample['label']}\t{sample['text']}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+class EmbeddingStore:
+    """
+    An embedding matrix with one text/label record per row.
+
+    The store is a directory with four files: the ``.npy`` matrix, the
+    label codes, the JSON-lines sidecar and a small metadata file that is
+    written last and therefore marks the store as complete. The sidecar is
+    only parsed when records or texts are first used.
+    """
+
+    # pylint: disable-next=too-many-arguments,too-many-positional-arguments
+    def __init__(self, path: str, embeddings: np.ndarray, label_codes: np.ndarray,
+                 label_names: list, meta: dict):
+        """
+        Wrap already loaded store contents.
+
+        Args:
+            path (str): The store directory.
+            embeddings (np.ndarray): The (possibly memory-mapped) matrix.
+            label_codes (np.ndarray): The (possibly memory-mapped) index of
+                every row's label in label_names.
+            label_names (list): The distinct labels, sorted.
+            meta (dict): The store metadata.
+        """
+        self.path = path
+        self.embeddings = embeddings
+        self.label_codes = label_codes
+        self.label_names = label_names
+        self.meta = meta
+        self._records = None
+
+    def __len__(self) -> int:
+        return len(self.label_codes)
+
+    @property
+    def records(self) -> list:
+        """list: One dictionary with 'text', 'label' and any other RECORD_FIELDS per row."""
+        if self._records is None:
+            self._records = _read_records(self.path)
+        return self._records
+
+    @property
+    def texts(self) -> list:
+        """list: The text of every row."""
+        return [record['text'] for record in self.records]
+
+    @property
+    def labels(self) -> list:
+        """list: The label of every row."""
+        return [self.label_names[code] for code in self.label_codes.tolist()]
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        """
+        Check whether a complete store exists at the given path.
+
+        Args:
+            path (str): The store directory.
+
+        Returns:
+            bool: True if the store metadata is present.
+        """
+        return os.path.exists(os.path.join(path, META_FILE))
+
+    @staticmethod
+    def read_meta(path: str) -> dict:
+        """
+        Read the metadata of a store without loading its contents.
+
+        Args:
+            path (str): The store directory.
+
+        Returns:
+            dict: The store metadata, or None if there is no complete store.
+        """
+        meta_path = os.path.join(path, META_FILE)
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    @classmethod
+    def save(
+        cls,
+        path: str,
+        dataset: list,
+        embeddings,
+        dtype: str = "float32",
+        meta: dict = None
+    ) -> "EmbeddingStore":
+        """
+        Write a dataset and its embeddings to a store directory.
+
+        Args:
+            path (str): The store directory to create or overwrite.
+            dataset (list): Parsed log dictionaries with 'text' and 'label'.
+            embeddings: A 2-D array (or nested list) with one row per sample.
+            dtype (str): On-disk float type, 'float32' or 'float16'.
+            meta (dict): Extra metadata to record, e.g. the model name.
+
+        Returns:
+            EmbeddingStore: The saved store.
+
+        Raises:
+            ValueError: If the dtype is unsupported or the row counts differ.
+        """
+        if dtype not in SUPPORTED_DTYPES:
+            raise ValueError(f"Unsupported embedding dtype: {dtype}")
+
+        matrix = np.asarray(embeddings, dtype=dtype)
+        if matrix.ndim != 2 or matrix.shape[0] != len(dataset):
+            raise ValueError(
+                f"Expected {len(dataset)} embedding rows, got shape {matrix.shape}"
+            )
+
+        writer = EmbeddingStoreWriter(path, len(dataset), dtype=dtype, meta=meta)
+        writer.write(0, dataset, matrix)
+        return writer.close()
+
+    @classmethod
+    def open(cls, path: str, mmap: bool = True) -> "EmbeddingStore":
+        """
+        Open an existing store.
+
+        Args:
+            path (str): The store directory.
+            mmap (bool): Memory-map the matrix read-only instead of reading it.
+
+        Returns:
+            EmbeddingStore: The opened store.
+
+        Raises:
+            FileNotFoundError: If the store is missing or incomplete.
+        """
+        meta = cls.read_meta(path)
+        if meta is None:
+            raise FileNotFoundError(f"No embedding store at {path}")
+
+        embeddings = np.load(os.path.join(path, MATRIX_FILE), mmap_mode='r' if mmap else None)
+
+        labels_path = os.path.join(path, LABELS_FILE)
+        if os.path.exists(labels_path):
+            return cls(path, embeddings, np.load(labels_path, mmap_mode='r' if mmap else None),
+                       meta['label_names'], meta)
+
+        # Stores written before the label codes existed
+        records = _read_records(path)
+        label_names = sorted({record['label'] for record in records})
+        codes = {label: code for code, label in enumerate(label_names)}
+        store = cls(path, embeddings,
+                    np.array([codes[record['label']] for record in records], dtype=LABEL_DTYPE),
+                    label_names, meta)
+        store._records = records  # pylint: disable=protected-access
+        return store
+
+    @classmethod
+    def import_legacy_json(
+        cls,
+        json_path: str,
+        path: str,
+        dtype: str = "float32",
+        model_name: str = None
+    ) -> "EmbeddingStore":
+        """
+        Convert a legacy ``*_with_embeddings.json`` file into a store.
+
+        Args:
+            json_path (str): The JSON file with 'text', 'label' and 'embedding'.
+            path (str): The store directory to write.
+            dtype (str): On-disk float type, 'float32' or 'float16'.
+            model_name (str): The model the legacy embeddings were made with,
+                used to fingerprint the imported rows.
+
+        Returns:
+            EmbeddingStore: The imported store.
+        """
+        print(f"Importing legacy embeddings from {json_path}...")
+        with open(json_path, 'r', encoding='utf-8') as f:
+            dataset = json.load(f)
+
+        embeddings = [sample['embedding'] for sample in dataset]
+        meta = {'source': json_path}
+        if model_name:
+            meta['embedding_model'] = model_name
+            meta['fingerprint'] = fingerprint_dataset(dataset, model_name)
+        return cls.save(path, dataset, embeddings, dtype=dtype, meta=meta)
+
+
+def _read_records(path: str) -> list:
+    """Parse the JSON-lines sidecar of a store."""
+    with open(os.path.join(path, RECORDS_FILE), 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+class EmbeddingStoreWriter:
+    """
+    Writes an embedding store incrementally.
+
+    The matrix is preallocated on disk and memory-mapped, so rows can be
+    written chunk by chunk without holding the whole store in memory.
+    Chunks must arrive in row order; the store only becomes visible to
+    EmbeddingStore.exists once close() writes its metadata.
+    """
+
+    def __init__(self, path: str, count: int, dtype: str = "float32", meta: dict = None):
+        """
+        Start writing a store.
+
+        Args:
+            path (str): The store directory to create or overwrite.
+            count (int): The total number of rows.
+            dtype (str): On-disk float type, 'float32' or 'float16'.
+            meta (dict): Extra metadata to record, e.g. the model name.
+
+        Raises:
+            ValueError: If the dtype is unsupported.
+        """
+        if dtype not in SUPPORTED_DTYPES:
+            raise ValueError(f"Unsupported embedding dtype: {dtype}")
+
+        self.path = path
+        self.dtype = dtype
+        self.meta = {**(meta or {}), 'label_names': []}
+        self.written = 0
+        self._matrix = None
+
+        os.makedirs(path, exist_ok=True)
+        meta_path = os.path.join(path, META_FILE)
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+        self._labels = np.lib.format.open_memmap(
+            os.path.join(path, LABELS_FILE), mode='w+', dtype=LABEL_DTYPE, shape=(count,)
+        )
+        # pylint: disable-next=consider-using-with
+        self._records = open(os.path.join(path, RECORDS_FILE), 'w', encoding='utf-8')
+
+    @property
+    def count(self) -> int:
+        """int: The total number of rows."""
+        return len(self._labels)
+
+    def write(self, start: int, samples: list, embeddings):
+        """
+        Write the next chunk of rows.
+
+        Args:
+            start (int): The row of the first sample; must follow the
+                previous chunk.
+            samples (list): Parsed log dictionaries with 'text' and 'label'.
+            embeddings: A 2-D array with one row per sample.
+
+        Raises:
+            ValueError: If the chunk is out of order or the wrong shape.
+        """
+        if start != self.written:
+            raise ValueError(f"Expected rows from {self.written}, got {start}")
+        rows = np.asarray(embeddings)
+        if rows.ndim != 2 or rows.shape[0] != len(samples):
+            raise ValueError(f"Expected {len(samples)} embedding rows, got shape {rows.shape}")
+        if start + len(samples) > self.count:
+            raise ValueError(f"Store holds {self.count} rows, got row {start + len(samples)}")
+
+        if self._matrix is None:
+            self._matrix = np.lib.format.open_memmap(
+                os.path.join(self.path, MATRIX_FILE), mode='w+', dtype=self.dtype,
+                shape=(self.count, rows.shape[1])
+            )
+        self._matrix[start:start + len(samples)] = rows
+
+        # Codes follow first appearance here and are sorted by close()
+        label_names = self.meta['label_names']
+        for sample in samples:
+            if sample['label'] not in label_names:
+                label_names.append(sample['label'])
+        self._labels[start:start + len(samples)] = [label_names.index(sample['label'])
+                                                    for sample in samples]
+
+        for sample in samples:
+            record = {field: sample[field] for field in RECORD_FIELDS if field in sample}
+            self._records.write(json.dumps(record) + "\n")
+        self.written += len(samples)
+
+    def close(self) -> EmbeddingStore:
+        """
+        Finish the store by writing its metadata.
+
+        Returns:
+            EmbeddingStore: The written store, reopened memory-mapped.
+
+        Raises:
+            ValueError: If fewer rows than announced were written.
+        """
+        if self.written != self.count:
+            raise ValueError(f"Store expects {self.count} rows, {self.written} written")
+        self._records.close()
+        if self._matrix is None:
+            self._matrix = np.lib.format.open_memmap(
+                os.path.join(self.path, MATRIX_FILE), mode='w+', dtype=self.dtype,
+                shape=(0, 0)
+            )
+        self._matrix.flush()
+
+        label_names = self.meta['label_names']
+        order = sorted(label_names)
+        if label_names != order:
+            remap = np.array([order.index(label) for label in label_names], dtype=LABEL_DTYPE)
+            for start in range(0, self.count, LABEL_REMAP_ROWS):
+                chunk = self._labels[start:start + LABEL_REMAP_ROWS]
+                chunk[:] = remap[chunk]
+            label_names.sort()
+        self._labels.flush()
+
+        full_meta = dict(self.meta)
+        full_meta.update({'count': self._matrix.shape[0], 'dim': self._matrix.shape[1],
+                          'dtype': self.dtype})
+        with open(os.path.join(self.path, META_FILE), 'w', encoding='utf-8') as f:
+            json.dump(full_meta, f, indent=2)
+
+        return EmbeddingStore.open(self.path)
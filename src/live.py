@@ -0,0 +1,385 @@
+"""
+Live classification module.
+
+This module follows a growing BGL-format log with ``tail -f`` semantics,
+embeds new lines in micro-batches and classifies them with a persisted
+model, emitting anomalies as JSON lines.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import signal
+import sys
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+import numpy as np
+
+from src.config import load_config
+from src.data_loader import CONTENT_START_INDEX, LABEL_ANOMALY, TemplateMiner, parse_bgl_line
+from src.predictor import Predictor
+from src.window_features import WindowTracker
+
+# Number of recent latencies kept for the percentile counters
+LATENCY_WINDOW = 10000
+
+
+class LogFollower:
+    """
+    Follows a file as it grows, like ``tail -F``.
+
+    Only complete lines are returned. When the file is rotated (replaced by
+    a new file at the same path) or truncated, the rest of the old file is
+    drained and reading restarts at the beginning of the new one.
+    """
+
+    def __init__(self, path: str, from_start: bool = False):
+        """
+        Args:
+            path (str): The log file to follow.
+            from_start (bool): Read existing content instead of only new lines.
+        """
+        self.path = path
+        self.from_start = from_start
+        self._file = None
+        self._inode = None
+        self._partial = b""
+
+    def close(self):
+        """Close the followed file."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def read_lines(self) -> list:
+        """
+        Read the complete lines appended since the last call.
+
+        Returns:
+            list: The new lines as strings, without line endings.
+        """
+        if self._file is None and not self._open():
+            return []
+
+        data = self._file.read()
+        if data or not self._rotated():
+            return self._split(data)
+
+        # Drain anything written to the old file before the switch; its
+        # unterminated last line is complete now that the file is done
+        lines = self._split(self._file.read())
+        if self._partial:
+            lines.append(self._partial.decode("utf-8", errors="ignore"))
+        self.close()
+        self.from_start = True
+        if self._open():
+            lines.extend(self._split(self._file.read()))
+        return lines
+
+    def _split(self, data: bytes) -> list:
+        if not data:
+            return []
+        *lines, self._partial = (self._partial + data).split(b"\n")
+        return [line.decode("utf-8", errors="ignore") for line in lines]
+
+    def _open(self) -> bool:
+        try:
+            self._file = open(self.path, "rb")  # pylint: disable=consider-using-with
+        except FileNotFoundError:
+            return False
+        self._inode = os.fstat(self._file.fileno()).st_ino
+        self._partial = b""
+        if not self.from_start:
+            self._file.seek(0, os.SEEK_END)
+        return True
+
+    def _rotated(self) -> bool:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        return stat.st_ino != self._inode or stat.st_size < self._file.tell()
+
+
+class MicroBatcher:
+    """
+    Collects items until a batch is full or its oldest item is too old.
+    """
+
+    def __init__(self, max_size: int, max_delay: float):
+        """
+        Args:
+            max_size (int): Flush once this many items are waiting.
+            max_delay (float): Flush once the oldest item waited this long (s).
+        """
+        self.max_size = max_size
+        self.max_delay = max_delay
+        self.items = []
+        self._oldest = None
+
+    def add(self, item, arrival: float):
+        """
+        Queue an item.
+
+        Args:
+            item: The item to queue.
+            arrival (float): When the item arrived (time.monotonic()).
+        """
+        if not self.items:
+            self._oldest = arrival
+        self.items.append(item)
+
+    def ready(self, now: float) -> bool:
+        """
+        Check whether the batch should be flushed.
+
+        Args:
+            now (float): The current time (time.monotonic()).
+
+        Returns:
+            bool: True if the batch is full or past its deadline.
+        """
+        return bool(self.items) and (
+            len(self.items) >= self.max_size or now - self._oldest >= self.max_delay
+        )
+
+    def time_to_deadline(self, now: float) -> float:
+        """
+        Get the time left before the current batch must be flushed.
+
+        Args:
+            now (float): The current time (time.monotonic()).
+
+        Returns:
+            float: Seconds until the deadline, or None if nothing is queued.
+        """
+        if not self.items:
+            return None
+        return max(0.0, self._oldest + self.max_delay - now)
+
+    def drain(self) -> list:
+        """
+        Take all queued items.
+
+        Returns:
+            list: The queued items, oldest first.
+        """
+        items, self.items = self.items, []
+        return items
+
+
+class LatencyStats:
+    """
+    Throughput and end-to-end latency counters.
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.lines = 0
+        self.anomalies = 0
+        self.batches = 0
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def record(self, latencies: list, anomalies: int):
+        """
+        Record one flushed batch.
+
+        Args:
+            latencies (list): End-to-end latency of every line (s).
+            anomalies (int): Number of anomalies in the batch.
+        """
+        self.batches += 1
+        self.lines += len(latencies)
+        self.anomalies += anomalies
+        self._latencies.extend(latencies)
+
+    def summary(self) -> dict:
+        """
+        Get the current counters.
+
+        Returns:
+            dict: Line and anomaly counts, lines/sec and p50/p99 latency (ms)
+                over the most recent lines.
+        """
+        elapsed = time.monotonic() - self.started
+        latencies = np.array(self._latencies) * 1000
+        return {
+            'lines': self.lines,
+            'anomalies': self.anomalies,
+            'batches': self.batches,
+            'lines_per_sec': self.lines / elapsed if elapsed > 0 else 0.0,
+            'p50_ms': float(np.percentile(latencies, 50)) if len(latencies) else None,
+            'p99_ms': float(np.percentile(latencies, 99)) if len(latencies) else None,
+        }
+
+
+class LiveClassifier:
+    """
+    Embeds and classifies followed log lines in micro-batches.
+    """
+
+    # pylint: disable-next=too-many-arguments,too-many-positional-arguments
+    def __init__(self, embedder, predictor: Predictor, model: str, batcher: MicroBatcher,
+                 output=None):
+        """
+        Args:
+            embedder (Embedder): The embedder matching the trained model.
+            predictor (Predictor): The loaded inference artifact.
+            model (str): The name of the artifact model to classify with.
+            batcher (MicroBatcher): Decides when queued lines are classified.
+            output: Stream the anomaly JSON lines are written to.
+        """
+        self.embedder = embedder
+        self.predictor = predictor
+        self.model = model
+        self.batcher = batcher
+        self.output = output or sys.stdout
+        self.stats = LatencyStats()
+        # Artifacts trained with window features get them counted from the followed lines
+        self.tracker = None
+        if predictor.feature_joiner is not None:
+            self.tracker = WindowTracker(dict.fromkeys(predictor.feature_joiner.windows))
+            if self.tracker.names != predictor.feature_joiner.names:
+                raise ValueError(f"Unsupported window features: {predictor.feature_joiner.names}")
+
+    def submit(self, line: str, arrival: float):
+        """
+        Parse a raw log line and queue it for classification.
+
+        Args:
+            line (str): The raw BGL-format line.
+            arrival (float): When the line was read (time.monotonic()).
+        """
+        parsed = parse_bgl_line(line.strip())
+        if parsed:
+            counts = None
+            if self.tracker is not None:
+                counts = self.tracker.update(line.split(None, CONTENT_START_INDEX))
+            self.batcher.add((line, parsed['text'], arrival, counts), arrival)
+
+    def flush(self):
+        """
+        Classify every queued line and emit the anomalies.
+        """
+        batch = self.batcher.drain()
+        if not batch:
+            return
+
+        texts = [text for _, text, _, _ in batch]
+        if self.predictor.manifest.get('by_template'):
+            texts = [TemplateMiner.mask(text) for text in texts]
+        embeddings = self.embedder.encode_batch(texts)
+
+        window_counts = None
+        if self.tracker is not None:
+            window_counts = [counts for _, _, _, counts in batch]
+        predicted, scores = self.predictor.predict_and_score(
+            embeddings, self.model, LABEL_ANOMALY, window_counts
+        )
+
+        anomalies = 0
+        for (line, text, _, _), label, score in zip(batch, predicted, scores):
+            if label == LABEL_ANOMALY:
+                anomalies += 1
+                self.output.write(json.dumps({
+                    'time': datetime.now(timezone.utc).isoformat(),
+                    'model': self.model,
+                    'score': float(score),
+                    'text': text,
+                    'line': line,
+                }) + "\n")
+        self.output.flush()
+
+        done = time.monotonic()
+        self.stats.record([done - arrival for _, _, arrival, _ in batch], anomalies)
+
+    def run(self, follower: LogFollower, poll_interval: float, stats_interval: float = None):
+        """
+        Follow a log until interrupted.
+
+        Args:
+            follower (LogFollower): The followed log.
+            poll_interval (float): Seconds to wait when no new lines arrive.
+            stats_interval (float): Seconds between counter reports on stderr,
+                or None to only report on exit.
+        """
+        last_report = time.monotonic()
+        try:
+            while True:
+                lines = follower.read_lines()
+                arrival = time.monotonic()
+                for line in lines:
+                    self.submit(line, arrival)
+                    if self.batcher.ready(time.monotonic()):
+                        self.flush()
+
+                now = time.monotonic()
+                if self.batcher.ready(now):
+                    self.flush()
+                if stats_interval and now - last_report >= stats_interval:
+                    self._report()
+                    last_report = now
+
+                if not lines:
+                    deadline = self.batcher.time_to_deadline(time.monotonic())
+                    time.sleep(poll_interval if deadline is None else min(poll_interval, deadline))
+        except KeyboardInterrupt:
+            self.flush()
+        finally:
+            follower.close()
+            self._report()
+
+    def _report(self):
+        print(json.dumps({'stats': self.stats.summary()}), file=sys.stderr, flush=True)
+
+
+def _raise_interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def main():
+    """
+    Follow a BGL log and emit anomalies as JSON lines on stdout.
+    """
+    parser = argparse.ArgumentParser(
+        description="Classify a growing BGL-format log in real time."
+    )
+    parser.add_argument("log_path", help="log file to follow")
+    parser.add_argument("--config", default="config/config.yaml", help="config file")
+    parser.add_argument("--model", help="model name (default: live.model in the config)")
+    parser.add_argument("--artifact",
+                        help="artifact directory (default: the latest in artifact.dir)")
+    parser.add_argument("--from-start", action="store_true",
+                        help="classify existing lines before following")
+    args = parser.parse_args()
+
+    from src.embedder import Embedder  # pylint: disable=import-outside-toplevel
+
+    config = load_config(args.config)
+    live_config = config.get('live', {})
+    model_name = args.model or live_config.get('model', 'logistic_regression')
+    predictor = Predictor(args.artifact or config.get('artifact', {}).get(
+        'dir', 'output/artifacts'))
+
+    # stdout carries the anomaly stream, so keep loading messages off it
+    with contextlib.redirect_stdout(sys.stderr):
+        embedding_config = config.get('embedding', {})
+        embedder = Embedder(predictor.embedding_model, **predictor.embedding_options,
+                            threads=embedding_config.get('threads'),
+                            export_dir=embedding_config.get('export_dir', 'data/onnx_models'))
+    batcher = MicroBatcher(live_config.get('batch_size', 32),
+                           live_config.get('max_delay_ms', 200) / 1000)
+
+    # Stop cleanly (flush and report) when a service manager terminates us
+    signal.signal(signal.SIGTERM, _raise_interrupt)
+
+    print(f"Following {args.log_path} with {model_name}...", file=sys.stderr)
+    classifier = LiveClassifier(embedder, predictor, model_name, batcher)
+    classifier.run(
+        LogFollower(args.log_path, from_start=args.from_start),
+        poll_interval=live_config.get('poll_interval_ms', 100) / 1000,
+        stats_interval=live_config.get('stats_interval_s', 10)
+    )
@@ -0,0 +1,165 @@
+"""
+Log source module.
+
+This module resolves log inputs (paths, glob patterns or lists of them)
+and reads gzip, xz and zstd compressed logs as streams of whole lines,
+decompressing in a background thread so the parser never waits on a
+fully decompressed copy on disk.
+"""
+
+import glob
+import gzip
+import lzma
+import os
+import queue
+import threading
+
+# Leading bytes of the supported compressed formats
+COMPRESSION_MAGIC = {b"\x1f\x8b": "gzip", b"\xfd7zXZ\x00": "xz", b"\x28\xb5\x2f\xfd": "zstd"}
+# Decompressed bytes handed to the parser at once, and blocks decompressed
+# ahead of it by the background thread
+DECOMPRESS_BLOCK_BYTES = 4 * 1024 * 1024
+DECOMPRESS_QUEUE_BLOCKS = 4
+# Seconds between checks for an abandoned reader while the queue is full
+POLL_INTERVAL = 0.1
+
+
+def resolve_inputs(file_path) -> list:
+    """
+    Expand log paths and glob patterns into the files to read.
+
+    Args:
+        file_path (str | list): A path or glob pattern (e.g.
+            'data/nodes/*.log.gz'), or a list of them.
+
+    Returns:
+        list: The files, in the given order with each pattern's matches
+            sorted by name.
+
+    Raises:
+        FileNotFoundError: If a path does not exist or a pattern matches
+            nothing.
+    """
+    patterns = [file_path] if isinstance(file_path, (str, os.PathLike)) else file_path
+    files = []
+    for pattern in map(os.fspath, patterns):
+        if any(char in pattern for char in "*?["):
+            matches = sorted(glob.glob(pattern))
+        else:
+            matches = [pattern] if os.path.exists(pattern) else []
+        if not matches:
+            raise FileNotFoundError(pattern)
+        files.extend(matches)
+    return files
+
+
+def detect_compression(file_path: str) -> str:
+    """
+    Detect the compression of a file from its leading bytes.
+
+    Args:
+        file_path (str): The file to check.
+
+    Returns:
+        str: 'gzip', 'xz' or 'zstd', or None for an uncompressed file.
+    """
+    with open(file_path, "rb") as file:
+        head = file.read(max(len(magic) for magic in COMPRESSION_MAGIC))
+    for magic, compression in COMPRESSION_MAGIC.items():
+        if head.startswith(magic):
+            return compression
+    return None
+
+
+def open_decompressed(file_path: str, compression: str):
+    """
+    Open a compressed file for reading its decompressed bytes.
+
+    Args:
+        file_path (str): The compressed file.
+        compression (str): 'gzip', 'xz' or 'zstd'.
+
+    Returns:
+        A readable binary file object.
+
+    Raises:
+        ImportError: For zstd files if neither compression.zstd (Python
+            3.14+) nor the zstandard package is available.
+    """
+    if compression == "gzip":
+        return gzip.open(file_path, "rb")
+    if compression == "xz":
+        return lzma.open(file_path, "rb")
+    # pylint: disable=import-outside-toplevel,consider-using-with
+    try:
+        from compression import zstd
+        return zstd.open(file_path, "rb")
+    except ImportError:
+        pass
+    try:
+        import zstandard
+    except ImportError as error:
+        raise ImportError("Reading zstd-compressed logs needs Python 3.14+ or the "
+                          "zstandard package (pip install zstandard)") from error
+    return zstandard.ZstdDecompressor().stream_reader(
+        open(file_path, "rb"), read_across_frames=True, closefd=True
+    )
+
+
+def iter_decompressed_blocks(file_path: str, compression: str,
+                             block_bytes: int = DECOMPRESS_BLOCK_BYTES):
+    """
+    Read a compressed log as blocks of whole lines.
+
+    A background thread decompresses ahead of the consumer, so (as the
+    decompressors release the GIL) decompression overlaps with parsing.
+
+    Args:
+        file_path (str): The compressed file.
+        compression (str): 'gzip', 'xz' or 'zstd'.
+        block_bytes (int): Approximate decompressed bytes per block.
+
+    Yields:
+        bytes: Decompressed data ending at a line break (except possibly
+            the last block).
+    """
+    blocks = queue.Queue(DECOMPRESS_QUEUE_BLOCKS)
+    abandoned = threading.Event()
+
+    def put(item) -> bool:
+        while not abandoned.is_set():
+            try:
+                blocks.put(item, timeout=POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def decompress():
+        try:
+            with open_decompressed(file_path, compression) as stream:
+                tail = b""
+                while data := stream.read(block_bytes):
+                    cut = data.rfind(b"\n") + 1
+                    if not cut:
+                        tail += data
+                        continue
+                    if not put(tail + data[:cut]):
+                        return
+                    tail = data[cut:]
+                if tail and not put(tail):
+                    return
+            put(None)
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            put(error)
+
+    thread = threading.Thread(target=decompress, name=f"decompress-{file_path}", daemon=True)
+    thread.start()
+    try:
+        while (block := blocks.get()) is not None:
+            if isinstance(block, Exception):
+                raise block
+            yield block
+    finally:
+        abandoned.set()
+        thread.join()
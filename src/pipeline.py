@@ -0,0 +1,212 @@
+"""
+Ingestion pipeline module.
+
+This module runs embedding generation as a chain of concurrent stages
+connected by bounded queues: a reader that splits the dataset into chunks
+and looks them up in the embedding cache, a tokenizer, the model forward
+pass and a writer that appends finished chunks to the embedding store.
+Full queues block their producer, so memory stays bounded by the queue
+sizes and every stage keeps working while the others do.
+"""
+
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from src.embedding_store import EmbeddingStoreWriter
+
+# Seconds a blocked stage waits before checking whether the pipeline failed
+POLL_INTERVAL = 0.1
+
+
+@dataclass
+class _Chunk:
+    """A run of consecutive dataset rows travelling through the pipeline."""
+    start: int
+    samples: list
+    texts: list
+    cached: list
+    missing: list
+    vectors: dict = field(default_factory=dict)
+
+
+class _Failed(Exception):
+    """Raised inside a stage when another stage has failed."""
+
+
+class IngestPipeline:
+    """
+    Embeds a dataset into an embedding store with overlapping stages.
+    """
+
+    # pylint: disable=too-many-instance-attributes,too-few-public-methods
+
+    # pylint: disable-next=too-many-arguments,too-many-positional-arguments
+    def __init__(
+        self,
+        embedder,
+        cache=None,
+        chunk_size: int = 1024,
+        batch_size: int = 64,
+        max_batch_tokens: int = None,
+        queue_size: int = 4
+    ):
+        """
+        Args:
+            embedder (Embedder): Provides tokenize_batches and encode_tokens.
+            cache (EmbeddingCache): The cache to consult and fill, or None.
+            chunk_size (int): Dataset rows per chunk.
+            batch_size (int): Maximum texts per forward pass.
+            max_batch_tokens (int): Maximum padded tokens per forward pass.
+            queue_size (int): Items each queue holds before its producer blocks.
+        """
+        self.embedder = embedder
+        self.cache = cache
+        self.chunk_size = chunk_size
+        self.batch_size = batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.queue_size = queue_size
+        self.busy = {}
+
+        self._cache_lock = threading.Lock()
+        self._failed = threading.Event()
+        self._error = None
+
+    def run(self, dataset: list, texts: list, writer: EmbeddingStoreWriter):
+        """
+        Embed every text and write the dataset to the store.
+
+        Args:
+            dataset (list): Parsed log dictionaries, in store order.
+            texts (list): The text to embed for each sample.
+            writer (EmbeddingStoreWriter): The store to fill; closed on success.
+
+        Returns:
+            EmbeddingStore: The written store.
+
+        Raises:
+            Exception: Whatever a stage raised.
+        """
+        tokens = queue.Queue(self.queue_size)
+        chunks = queue.Queue(self.queue_size)
+        encoded = queue.Queue(self.queue_size)
+        stages = [
+            ('read', lambda: self._read(dataset, texts, chunks)),
+            ('tokenize', lambda: self._tokenize(chunks, tokens)),
+            ('encode', lambda: self._encode(tokens, encoded)),
+            ('write', lambda: self._write(encoded, writer)),
+        ]
+
+        self.busy = {name: 0.0 for name, _ in stages}
+        start = time.perf_counter()
+        threads = [threading.Thread(target=self._guard, args=(name, func), name=name,
+                                    daemon=True)
+                   for name, func in stages]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if self._error is not None:
+            raise self._error
+
+        elapsed = time.perf_counter() - start
+        busy = ", ".join(f"{name} {seconds:.1f}s" for name, seconds in self.busy.items())
+        print(f"Pipeline embedded {len(dataset)} lines in {elapsed:.1f}s "
+              f"({len(dataset) / max(elapsed, 1e-9):.1f} lines/sec; busy: {busy})")
+        return writer.close()
+
+    def _guard(self, name: str, func):
+        """Run a stage, recording the first failure and stopping the others."""
+        try:
+            func()
+        except _Failed:
+            pass
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            if not self._failed.is_set():
+                self._error = error
+                self._failed.set()
+            print(f"Pipeline stage '{name}' failed: {error}")
+
+    def _put(self, target: queue.Queue, item):
+        while True:
+            if self._failed.is_set():
+                raise _Failed
+            try:
+                target.put(item, timeout=POLL_INTERVAL)
+                return
+            except queue.Full:
+                continue
+
+    def _get(self, source: queue.Queue):
+        while True:
+            if self._failed.is_set():
+                raise _Failed
+            try:
+                return source.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                continue
+
+    def _read(self, dataset: list, texts: list, chunks: queue.Queue):
+        """Split the dataset into chunks and look their texts up in the cache."""
+        for start in range(0, len(dataset), self.chunk_size):
+            began = time.perf_counter()
+            chunk_texts = texts[start:start + self.chunk_size]
+            if self.cache is not None:
+                with self._cache_lock:
+                    cached = self.cache.get_many(chunk_texts)
+            else:
+                cached = [None] * len(chunk_texts)
+            missing = list(dict.fromkeys(
+                text for text, vector in zip(chunk_texts, cached) if vector is None
+            ))
+            chunk = _Chunk(start, dataset[start:start + self.chunk_size], chunk_texts,
+                           cached, missing)
+            self.busy['read'] += time.perf_counter() - began
+            self._put(chunks, chunk)
+        self._put(chunks, None)
+
+    def _tokenize(self, chunks: queue.Queue, tokens: queue.Queue):
+        """Tokenize the cache misses of every chunk in length-bucketed batches."""
+        while (chunk := self._get(chunks)) is not None:
+            began = time.perf_counter()
+            for indices, features in self.embedder.tokenize_batches(
+                    chunk.missing, self.batch_size, self.max_batch_tokens):
+                self.busy['tokenize'] += time.perf_counter() - began
+                self._put(tokens, (chunk, indices, features))
+                began = time.perf_counter()
+            self.busy['tokenize'] += time.perf_counter() - began
+            # Marks the chunk as complete
+            self._put(tokens, (chunk, None, None))
+        self._put(tokens, None)
+
+    def _encode(self, tokens: queue.Queue, encoded: queue.Queue):
+        """Run the model on every tokenized batch."""
+        while (item := self._get(tokens)) is not None:
+            chunk, indices, features = item
+            if indices is not None:
+                began = time.perf_counter()
+                vectors = self.embedder.encode_tokens(features)
+                self.busy['encode'] += time.perf_counter() - began
+                for index, vector in zip(indices, vectors):
+                    chunk.vectors[chunk.missing[index]] = vector
+                continue
+            self._put(encoded, chunk)
+        self._put(encoded, None)
+
+    def _write(self, encoded: queue.Queue, writer: EmbeddingStoreWriter):
+        """Append finished chunks to the store and the cache."""
+        while (chunk := self._get(encoded)) is not None:
+            began = time.perf_counter()
+            rows = np.array([
+                vector if vector is not None else chunk.vectors[text]
+                for text, vector in zip(chunk.texts, chunk.cached)
+            ], dtype=np.float32)
+            writer.write(chunk.start, chunk.samples, rows)
+            if self.cache is not None and chunk.missing:
+                with self._cache_lock:
+                    self.cache.put_many(chunk.missing,
+                                        [chunk.vectors[text] for text in chunk.missing])
+            self.busy['write'] += time.perf_counter() - began
@@ -0,0 +1,428 @@
+"""
+Inference artifact module.
+
+This module saves fitted classifiers as a versioned artifact directory and
+loads them back into a lightweight Predictor. Linear models, binary
+kernel SVMs and kNN indexes are stored as plain numpy arrays and evaluated
+with numpy alone, so scoring processes start without importing
+scikit-learn, torch or the reporting stack.
+"""
+
+import json
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+
+from src.ann_index import KNNClassifier
+from src.compression import Compressor
+from src.window_features import FeatureJoiner
+
+ARTIFACT_FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+LATEST_FILE = "LATEST"
+COMPRESSION_FILE = "compression.npz"
+
+
+# pylint: disable-next=too-many-arguments,too-many-positional-arguments
+def save_artifact(
+    root: str,
+    models: dict,
+    classes: list,
+    metadata: dict,
+    calibrators: dict = None,
+    compressor: Compressor = None
+) -> str:
+    """
+    Save fitted models as a new artifact version.
+
+    Each call creates ``<root>/<timestamp>-<fingerprint>/`` holding a
+    manifest and one parameter file per model, then points
+    ``<root>/LATEST`` at it.
+
+    Args:
+        root (str): The artifact root directory.
+        models (dict): Fitted scikit-learn classifiers by name.
+        classes (list): The original label of every encoded class.
+        metadata (dict): Must contain 'embedding_model', 'embedding_dim' and
+            'data_fingerprint'; anything else is stored as is.
+        calibrators (dict): Platt parameters (see platt_proba) by model name,
+            for models whose probabilities come from their decision scores.
+        compressor (Compressor): The fitted compression the models expect
+            their inputs in, or None.
+
+    Returns:
+        str: The directory of the new artifact version.
+    """
+    created = datetime.now(timezone.utc)
+    version = f"{created:%Y%m%dT%H%M%S}-{metadata.get('data_fingerprint', '')[:8]}"
+    path = os.path.join(root, version)
+    # Never overwrite an artifact saved within the same second
+    suffix = 1
+    while os.path.exists(path):
+        suffix += 1
+        path = os.path.join(root, f"{version}-{suffix}")
+    version = os.path.basename(path)
+    os.makedirs(path)
+
+    manifest = {
+        'format_version': ARTIFACT_FORMAT_VERSION,
+        'version': version,
+        'created': created.isoformat(),
+        'classes': list(classes),
+        **metadata,
+        'models': {},
+    }
+    if compressor is not None:
+        np.savez(os.path.join(path, COMPRESSION_FILE), **compressor.params)
+        manifest['compression'] = compressor.settings
+
+    for name, model in models.items():
+        manifest['models'][name] = _save_model(path, name, model)
+        if calibrators and name in calibrators:
+            manifest['models'][name]['calibration'] = calibrators[name]
+
+    with open(os.path.join(path, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    # Replace LATEST atomically, so a concurrent reader never sees it empty
+    latest = os.path.join(root, LATEST_FILE)
+    with open(f"{latest}.tmp", 'w', encoding='utf-8') as f:
+        f.write(version + "\n")
+    os.replace(f"{latest}.tmp", latest)
+
+    print(f"Saved {len(models)} models to artifact {path}")
+    return path
+
+
+def _save_model(path: str, name: str, model) -> dict:
+    """Write one model's parameters and return its manifest entry."""
+    # pylint: disable=protected-access
+    file_name = f"{name}.npz"
+    if hasattr(model, 'coef_') and hasattr(model, 'intercept_'):
+        # LogisticRegression is multinomial; SGD log-loss models are one-vs-rest
+        if type(model).__name__ == 'LogisticRegression':
+            probability = 'softmax'
+        elif getattr(model, 'loss', None) == 'log_loss':
+            probability = 'ovr'
+        else:
+            probability = None
+        np.savez(os.path.join(path, file_name), coef=model.coef_, intercept=model.intercept_)
+        return {'kind': 'linear', 'file': file_name, 'probability': probability}
+
+    if hasattr(model, 'support_vectors_') and len(model.classes_) == 2 and \
+            model.kernel in ('linear', 'rbf', 'poly', 'sigmoid'):
+        np.savez(
+            os.path.join(path, file_name),
+            support_vectors=model.support_vectors_,
+            dual_coef=model.dual_coef_[0],
+            intercept=model.intercept_,
+        )
+        return {
+            'kind': 'kernel_svc',
+            'file': file_name,
+            'kernel': model.kernel,
+            'gamma': float(model._gamma),
+            'coef0': float(model.coef0),
+            'degree': int(model.degree),
+        }
+
+    if isinstance(model, KNNClassifier):
+        model.save(os.path.join(path, name))
+        return {'kind': 'knn', 'file': name}
+
+    # Anything else is pickled and needs scikit-learn at load time
+    import joblib  # pylint: disable=import-outside-toplevel
+    file_name = f"{name}.joblib"
+    joblib.dump(model, os.path.join(path, file_name))
+    return {'kind': 'pickle', 'file': file_name}
+
+
+def platt_proba(decision, calibration: dict) -> np.ndarray:
+    """
+    Turn decision scores into probabilities with Platt scaling.
+
+    Args:
+        decision: Decision scores, 1-D for binary models or one column per
+            class (one-vs-rest).
+        calibration (dict): One 'slope' and 'intercept' per score column.
+
+    Returns:
+        np.ndarray: One row of class probabilities per sample.
+    """
+    scores = np.asarray(decision, dtype=np.float64).reshape(len(decision), -1)
+    positive = 1.0 / (1.0 + np.exp(-(scores * np.asarray(calibration['slope'])
+                                     + np.asarray(calibration['intercept']))))
+    if positive.shape[1] == 1:
+        return np.column_stack([1.0 - positive[:, 0], positive[:, 0]])
+    return positive / positive.sum(axis=1, keepdims=True)
+
+
+def resolve_artifact_dir(path: str) -> str:
+    """
+    Resolve an artifact root to its latest version.
+
+    Args:
+        path (str): An artifact version directory, or a root with LATEST.
+
+    Returns:
+        str: The artifact version directory.
+
+    Raises:
+        FileNotFoundError: If no artifact is found.
+    """
+    if os.path.exists(os.path.join(path, MANIFEST_FILE)):
+        return path
+    latest = os.path.join(path, LATEST_FILE)
+    if not os.path.exists(latest):
+        raise FileNotFoundError(f"No inference artifact at {path}")
+    with open(latest, 'r', encoding='utf-8') as f:
+        return os.path.join(path, f.read().strip())
+
+
+class _LinearModel:
+    """A linear decision function with an optional logistic link."""
+
+    def __init__(self, params, probability: str):
+        self.coef = params['coef']
+        self.intercept = params['intercept']
+        self.probability = probability
+
+    def decision(self, x: np.ndarray) -> np.ndarray:
+        """Decision scores, 1-D for binary models."""
+        scores = x @ self.coef.T + self.intercept
+        return scores[:, 0] if scores.shape[1] == 1 else scores
+
+    def link(self, scores: np.ndarray) -> np.ndarray:
+        """Class probabilities from decision scores, or None if the model has none."""
+        if not self.probability:
+            return None
+        if scores.ndim == 1:
+            positive = 1.0 / (1.0 + np.exp(-scores))
+            return np.column_stack([1.0 - positive, positive])
+        if self.probability == 'ovr':
+            positive = 1.0 / (1.0 + np.exp(-scores))
+            return positive / positive.sum(axis=1, keepdims=True)
+        exp = np.exp(scores - scores.max(axis=1, keepdims=True))
+        return exp / exp.sum(axis=1, keepdims=True)
+
+
+class _KernelSVC:
+    """The decision function of a fitted binary kernel SVM."""
+
+    def __init__(self, params, entry: dict):
+        self.support_vectors = params['support_vectors']
+        self.dual_coef = params['dual_coef']
+        self.intercept = params['intercept']
+        self.kernel = entry['kernel']
+        self.gamma = entry['gamma']
+        self.coef0 = entry['coef0']
+        self.degree = entry['degree']
+
+    def decision(self, x: np.ndarray) -> np.ndarray:
+        """Decision scores, 1-D for binary models."""
+        dot = x @ self.support_vectors.T
+        if self.kernel == 'linear':
+            kernel = dot
+        elif self.kernel == 'rbf':
+            sq_dist = ((x ** 2).sum(axis=1)[:, None] - 2 * dot
+                       + (self.support_vectors ** 2).sum(axis=1)[None, :])
+            kernel = np.exp(-self.gamma * np.maximum(sq_dist, 0))
+        elif self.kernel == 'poly':
+            kernel = (self.gamma * dot + self.coef0) ** self.degree
+        else:
+            kernel = np.tanh(self.gamma * dot + self.coef0)
+        return kernel @ self.dual_coef + self.intercept[0]
+
+    def link(self, scores: np.ndarray) -> np.ndarray:  # pylint: disable=unused-argument
+        """Class probabilities from decision scores, or None if the model has none."""
+        return None
+
+
+class _KNNModel:
+    """A kNN classifier scored by its neighbour vote shares."""
+
+    def __init__(self, model: KNNClassifier):
+        self.model = model
+
+    def decision(self, x: np.ndarray) -> np.ndarray:
+        """Vote shares, one column per class."""
+        return self.model.predict_proba(x)
+
+    def link(self, scores: np.ndarray) -> np.ndarray:
+        """Class probabilities from decision scores."""
+        return scores
+
+
+class _PickledModel:
+    """A pickled scikit-learn classifier, scored by its decision function."""
+
+    def __init__(self, path: str):
+        import joblib  # pylint: disable=import-outside-toplevel
+        self.model = joblib.load(path)
+
+    def decision(self, x: np.ndarray) -> np.ndarray:
+        """Decision scores, or probabilities for models without them."""
+        if hasattr(self.model, 'decision_function'):
+            return self.model.decision_function(x)
+        return self.model.predict_proba(x)
+
+    def link(self, scores: np.ndarray) -> np.ndarray:  # pylint: disable=unused-argument
+        """Class probabilities from decision scores, or None if the model has none."""
+        return None
+
+
+class _CalibratedModel:
+    """A model whose probabilities are Platt-scaled decision scores."""
+
+    def __init__(self, model, calibration: dict):
+        self.model = model
+        self.calibration = calibration
+
+    def decision(self, x: np.ndarray) -> np.ndarray:
+        """Decision scores, 1-D for binary models."""
+        return self.model.decision(x)
+
+    def link(self, scores: np.ndarray) -> np.ndarray:
+        """Class probabilities from decision scores."""
+        return platt_proba(scores, self.calibration)
+
+
+class Predictor:
+    """
+    Scores embeddings with the models of a saved inference artifact.
+    """
+
+    def __init__(self, path: str):
+        """
+        Load an artifact.
+
+        Args:
+            path (str): An artifact version directory, or a root with LATEST.
+
+        Raises:
+            FileNotFoundError: If no artifact is found.
+            ValueError: If the artifact format is newer than this code.
+        """
+        self.path = resolve_artifact_dir(path)
+        with open(os.path.join(self.path, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        if self.manifest['format_version'] > ARTIFACT_FORMAT_VERSION:
+            raise ValueError(
+                f"Artifact format {self.manifest['format_version']} is not supported"
+            )
+
+        self.classes = np.asarray(self.manifest['classes'])
+        self.compressor = None
+        if 'compression' in self.manifest:
+            with np.load(os.path.join(self.path, COMPRESSION_FILE)) as params:
+                self.compressor = Compressor.from_params(self.manifest['compression'],
+                                                         dict(params))
+        self.feature_joiner = None
+        if 'window_features' in self.manifest:
+            self.feature_joiner = FeatureJoiner.from_settings(self.manifest['window_features'])
+        self.models = {}
+        for name, entry in self.manifest['models'].items():
+            file_path = os.path.join(self.path, entry['file'])
+            if entry['kind'] == 'linear':
+                self.models[name] = _LinearModel(np.load(file_path), entry['probability'])
+            elif entry['kind'] == 'kernel_svc':
+                self.models[name] = _KernelSVC(np.load(file_path), entry)
+            elif entry['kind'] == 'knn':
+                self.models[name] = _KNNModel(KNNClassifier.load(file_path))
+            else:
+                self.models[name] = _PickledModel(file_path)
+            if 'calibration' in entry:
+                self.models[name] = _CalibratedModel(self.models[name], entry['calibration'])
+
+    @property
+    def embedding_model(self) -> str:
+        """str: The embedding model the classifiers were trained on."""
+        return self.manifest['embedding_model']
+
+    @property
+    def embedding_options(self) -> dict:
+        """dict: The Embedder backend, precision and max_seq_length of the embeddings."""
+        return self.manifest.get('embedding_options', {})
+
+    @property
+    def embedding_dim(self) -> int:
+        """int: The expected embedding width."""
+        return self.manifest['embedding_dim']
+
+    def predict(self, embeddings, model: str, window_counts=None) -> np.ndarray:
+        """
+        Predict labels.
+
+        Args:
+            embeddings: A 2-D array with one embedding per row.
+            model (str): The model name.
+            window_counts: One row of window feature counts per embedding,
+                required if the artifact was trained with window features.
+
+        Returns:
+            np.ndarray: The predicted original labels.
+        """
+        return self._labels(self._decision(embeddings, model, window_counts))
+
+    def score(self, embeddings, model: str, label, window_counts=None) -> np.ndarray:
+        """
+        Score how strongly each row belongs to a label.
+
+        Args:
+            embeddings: A 2-D array with one embedding per row.
+            model (str): The model name.
+            label: The original label to score, e.g. LABEL_ANOMALY.
+            window_counts: Window feature counts, as for predict().
+
+        Returns:
+            np.ndarray: The label probability if the model provides one,
+                otherwise its decision score.
+        """
+        return self._label_scores(model, self._decision(embeddings, model, window_counts),
+                                  label)
+
+    def predict_and_score(self, embeddings, model: str, label, window_counts=None) -> tuple:
+        """
+        Predict labels and score one label from a single inference pass.
+
+        Args:
+            embeddings: A 2-D array with one embedding per row.
+            model (str): The model name.
+            label: The original label to score, e.g. LABEL_ANOMALY.
+            window_counts: Window feature counts, as for predict().
+
+        Returns:
+            tuple: The predict() and score() results.
+        """
+        scores = self._decision(embeddings, model, window_counts)
+        return self._labels(scores), self._label_scores(model, scores, label)
+
+    def _decision(self, embeddings, model: str, window_counts=None) -> np.ndarray:
+        return self.models[model].decision(self._check(embeddings, window_counts))
+
+    def _labels(self, scores: np.ndarray) -> np.ndarray:
+        indices = (scores > 0).astype(int) if scores.ndim == 1 else scores.argmax(axis=1)
+        return self.classes[indices]
+
+    def _label_scores(self, model: str, scores: np.ndarray, label) -> np.ndarray:
+        index = int(np.flatnonzero(self.classes == label)[0])
+        proba = self.models[model].link(scores)
+        if proba is not None:
+            return proba[:, index]
+        # Binary decision functions are positive for the last class
+        if scores.ndim == 1:
+            return scores if index == len(self.classes) - 1 else -scores
+        return scores[:, index]
+
+    def _check(self, embeddings, window_counts=None) -> np.ndarray:
+        x = np.asarray(embeddings, dtype=np.float64)
+        if x.ndim != 2 or x.shape[1] != self.embedding_dim:
+            raise ValueError(f"Expected {self.embedding_dim}-d embeddings, got shape {x.shape}")
+        if self.compressor is not None:
+            x = self.compressor.transform(x).astype(np.float64)
+        if self.feature_joiner is not None:
+            if window_counts is None:
+                raise ValueError("This artifact was trained with window features "
+                                 f"({', '.join(self.feature_joiner.names)}); pass window_counts")
+            x = self.feature_joiner.transform(x, window_counts)
+        return x
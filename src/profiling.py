@@ -0,0 +1,180 @@
+"""
+Stage profiling module.
+
+This module measures the pipeline stages: wall time, CPU time (including
+finished worker processes), peak RSS and items/sec. Records are saved to
+a JSON metrics file after every stage, and selected stages can also be
+captured with cProfile. Modules report stages through the module-level
+``stage`` context manager, which uses the profiler set up by ``configure``.
+"""
+
+import contextlib
+import cProfile
+import io
+import json
+import os
+import pstats
+import resource
+import sys
+import time
+
+# Functions listed in the printed summary of a cProfile capture
+PROFILE_TOP = 15
+
+
+def _peak_rss_mb() -> float:
+    """Return the peak resident set size of this process so far, in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def _cpu_seconds() -> float:
+    """Return the CPU time of this process and its reaped children."""
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+class StageProfiler:
+    """
+    Records the cost of pipeline stages.
+
+    Records are kept by stage name, so a stage that runs again replaces
+    its previous record, while stages skipped in this run keep the record
+    of the run that built their outputs.
+    """
+
+    def __init__(self, metrics_path: str = None, profile: tuple = (),
+                 profile_dir: str = "output/profiles"):
+        """
+        Args:
+            metrics_path (str): JSON file to load previous records from and
+                save records to, or None to keep them in memory only.
+            profile (tuple): Names of the stages to capture with cProfile.
+            profile_dir (str): Where cProfile captures are written.
+        """
+        self.metrics_path = metrics_path
+        self.profile = set(profile)
+        self.profile_dir = profile_dir
+        self.records = {}
+        self._profiling = False
+
+        if metrics_path and os.path.exists(metrics_path):
+            with open(metrics_path, 'r', encoding='utf-8') as f:
+                self.records = {record['stage']: record for record in json.load(f)['stages']}
+
+    @contextlib.contextmanager
+    def stage(self, name: str, items: int = None):
+        """
+        Measure a stage.
+
+        Args:
+            name (str): The stage name, e.g. 'parse' or 'train/svm'.
+            items (int): Items processed, if known up front; otherwise set
+                record['items'] inside the block.
+
+        Yields:
+            dict: The record being filled in.
+        """
+        record = {'stage': name, 'items': items}
+        profiler = None
+        if name in self.profile and not self._profiling:
+            profiler = cProfile.Profile()
+            self._profiling = True
+            profiler.enable()
+
+        rss_before = _peak_rss_mb()
+        cpu_start = _cpu_seconds()
+        wall_start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            wall = time.perf_counter() - wall_start
+            if profiler is not None:
+                profiler.disable()
+                self._profiling = False
+            record.update({
+                'wall_s': wall,
+                'cpu_s': _cpu_seconds() - cpu_start,
+                'items_per_sec': record['items'] / wall if record['items'] and wall > 0 else None,
+                'peak_rss_mb': _peak_rss_mb(),
+                'rss_growth_mb': _peak_rss_mb() - rss_before,
+                'completed_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            })
+            # Re-insert so the records stay in the order the stages finished
+            self.records.pop(name, None)
+            self.records[name] = record
+            self._print(record)
+            if profiler is not None:
+                self._save_profile(name, profiler)
+            self.save()
+
+    def save(self):
+        """Write all records to the metrics file, if one is configured."""
+        if not self.metrics_path:
+            return
+        os.makedirs(os.path.dirname(self.metrics_path) or ".", exist_ok=True)
+        with open(f"{self.metrics_path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump({'stages': list(self.records.values())}, f, indent=2)
+        os.replace(f"{self.metrics_path}.tmp", self.metrics_path)
+
+    @staticmethod
+    def _print(record: dict):
+        rate = f", {record['items_per_sec']:,.0f} items/sec" if record['items_per_sec'] else ""
+        print(f"[{record['stage']}] {record['wall_s']:.2f}s wall, {record['cpu_s']:.2f}s CPU"
+              f"{rate}, peak RSS {record['peak_rss_mb']:.0f} MB")
+
+    def _save_profile(self, name: str, profiler: cProfile.Profile):
+        """Write a cProfile capture and print its most expensive functions."""
+        os.makedirs(self.profile_dir, exist_ok=True)
+        path = os.path.join(self.profile_dir, f"{name.replace('/', '_')}.prof")
+        profiler.dump_stats(path)
+        summary = io.StringIO()
+        pstats.Stats(profiler, stream=summary).sort_stats('cumulative').print_stats(PROFILE_TOP)
+        print(f"cProfile capture of '{name}' saved to {path} (view with snakeviz or pstats)")
+        print(summary.getvalue())
+
+
+_PROFILER = StageProfiler()
+
+
+def configure(metrics_path: str = None, profile: tuple = (),
+              profile_dir: str = "output/profiles") -> StageProfiler:
+    """
+    Replace the profiler used by ``stage``.
+
+    Args:
+        metrics_path (str): JSON metrics file, or None.
+        profile (tuple): Names of the stages to capture with cProfile.
+        profile_dir (str): Where cProfile captures are written.
+
+    Returns:
+        StageProfiler: The new profiler.
+    """
+    global _PROFILER  # pylint: disable=global-statement
+    _PROFILER = StageProfiler(metrics_path, profile, profile_dir)
+    return _PROFILER
+
+
+def get_profiler() -> StageProfiler:
+    """
+    Get the profiler used by ``stage``.
+
+    Returns:
+        StageProfiler: The current profiler.
+    """
+    return _PROFILER
+
+
+def stage(name: str, items: int = None):
+    """
+    Measure a stage with the current profiler (see StageProfiler.stage).
+
+    Args:
+        name (str): The stage name.
+        items (int): Items processed, if known up front.
+
+    Returns:
+        A context manager yielding the stage record.
+    """
+    return _PROFILER.stage(name, items)
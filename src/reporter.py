@@ -5,11 +5,100 @@ This module generates a PDF report containing classification metrics
 and visualizations for the multi-class log classifier.
 """
 
+import io
+import multiprocessing
 import os
-import matplotlib.pyplot as plt
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 import seaborn as sns
-from sklearn.metrics import confusion_matrix
-from fpdf import FPDF
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from sklearn.metrics import auc, average_precision_score, confusion_matrix
+from sklearn.metrics import precision_recall_curve, roc_curve
+from fpdf import FPDF, FPDF_VERSION
+
+# fpdf2 embeds images from memory; fpdf 1.x only reads them from a file
+IN_MEMORY_IMAGES = int(FPDF_VERSION.split('.', maxsplit=1)[0]) >= 2
+# Render in a process pool once a report has at least this many figures
+PARALLEL_MIN_FIGURES = 6
+
+
+def plot_confusion_matrix(ax, y_true, y_pred, classes):
+    """Plots the confusion matrix."""
+    cm = confusion_matrix(y_true, y_pred, labels=list(range(len(classes))))
+    sns.heatmap(cm, annot=True, fmt='d', cmap='Blues',
+                xticklabels=classes, yticklabels=classes, ax=ax)
+    ax.set_xlabel('Predicted')
+    ax.set_ylabel('True')
+
+
+def plot_curves(roc_ax, pr_ax, y_true, y_score, classes):
+    """Plots one-vs-rest ROC and precision-recall curves from class scores."""
+    y_true = np.asarray(y_true)
+    y_score = np.asarray(y_score)
+    # A binary problem is fully described by the positive class
+    shown = [1] if len(classes) == 2 else range(len(classes))
+    for i in shown:
+        positive = y_true == i
+        if positive.all() or not positive.any():
+            continue
+        fpr, tpr, _ = roc_curve(positive, y_score[:, i])
+        roc_ax.plot(fpr, tpr, label=f"{classes[i]} (AUC {auc(fpr, tpr):.3f})")
+        precision, recall, _ = precision_recall_curve(positive, y_score[:, i])
+        average_precision = average_precision_score(positive, y_score[:, i])
+        pr_ax.plot(recall, precision, label=f"{classes[i]} (AP {average_precision:.3f})")
+
+    roc_ax.plot([0, 1], [0, 1], linestyle='--', color='grey')
+    roc_ax.set_xlabel('False Positive Rate')
+    roc_ax.set_ylabel('True Positive Rate')
+    roc_ax.set_title('ROC')
+    pr_ax.set_xlabel('Recall')
+    pr_ax.set_ylabel('Precision')
+    pr_ax.set_title('Precision-Recall')
+    for ax in (roc_ax, pr_ax):
+        ax.set_xlim(0, 1)
+        ax.set_ylim(0, 1.02)
+        if ax.get_legend_handles_labels()[0]:
+            ax.legend(loc='lower right' if ax is roc_ax else 'lower left')
+
+
+def render_figure(kind: str, title: str, data: dict) -> bytes:
+    """
+    Render one report figure to PNG bytes.
+
+    Figures are built without pyplot, so no global state is shared and
+    figures can be rendered in worker processes.
+
+    Args:
+        kind (str): 'confusion_matrix' or 'curves'.
+        title (str): The figure title.
+        data (dict): y_test, y_pred, y_score and classes of one model.
+
+    Returns:
+        bytes: The PNG image.
+    """
+    if kind == 'confusion_matrix':
+        fig = Figure(figsize=(10, 6))
+        ax = fig.add_subplot()
+        plot_confusion_matrix(ax, data['y_test'], data['y_pred'], data['classes'])
+        ax.set_title(title)
+    else:
+        fig = Figure(figsize=(10, 4.5))
+        roc_ax, pr_ax = fig.subplots(1, 2)
+        plot_curves(roc_ax, pr_ax, data['y_test'], data['y_score'], data['classes'])
+        fig.suptitle(title)
+
+    FigureCanvasAgg(fig)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', bbox_inches='tight')
+    return buffer.getvalue()
+
+
+def _render_task(task: tuple) -> bytes:
+    """Process pool entry point: render one (kind, title, data) figure."""
+    return render_figure(*task)
 
 
 class PDFReport(FPDF):
@@ -37,48 +126,114 @@ class Reporter:
 
     # pylint: disable=too-few-public-methods
 
-    def __init__(self, output_path: str):
-
+    def __init__(self, output_path: str, workers: int = None):
+        """
+        Args:
+            output_path (str): Where to save the PDF.
+            workers (int): Figure rendering processes for large reports,
+                or None for one per core.
+        """
         self.output_path = output_path
+        self.workers = workers
         self.pdf = PDFReport()
         self.pdf.add_page()
 
-    def _add_plot(self, title: str, plot_func, *args, **kwargs):
-        """Helper to add a matplotlib plot to the PDF."""
-        plt.close('all')
-        fig, ax = plt.subplots(figsize=(10, 6))
-        plot_func(ax, *args, **kwargs)
-        ax.set_title(title)
-
-        # Save plot to temporary file
-        temp_img = "temp_plot.png"
-        fig.savefig(temp_img, bbox_inches='tight')
-        plt.close(fig)
+    def _render_all(self, tasks: list) -> list:
+        """Render figures, in a process pool when there are many of them."""
+        workers = min(self.workers or os.cpu_count() or 1, len(tasks))
+        if len(tasks) < PARALLEL_MIN_FIGURES or workers <= 1:
+            return [render_figure(*task) for task in tasks]
+        with ProcessPoolExecutor(max_workers=workers,
+                                 mp_context=multiprocessing.get_context('spawn')) as executor:
+            return list(executor.map(_render_task, tasks))
 
-        # Add to PDF
+    def _add_image(self, title: str, png: bytes):
+        """Helper to add a rendered figure to the PDF."""
         self.pdf.set_font('Arial', 'B', 12)
         self.pdf.cell(0, 10, title, 0, 1)
-        self.pdf.image(temp_img, w=170)
+        if IN_MEMORY_IMAGES:
+            self.pdf.image(io.BytesIO(png), w=170)
+        else:
+            # fpdf 1.x reads the image while image() runs, so a private
+            # temporary file can be removed right away
+            with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as image:
+                image.write(png)
+            try:
+                self.pdf.image(image.name, w=170)
+            finally:
+                os.remove(image.name)
         self.pdf.ln(5)
 
-        if os.path.exists(temp_img):
-            os.remove(temp_img)
+    def _add_cross_validation(self, rows: list):
+        """Adds a table with the mean and standard deviation of every candidate over the folds."""
+        self.pdf.set_font('Arial', 'B', 12)
+        self.pdf.cell(0, 10, f"Cross-Validation ({rows[0]['folds']} folds, mean \xb1 std):", 0, 1)
 
-    def _plot_confusion_matrix(self, ax, y_true, y_pred, classes):
-        """Plots the confusion matrix."""
-        cm = confusion_matrix(y_true, y_pred)
-        sns.heatmap(cm, annot=True, fmt='d', cmap='Blues',
-                    xticklabels=classes, yticklabels=classes, ax=ax)
-        ax.set_xlabel('Predicted')
-        ax.set_ylabel('True')
+        columns = (("Parameters", 50), ("Accuracy", 35), ("Macro Precision", 35),
+                   ("Macro Recall", 35), ("Macro F1-Score", 35))
+        self.pdf.set_font('Arial', 'B', 10)
+        for title, width in columns:
+            self.pdf.cell(width, 8, title, 1)
+        self.pdf.ln()
 
-    def generate_report(self, results: dict):
+        self.pdf.set_font('Arial', '', 10)
+        for row in rows:
+            params = ", ".join(f"{key}={value}" for key, value in row['params'].items())
+            values = [params or "defaults"] + [
+                f"{row[f'{metric}_mean']:.4f} \xb1 {row[f'{metric}_std']:.4f}"
+                for metric in ('accuracy', 'macro_precision', 'macro_recall', 'macro_f1_score')
+            ]
+            for value, (_, width) in zip(values, columns):
+                self.pdf.cell(width, 8, value, 1)
+            self.pdf.ln()
+        self.pdf.ln(10)
+
+    def _add_performance_page(self, performance: list):
+        """Adds a table with the cost of every pipeline stage."""
+        self.pdf.add_page()
+        self.pdf.set_font('Arial', 'B', 14)
+        self.pdf.cell(0, 10, "Performance", 0, 1)
+        self.pdf.set_font('Arial', '', 10)
+        self.pdf.multi_cell(0, 6, "Cost of the stages that produced this report. Stages skipped "
+                                  "in this run show the run that built their outputs; CPU time "
+                                  "includes finished worker processes and peak RSS is the "
+                                  "process high-water mark at the end of the stage.")
+        self.pdf.ln(4)
+
+        columns = (("Stage", 45), ("Wall (s)", 22), ("CPU (s)", 22), ("Items/sec", 28),
+                   ("Peak RSS (MB)", 30), ("Completed", 43))
+        self.pdf.set_font('Arial', 'B', 10)
+        for title, width in columns:
+            self.pdf.cell(width, 8, title, 1)
+        self.pdf.ln()
+
+        self.pdf.set_font('Arial', '', 10)
+        for record in performance:
+            rate = record.get('items_per_sec')
+            values = (record['stage'], f"{record['wall_s']:.2f}", f"{record['cpu_s']:.2f}",
+                      f"{rate:,.0f}" if rate else "-", f"{record['peak_rss_mb']:.0f}",
+                      record.get('completed_at', '').replace('T', ' '))
+            for value, (_, width) in zip(values, columns):
+                self.pdf.cell(width, 8, value, 1)
+            self.pdf.ln()
+
+    def generate_report(self, results: dict, performance: list = None):
         """
         Generate the PDF report from evaluation results.
 
         Args:
             results (dict): The dictionary returned by Trainer.evaluate().
+            performance (list): Stage records from the StageProfiler, shown
+                on a final performance page when given.
         """
+        # Render every figure up front, so they can be rendered in parallel
+        tasks = []
+        for model_name, metrics in results.items():
+            data = {key: metrics[key] for key in ('y_test', 'y_pred', 'y_score', 'classes')}
+            tasks.append(('confusion_matrix', f"Confusion Matrix ({model_name})", data))
+            tasks.append(('curves', f"ROC and Precision-Recall Curves ({model_name})", data))
+        figures = iter(zip(tasks, self._render_all(tasks)))
+
         first_model = True
         for model_name, metrics in results.items():
             if not first_model:
@@ -95,6 +250,12 @@ class Reporter:
             self.pdf.cell(0, 8, f"Macro Precision: {metrics['macro_precision']:.4f}", 0, 1)
             self.pdf.cell(0, 8, f"Macro Recall:    {metrics['macro_recall']:.4f}", 0, 1)
             self.pdf.cell(0, 8, f"Macro F1-Score:  {metrics['macro_f1_score']:.4f}", 0, 1)
+            if 'brier_score' in metrics:
+                self.pdf.cell(0, 8, f"Brier Score:     {metrics['brier_score']:.4f}", 0, 1)
+                self.pdf.cell(
+                    0, 8,
+                    f"Calibration Error (ECE): {metrics['expected_calibration_error']:.4f}", 0, 1
+                )
             self.pdf.ln(5)
 
             # Per-Class Metrics Table
@@ -118,17 +279,16 @@ class Reporter:
                 self.pdf.ln()
             self.pdf.ln(10)
 
-            # Confusion Matrix
-            y_test = metrics['y_test']
-            y_pred = metrics['y_pred']
-            classes = metrics['classes']
+            if metrics.get('cross_validation'):
+                self._add_cross_validation(metrics['cross_validation'])
 
-            self._add_plot(
-                f"Confusion Matrix ({model_name})",
-                self._plot_confusion_matrix,
-                y_test, y_pred, classes
-            )
+            # Confusion Matrix, then ROC and PR curves
+            for _ in range(2):
+                (_, title, _), png = next(figures)
+                self._add_image(title, png)
 
+        if performance:
+            self._add_performance_page(performance)
 
         # Save PDF
         os.makedirs(os.path.dirname(self.output_path), exist_ok=True)
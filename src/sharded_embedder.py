@@ -0,0 +1,159 @@
+"""
+Sharded embedding module.
+
+This module spreads embedding generation over several worker processes,
+each running its own model with a fixed number of CPU threads. The input
+texts are split into shards whose results are saved to disk as they
+finish, so an interrupted job resumes from the completed shards.
+"""
+
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+SHARD_FILE = "shard-{:05d}.npy"
+
+# The model loaded by each worker process
+_EMBEDDER = None
+
+
+def shard_job_dir(shard_dir: str, texts: list, model_name: str, shard_size: int,
+                  embedder_options: dict = None) -> str:
+    """
+    Get the directory holding the shards of one embedding job.
+
+    Args:
+        shard_dir (str): The root shard directory.
+        texts (list): The texts to embed.
+        model_name (str): The embedding model.
+        shard_size (int): Texts per shard.
+        embedder_options (dict): Embedder backend settings, or None.
+
+    Returns:
+        str: A directory whose name changes with the texts, model, backend
+            settings or shard size.
+    """
+    options = json.dumps(embedder_options or {}, sort_keys=True)
+    digest = hashlib.blake2b(f"{model_name}|{shard_size}|{options}".encode('utf-8'),
+                             digest_size=8)
+    for text in texts:
+        digest.update(text.encode('utf-8') + b"\n")
+    return os.path.join(shard_dir, digest.hexdigest())
+
+
+# pylint: disable-next=too-many-arguments,too-many-positional-arguments,too-many-locals
+def embed_sharded(
+    texts: list,
+    model_name: str,
+    shard_dir: str,
+    workers: int,
+    threads_per_worker: int = None,
+    shard_size: int = 10000,
+    batch_size: int = 64,
+    max_batch_tokens: int = None,
+    embedder_options: dict = None,
+    export_dir: str = 'data/onnx_models'
+) -> np.ndarray:
+    """
+    Embed texts with a pool of worker processes, resuming finished shards.
+
+    Args:
+        texts (list): The texts to embed.
+        model_name (str): The embedding model each worker loads.
+        shard_dir (str): Where shard results are kept until the job completes.
+        workers (int): Number of worker processes.
+        threads_per_worker (int): CPU threads per worker, or None to split
+            the machine's cores evenly.
+        shard_size (int): Texts per shard.
+        batch_size (int): Maximum texts per forward pass.
+        max_batch_tokens (int): Maximum padded tokens per forward pass.
+        embedder_options (dict): Embedder backend, precision and
+            max_seq_length, or None for the PyTorch model.
+        export_dir (str): Where ONNX exports are kept.
+
+    Returns:
+        np.ndarray: A float32 matrix with one embedding per text, in order.
+    """
+    embedder_options = embedder_options or {}
+    job_dir = shard_job_dir(shard_dir, texts, model_name, shard_size, embedder_options)
+    os.makedirs(job_dir, exist_ok=True)
+    shards = list(enumerate(range(0, len(texts), shard_size)))
+    pending = [(index, start) for index, start in shards
+               if not os.path.exists(os.path.join(job_dir, SHARD_FILE.format(index)))]
+
+    threads = threads_per_worker or max((os.cpu_count() or 1) // workers, 1)
+    print(f"Embedding {len(texts)} lines in {len(shards)} shards with {workers} workers "
+          f"x {threads} threads ({len(shards) - len(pending)} shards already done)")
+
+    start_time = time.perf_counter()
+    if pending and embedder_options.get('backend') == 'onnx':
+        # Export once here, so the workers do not race to write the same files
+        # pylint: disable-next=import-outside-toplevel
+        from src.embedder import export_onnx
+        export_onnx(model_name, export_dir, embedder_options.get('precision', 'fp32'))
+    if pending:
+        # Spawn rather than fork: forking a process that already runs torch
+        # threads can deadlock
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(pending)),
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(model_name, threads, embedder_options, export_dir)
+        ) as executor:
+            futures = [
+                executor.submit(
+                    _embed_shard, texts[start:start + shard_size],
+                    os.path.join(job_dir, SHARD_FILE.format(index)), batch_size, max_batch_tokens
+                )
+                for index, start in pending
+            ]
+            for done, future in enumerate(as_completed(futures), start=1):
+                future.result()
+                print(f"  Shard {done}/{len(pending)} done")
+
+    embeddings = None
+    for index, start in shards:
+        shard = np.load(os.path.join(job_dir, SHARD_FILE.format(index)))
+        if embeddings is None:
+            embeddings = np.empty((len(texts), shard.shape[1]), dtype=np.float32)
+        embeddings[start:start + len(shard)] = shard
+    shutil.rmtree(job_dir)
+
+    elapsed = time.perf_counter() - start_time
+    if texts and elapsed > 0:
+        print(f"Embedded {len(texts)} lines in {elapsed:.1f}s "
+              f"({len(texts) / elapsed:.1f} lines/sec)")
+    return embeddings if embeddings is not None else np.empty((0, 0), dtype=np.float32)
+
+
+def _init_worker(model_name: str, threads: int, embedder_options: dict, export_dir: str):
+    """Process pool initializer: pin the thread count and load the model."""
+    global _EMBEDDER  # pylint: disable=global-statement
+    for variable in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[variable] = str(threads)
+
+    # pylint: disable-next=import-outside-toplevel
+    from src.embedder import Embedder
+
+    _EMBEDDER = Embedder(model_name, **embedder_options, threads=threads, export_dir=export_dir)
+
+
+def _embed_shard(texts: list, path: str, batch_size: int, max_batch_tokens: int):
+    """Process pool entry point: embed one shard and save it atomically."""
+    embeddings = None
+    for indices, features in _EMBEDDER.tokenize_batches(texts, batch_size, max_batch_tokens):
+        encoded = _EMBEDDER.encode_tokens(features)
+        if embeddings is None:
+            embeddings = np.empty((len(texts), encoded.shape[1]), dtype=np.float32)
+        embeddings[indices] = encoded
+
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'wb') as file:
+        np.save(file, embeddings)
+    os.replace(temp_path, path)
@@ -0,0 +1,120 @@
+"""
+Stage cache module.
+
+This module records the output of each pipeline stage together with a
+key hashed from the stage's inputs: the relevant config values, the keys
+of the stages it depends on and the size and modification time of its
+input files. A stage whose key is unchanged and whose outputs still
+exist is skipped; any other stage is rebuilt.
+"""
+
+import hashlib
+import json
+import os
+import time
+
+
+def config_value(config: dict, dotted_key: str):
+    """
+    Look up a possibly nested config value.
+
+    Args:
+        config (dict): The configuration dictionary.
+        dotted_key (str): A key such as 'sampling' or 'embedding.by_template'.
+
+    Returns:
+        The value, or None if any part of the key is missing.
+    """
+    value = config
+    for part in dotted_key.split('.'):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+class StageCache:
+    """
+    Keyed manifests of completed pipeline stages.
+
+    Each stage has one JSON manifest in the cache directory holding the
+    key it was last built with and its outputs.
+    """
+
+    def __init__(self, root: str):
+        """
+        Args:
+            root (str): The directory holding the stage manifests.
+        """
+        self.root = root
+
+    @staticmethod
+    def key(config: dict, config_keys: tuple, upstream: tuple = (), files: tuple = ()) -> str:
+        """
+        Hash the inputs of a stage.
+
+        Args:
+            config (dict): The configuration dictionary.
+            config_keys (tuple): Dotted config keys that change the output.
+            upstream (tuple): Keys of the stages this one consumes.
+            files (tuple): Input files, fingerprinted by size and mtime.
+
+        Returns:
+            str: A hex digest of all inputs.
+        """
+        inputs = {
+            'config': {name: config_value(config, name) for name in config_keys},
+            'upstream': list(upstream),
+            'files': [
+                [path, os.path.getsize(path), os.stat(path).st_mtime_ns]
+                if os.path.exists(path) else [path, None, None]
+                for path in files
+            ],
+        }
+        encoded = json.dumps(inputs, sort_keys=True, default=str).encode('utf-8')
+        return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+    def get(self, stage: str, key: str) -> dict:
+        """
+        Get the outputs of a stage if it is up to date.
+
+        Args:
+            stage (str): The stage name.
+            key (str): The key the stage would be built with now.
+
+        Returns:
+            dict: The recorded outputs, or None if the stage was never
+                built, was built from other inputs or lost an output path.
+        """
+        try:
+            with open(self._manifest_path(stage), 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if manifest.get('key') != key:
+            return None
+        if not all(os.path.exists(path) for path in manifest.get('paths', [])):
+            return None
+        return manifest['outputs']
+
+    def put(self, stage: str, key: str, outputs: dict, paths: tuple = ()):
+        """
+        Record a completed stage.
+
+        Args:
+            stage (str): The stage name.
+            key (str): The key the stage was built with.
+            outputs (dict): JSON-serializable outputs for later runs.
+            paths (tuple): Output files or directories that must still
+                exist for the stage to count as up to date.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        manifest = {'key': key, 'outputs': outputs, 'paths': list(paths),
+                    'completed_at': time.strftime('%Y-%m-%dT%H:%M:%S')}
+        path = self._manifest_path(stage)
+        with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(f"{path}.tmp", path)
+
+    def _manifest_path(self, stage: str) -> str:
+        return os.path.join(self.root, f"{stage}.json")
@@ -2,16 +2,42 @@
 Model trainer module.
 
 This module provides functions to train and evaluate classification models
-(Logistic Regression and SVM) using log embeddings.
+(Logistic Regression, SVM and kNN) using log embeddings, either in memory or
+incrementally from an on-disk embedding store.
 """
 
+import os
+import time
+
+import joblib
 import numpy as np
-from sklearn.model_selection import train_test_split
-from sklearn.linear_model import LogisticRegression
+from joblib import Parallel, delayed
+from sklearn.model_selection import ParameterGrid, StratifiedKFold, train_test_split
+from sklearn.linear_model import LogisticRegression, SGDClassifier
 from sklearn.svm import SVC
 from sklearn.metrics import accuracy_score, precision_recall_fscore_support
+from sklearn.metrics.pairwise import pairwise_kernels
 from sklearn.preprocessing import LabelEncoder
 
+from src.ann_index import KNNClassifier
+from src.compression import Compressor
+from src.embedding_store import EmbeddingStore
+from src.predictor import platt_proba, save_artifact
+from src.window_features import FeatureJoiner, WindowFeatures
+
+# Estimator class and default hyperparameters of every classifier name
+ESTIMATORS = {
+    'logistic_regression': (LogisticRegression, {'max_iter': 1000}),
+    'svm': (SVC, {}),
+    'knn': (KNNClassifier, {'k': 10}),
+}
+# Hyperparameters searched along a warm-started path, smallest value first
+WARM_START_PARAMS = {'logistic_regression': 'C'}
+# SVC hyperparameters that define its kernel, with their defaults
+KERNEL_PARAMS = {'kernel': 'rbf', 'gamma': 'scale', 'degree': 3, 'coef0': 0.0}
+# Metrics averaged over the folds of a cross-validation
+CV_METRICS = ('accuracy', 'macro_precision', 'macro_recall', 'macro_f1_score')
+
 
 class Trainer:
     """
@@ -19,46 +45,234 @@ class Trainer:
     """
 
     # pylint: disable=too-many-instance-attributes
-    def __init__(self, data: list):
+    # pylint: disable-next=too-many-arguments,too-many-positional-arguments
+    def __init__(
+        self,
+        data,
+        calibration_fraction: float = 0.2,
+        compressor: Compressor = None,
+        window_features: WindowFeatures = None,
+        feature_weight: float = 1.0
+    ):
         """
         Initialize the trainer with augmented log data.
 
         Args:
-            data (list): List of dictionaries with 'embedding' and 'label'.
+            data (list | EmbeddingStore): List of dictionaries with 'embedding'
+                and 'label', or an opened embedding store.
+            calibration_fraction (float): Share of the training split held out
+                to calibrate SVM probabilities.
+            compressor (Compressor): Compression fitted on the training split
+                and applied to both splits, or None.
+            window_features (WindowFeatures): Window counts with one row per
+                sample, appended to the (compressed) embeddings, or None.
+            feature_weight (float): Scale of the window features relative to
+                one embedding dimension.
         """
-        self.embeddings = np.array([sample['embedding'] for sample in data])
+        if isinstance(data, EmbeddingStore):
+            # Memory-mapped matrix; only the train/test split below copies it
+            self.embeddings = data.embeddings
+            raw_labels = data.labels
+        else:
+            self.embeddings = np.array([sample['embedding'] for sample in data],
+                                       dtype=np.float32)
+            raw_labels = [sample['label'] for sample in data]
 
         # Encode string labels into integers
-        raw_labels = [sample['label'] for sample in data]
         self.label_encoder = LabelEncoder()
         self.labels = self.label_encoder.fit_transform(raw_labels)
 
         self.classes = self.label_encoder.classes_
         print(f"Detected {len(self.classes)} classes: {self.classes}")
 
-        self.x_train, self.x_test, self.y_train, self.y_test = train_test_split(
-            self.embeddings, self.labels, test_size=0.2, random_state=42
-        )
+        arrays = [self.embeddings, self.labels]
+        if window_features is not None:
+            if len(window_features) != len(self.labels):
+                raise ValueError(f"Expected window features for {len(self.labels)} samples, "
+                                 f"got {len(window_features)}")
+            arrays.append(window_features.counts)
+        # Extra arrays are split with the same permutation
+        split = train_test_split(*arrays, test_size=0.2, random_state=42)
+        self.x_train, self.x_test, self.y_train, self.y_test = split[:4]
+        self.compressor = compressor if compressor is not None and compressor.enabled else None
+        if self.compressor is not None:
+            self.compressor.fit(self.x_train)
+            self.x_train = self.compressor.transform(self.x_train)
+            self.x_test = self.compressor.transform(self.x_test)
+            print(f"Compressed embeddings ({self.compressor}) to "
+                  f"{self.compressor.bytes_per_vector(self.embeddings.shape[1]):.0f} bytes/vector")
+        self.feature_joiner = None
+        self.window_counts = window_features.counts if window_features is not None else None
+        if window_features is not None:
+            counts_train, counts_test = split[4:]
+            self.feature_joiner = FeatureJoiner(window_features.names, window_features.windows,
+                                                feature_weight).fit(self.x_train, counts_train)
+            self.x_train = self.feature_joiner.transform(self.x_train, counts_train)
+            self.x_test = self.feature_joiner.transform(self.x_test, counts_test)
+            print(f"Joined {len(window_features.names)} window features to the embeddings")
+
+        self.calibration_fraction = calibration_fraction
         self.models = {}
+        self.calibrators = {}
 
-    def train_logistic_regression(self):
+    def train_logistic_regression(self, **params):
         """
         Train a Logistic Regression classifier.
+
+        Args:
+            **params: Hyperparameters overriding the defaults.
         """
         print("Training Logistic Regression...")
         # multi_class='multinomial' is auto-selected but good to be explicit or leave default
-        model = LogisticRegression(max_iter=1000)
+        model = LogisticRegression(**{**ESTIMATORS['logistic_regression'][1], **params})
         model.fit(self.x_train, self.y_train)
         self.models['logistic_regression'] = model
 
-    def train_svm(self):
+    def train_svm(self, **params):
         """
         Train a Support Vector Machine (SVM) classifier.
+
+        Args:
+            **params: Hyperparameters overriding the defaults.
         """
         print("Training SVM...")
-        model = SVC(probability=True)
-        model.fit(self.x_train, self.y_train)
+        # A single fit plus Platt scaling on held-out rows, instead of the
+        # internal 5-fold cross-validation of SVC(probability=True)
+        x_fit, x_cal, y_fit, y_cal = train_test_split(
+            self.x_train, self.y_train, test_size=self.calibration_fraction,
+            random_state=42, stratify=self.y_train
+        )
+        model = SVC(**{**ESTIMATORS['svm'][1], **params})
+        model.fit(x_fit, y_fit)
         self.models['svm'] = model
+        self.calibrators['svm'] = fit_platt(model.decision_function(x_cal), y_cal,
+                                            len(self.classes))
+
+    def train_knn(self, **params):
+        """
+        Train a k-nearest-neighbour classifier on an IVF index.
+
+        Args:
+            **params: Hyperparameters overriding the defaults.
+        """
+        print("Training kNN...")
+        model = KNNClassifier(**{**ESTIMATORS['knn'][1], **params})
+        model.fit(self.x_train, self.y_train)
+        self.models['knn'] = model
+
+    def search(self, grids: dict, n_jobs: int = -1, validation_fraction: float = 0.2) -> list:
+        """
+        Search hyperparameters in parallel, then train the best of each model.
+
+        Candidates are fitted on part of the training split and scored by
+        macro F1 on the rest. Worker processes share one read-only,
+        memory-mapped copy of the data, and values of a warm-startable
+        hyperparameter (see WARM_START_PARAMS) are fitted in increasing order
+        within one worker, each fit starting from the previous solution.
+
+        Args:
+            grids (dict): Classifier names mapped to {hyperparameter: [values]}.
+            n_jobs (int): Worker processes, -1 for one per core.
+            validation_fraction (float): Share of the training split held out
+                for scoring.
+
+        Returns:
+            list: One dictionary per candidate with 'model', 'params',
+                'fit_seconds' and 'score'.
+        """
+        x_fit, x_val, y_fit, y_val = train_test_split(
+            self.x_train, self.y_train, test_size=validation_fraction,
+            random_state=42, stratify=self.y_train
+        )
+        tasks = [
+            (name, params, path_param, values)
+            for name, grid in grids.items()
+            for params, path_param, values in _search_paths(name, grid or {})
+        ]
+        print(f"Searching {sum(len(task[3]) for task in tasks)} candidates "
+              f"in {len(tasks)} tasks...")
+
+        # Large arrays are memory-mapped once and shared by all workers
+        paths = Parallel(n_jobs=n_jobs, max_nbytes='1M', mmap_mode='r')(
+            delayed(_fit_path)(*task, (x_fit, y_fit, x_val, y_val)) for task in tasks
+        )
+        candidates = [candidate for path in paths for candidate in path]
+
+        train = {'logistic_regression': self.train_logistic_regression, 'svm': self.train_svm,
+                 'knn': self.train_knn}
+        for name in grids:
+            train[name](**_best_candidate(
+                [candidate for candidate in candidates if candidate['model'] == name]
+            )['params'])
+        return candidates
+
+    def cross_validate(self, grids: dict, folds: int = 5, n_jobs: int = -1) -> dict:
+        """
+        Score every hyperparameter candidate with stratified k-fold cross-validation.
+
+        The folds cover all samples. The compressor and window-feature
+        scaling are fitted again on the training rows of each fold, as the
+        trainer fits them on the training split, so no validation row
+        shapes the transform it is scored through. Kernel SVMs are fitted
+        on a Gram matrix sliced per fold (``SVC(kernel='precomputed')``),
+        computed once per kernel setting, or once per fold and kernel
+        setting when the fold has its own transform, so the values of C
+        never recompute the kernel. Folds run in parallel worker processes
+        sharing one memory-mapped copy of the data.
+
+        Args:
+            grids (dict): Classifier names mapped to {hyperparameter: [values]}
+                (or None for the defaults).
+            folds (int): The number of folds.
+            n_jobs (int): Worker processes, -1 for one per core.
+
+        Returns:
+            dict: Classifier names mapped to one row per candidate with its
+                'params', 'folds', 'fit_seconds' (summed over the folds) and
+                the mean and standard deviation of every metric in
+                CV_METRICS (e.g. 'macro_f1_score_mean', 'macro_f1_score_std').
+        """
+        # Uncompressed and unjoined rows; each fold fits its own transform
+        x, y = self.embeddings, self.labels
+        splits = list(StratifiedKFold(n_splits=folds, shuffle=True, random_state=42)
+                      .split(np.zeros(len(y)), y))
+        transform = None
+        if self.compressor is not None or self.feature_joiner is not None:
+            transform = (self.compressor, self.feature_joiner, self.window_counts)
+
+        tasks = []
+        for name, grid in grids.items():
+            for kernel, paths in _cv_groups(name, grid or {}):
+                matrix = x if kernel is None or transform else _gram_matrix(x, kernel)
+                tasks.extend((name, paths, kernel, matrix, y, split, transform)
+                             for split in splits)
+        print(f"Cross-validating {len(grids)} models over {folds} folds in {len(tasks)} tasks...")
+
+        # The data and Gram matrices are memory-mapped once and shared by all workers
+        fold_results = Parallel(n_jobs=n_jobs, max_nbytes='1M', mmap_mode='r')(
+            delayed(_cross_validate_fold)(*task) for task in tasks
+        )
+
+        return _cv_summary(fold_results, list(grids))
+
+    def save_artifact(self, root: str, metadata: dict) -> str:
+        """
+        Save every trained model as a versioned inference artifact.
+
+        Args:
+            root (str): The artifact root directory.
+            metadata (dict): Embedding model, data fingerprint and any other
+                information stored in the artifact manifest.
+
+        Returns:
+            str: The directory of the new artifact version.
+        """
+        if self.feature_joiner is not None:
+            metadata = {**metadata, 'window_features': self.feature_joiner.settings}
+        return save_artifact(root, self.models, self.classes.tolist(), {
+            'embedding_dim': int(self.embeddings.shape[1]),
+            **metadata
+        }, calibrators=self.calibrators, compressor=self.compressor)
 
     def evaluate(self) -> dict:
         """
@@ -69,35 +283,552 @@ class Trainer:
         """
         results = {}
         for name, model in self.models.items():
-            y_pred = model.predict(self.x_test)
-            accuracy = accuracy_score(self.y_test, y_pred)
+            # Full probability matrix for multi-class ROC, from the same pass
+            y_pred, y_score = predict_with_scores(model, self.x_test, self.calibrators.get(name))
+            results[name] = compute_metrics(self.y_test, y_pred, y_score, self.classes)
+        return results
 
-            # Calculate metrics for each class (Macro and Per-Class)
-            precision, recall, f1, _ = precision_recall_fscore_support(
-                self.y_test, y_pred, average=None, labels=range(len(self.classes))
-            )
 
-            # Macro averages
-            macro_precision, macro_recall, macro_f1, _ = precision_recall_fscore_support(
-                self.y_test, y_pred, average='macro'
-            )
+def _search_paths(name: str, grid: dict) -> list:
+    """
+    Group a hyperparameter grid into warm-startable paths.
+
+    Returns:
+        list: (fixed params, path hyperparameter or None, path values) tuples.
+    """
+    path_param = WARM_START_PARAMS.get(name)
+    if path_param not in grid:
+        return [(params, None, [None]) for params in ParameterGrid(grid)]
+    rest = {key: values for key, values in grid.items() if key != path_param}
+    values = sorted(grid[path_param])
+    return [(params, path_param, values) for params in ParameterGrid(rest)]
+
+
+def _best_candidate(candidates: list) -> dict:
+    """Print the candidates of one model and return the best (fastest on ties)."""
+    best = max(candidates, key=lambda c: (c['score'], -c['fit_seconds']))
+    for candidate in candidates:
+        marker = "*" if candidate is best else " "
+        params = ", ".join(f"{k}={v}" for k, v in candidate['params'].items())
+        print(f" {marker} {candidate['model']:<20} {params:<30} "
+              f"macro F1 {candidate['score']:.4f}  fit {candidate['fit_seconds']:.2f}s")
+    return best
+
+
+def _cv_groups(name: str, grid: dict) -> list:
+    """
+    Group the candidates of one model by the kernel matrix they can share.
+
+    Returns:
+        list: (kernel settings or None, warm-startable paths) tuples; only
+            kernel SVMs get kernel settings, as in KERNEL_PARAMS.
+    """
+    if name != 'svm':
+        return [(None, _search_paths(name, grid))]
+    kernel_grid = {key: values for key, values in grid.items() if key in KERNEL_PARAMS}
+    rest = {key: values for key, values in grid.items() if key not in KERNEL_PARAMS}
+    return [({**KERNEL_PARAMS, **ESTIMATORS[name][1], **params},
+             [({**params, **fixed}, path_param, values)
+              for fixed, path_param, values in _search_paths(name, rest)])
+            for params in ParameterGrid(kernel_grid)]
+
+
+def _cv_summary(fold_results: list, names: list) -> dict:
+    """Average the fold scores of every candidate and print them."""
+    candidates = {}
+    for candidate in (candidate for result in fold_results for candidate in result):
+        key = (candidate['model'], repr(sorted(candidate['params'].items())))
+        candidates.setdefault(key, []).append(candidate)
+    summary = {name: [] for name in names}
+    for (name, _), runs in candidates.items():
+        row = {'params': runs[0]['params'], 'folds': len(runs),
+               'fit_seconds': sum(run['fit_seconds'] for run in runs)}
+        for metric in CV_METRICS:
+            values = [run['metrics'][metric] for run in runs]
+            row[f"{metric}_mean"] = float(np.mean(values))
+            row[f"{metric}_std"] = float(np.std(values))
+        summary[name].append(row)
+
+    for name, rows in summary.items():
+        for row in rows:
+            params = ", ".join(f"{k}={v}" for k, v in row['params'].items())
+            print(f"  {name:<20} {params:<30} "
+                  f"macro F1 {row['macro_f1_score_mean']:.4f} ± {row['macro_f1_score_std']:.4f}"
+                  f"  accuracy {row['accuracy_mean']:.4f} ± {row['accuracy_std']:.4f}")
+    return summary
+
+
+def _gram_matrix(x, settings: dict):
+    """Compute the SVC kernel of every pair of rows."""
+    x = np.asarray(x, dtype=np.float64)
+    gamma = settings['gamma']
+    # gamma='scale' follows SVC, but from all rows rather than each fold's training rows
+    if gamma == 'scale':
+        gamma = 1.0 / (x.shape[1] * x.var()) if x.var() > 0 else 1.0
+    elif gamma == 'auto':
+        gamma = 1.0 / x.shape[1]
+    return pairwise_kernels(x, metric=settings['kernel'], filter_params=True, gamma=gamma,
+                            degree=settings['degree'], coef0=settings['coef0'])
+
+
+# pylint: disable-next=too-many-arguments,too-many-positional-arguments
+def _cross_validate_fold(name: str, paths: list, kernel: dict, matrix, y, split: tuple,
+                         transform: tuple = None) -> list:
+    """
+    Fit and score the candidates of one model on one fold.
+
+    ``matrix`` holds the rows, or their Gram matrix for kernel SVMs without
+    a transform. A (compressor, feature joiner, window counts) transform is
+    fitted on the fold's training rows before the rows are used.
+    """
+    data = _fold_data(kernel, matrix, y, split, transform)
+    results = []
+    for params, path_param, values in paths:
+        fit_params = params if kernel is None else {
+            **{key: value for key, value in params.items() if key not in KERNEL_PARAMS},
+            'kernel': 'precomputed'
+        }
+        for candidate in _fit_path(name, fit_params, path_param, values, data):
+            if kernel is not None:
+                # Report the kernel settings instead of 'precomputed'
+                candidate['params'] = {**params, **{key: value for key, value
+                                                    in candidate['params'].items()
+                                                    if key != 'kernel'}}
+            results.append(candidate)
+    return results
+
+
+def _fold_data(kernel: dict, matrix, y, split: tuple, transform: tuple = None) -> tuple:
+    """Return the (fit rows, fit labels, validation rows, validation labels) of one fold."""
+    train, test = split
+    if transform is not None:
+        matrix = np.concatenate(_fold_features(matrix, split, *transform))
+        if kernel is not None:
+            matrix = _gram_matrix(matrix, kernel)
+        # Transformed rows are stacked as the training rows, then the validation rows
+        train, test = np.arange(len(train)), np.arange(len(train), len(matrix))
+    if kernel is None:
+        return matrix[train], y[split[0]], matrix[test], y[split[1]]
+    # Kernel values between the evaluated rows and the training rows
+    return (matrix[np.ix_(train, train)], y[split[0]], matrix[np.ix_(test, train)],
+            y[split[1]])
+
+
+def _fold_features(x, split: tuple, compressor: Compressor, joiner: FeatureJoiner,
+                   counts) -> tuple:
+    """Fit fresh copies of the trainer's transforms on one fold's training rows and apply them."""
+    train, test = split
+    x_fit, x_val = x[train], x[test]
+    if compressor is not None:
+        compressor = Compressor(**compressor.settings).fit(x_fit)
+        x_fit, x_val = compressor.transform(x_fit), compressor.transform(x_val)
+    if joiner is not None:
+        joiner = FeatureJoiner(joiner.names, joiner.windows, joiner.weight)
+        joiner.fit(x_fit, counts[train])
+        x_fit, x_val = joiner.transform(x_fit, counts[train]), joiner.transform(x_val, counts[test])
+    return x_fit, x_val
+
+
+# pylint: disable-next=too-many-arguments,too-many-positional-arguments,too-many-locals
+def _fit_path(name: str, params: dict, path_param: str, values: list, data: tuple) -> list:
+    """Fit and score the candidates of one path, warm-starting along it."""
+    x_fit, y_fit, x_val, y_val = data
+    estimator, defaults = ESTIMATORS[name]
+    model = estimator(**{**defaults, **params})
+    if path_param:
+        model.set_params(warm_start=True)
+
+    results = []
+    for value in values:
+        candidate = dict(params)
+        if path_param:
+            candidate[path_param] = value
+            model.set_params(**{path_param: value})
+        start = time.perf_counter()
+        model.fit(x_fit, y_fit)
+        elapsed = time.perf_counter() - start
+        metrics = summary_metrics(y_val, model.predict(x_val))
+        results.append({
+            'model': name,
+            'params': candidate,
+            'fit_seconds': elapsed,
+            'score': metrics['macro_f1_score'],
+            'metrics': metrics,
+        })
+    return results
+
+
+def summary_metrics(y_true, y_pred) -> dict:
+    """
+    Compute the accuracy and macro-averaged metrics of some predictions.
+
+    Returns:
+        dict: The metrics in CV_METRICS.
+    """
+    precision, recall, f1, _ = precision_recall_fscore_support(
+        y_true, y_pred, average='macro', zero_division=0
+    )
+    return {'accuracy': float(accuracy_score(y_true, y_pred)), 'macro_precision': float(precision),
+            'macro_recall': float(recall), 'macro_f1_score': float(f1)}
+
+
+def fit_platt(decision, y, n_classes: int) -> dict:
+    """
+    Fit Platt scaling from decision scores to class probabilities.
+
+    Args:
+        decision: Held-out decision scores, 1-D for binary models or one
+            column per class (one-vs-rest).
+        y: The encoded labels of the held-out rows.
+        n_classes (int): The number of classes.
 
-            results[name] = {
-                'accuracy': accuracy,
-                'macro_precision': macro_precision,
-                'macro_recall': macro_recall,
-                'macro_f1_score': macro_f1,
-                'per_class_metrics': {
-                    self.classes[i]: {
-                        'precision': precision[i],
-                        'recall': recall[i],
-                        'f1_score': f1[i]
-                    } for i in range(len(self.classes))
-                },
-                'y_test': self.y_test.tolist(),
-                'y_pred': y_pred.tolist(),
-                # Return full probability matrix for multi-class ROC
-                'y_score': model.predict_proba(self.x_test).tolist(),
-                'classes': self.classes.tolist()
-            }
+    Returns:
+        dict: One 'slope' and 'intercept' per score column, as used by
+            platt_proba.
+    """
+    scores = np.asarray(decision, dtype=np.float64).reshape(len(y), -1)
+    positives = [1] if n_classes == 2 else range(n_classes)
+    calibration = {'slope': [], 'intercept': []}
+    for column, label in enumerate(positives):
+        sigmoid = LogisticRegression(C=1e6).fit(scores[:, [column]], np.asarray(y) == label)
+        calibration['slope'].append(float(sigmoid.coef_[0, 0]))
+        calibration['intercept'].append(float(sigmoid.intercept_[0]))
+    return calibration
+
+
+def predict_with_scores(model, x, calibration: dict = None) -> tuple:
+    """
+    Predict labels and class scores from a single inference pass.
+
+    Args:
+        model: A fitted classifier.
+        x: The rows to score.
+        calibration (dict): Platt parameters turning the model's decision
+            scores into probabilities, or None.
+
+    Returns:
+        tuple: The encoded labels and one row of class scores per sample
+            (probabilities when available, decision scores otherwise).
+    """
+    if calibration is None and hasattr(model, 'predict_proba'):
+        proba = model.predict_proba(x)
+        return proba.argmax(axis=1), proba
+
+    decision = model.decision_function(x)
+    labels = (decision > 0).astype(int) if decision.ndim == 1 else decision.argmax(axis=1)
+    if calibration is not None:
+        return labels, platt_proba(decision, calibration)
+    return labels, (np.column_stack([-decision, decision]) if decision.ndim == 1 else decision)
+
+
+def calibration_metrics(y_test, y_proba, bins: int = 10) -> dict:
+    """
+    Measure how well predicted probabilities match observed frequencies.
+
+    Args:
+        y_test: The encoded true labels.
+        y_proba: One row of class probabilities per sample.
+        bins (int): Equal-width confidence bins for the calibration error.
+
+    Returns:
+        dict: The Brier score (of the positive class for binary problems,
+            summed over classes otherwise) and the expected calibration
+            error of the top-label confidence.
+    """
+    y_test = np.asarray(y_test)
+    y_proba = np.asarray(y_proba, dtype=np.float64)
+    onehot = np.eye(y_proba.shape[1])[y_test]
+    if y_proba.shape[1] == 2:
+        brier = float(np.mean((y_proba[:, 1] - onehot[:, 1]) ** 2))
+    else:
+        brier = float(np.mean(((y_proba - onehot) ** 2).sum(axis=1)))
+
+    confidence = y_proba.max(axis=1)
+    correct = y_proba.argmax(axis=1) == y_test
+    bin_ids = np.minimum((confidence * bins).astype(int), bins - 1)
+    ece = 0.0
+    for b in range(bins):
+        in_bin = bin_ids == b
+        if in_bin.any():
+            ece += in_bin.mean() * abs(correct[in_bin].mean() - confidence[in_bin].mean())
+    return {'brier_score': brier, 'expected_calibration_error': float(ece)}
+
+
+# pylint: disable-next=too-many-arguments,too-many-positional-arguments
+def compute_metrics(y_test, y_pred, y_score, classes, probabilities: bool = True) -> dict:
+    """
+    Compute the evaluation metrics of one model.
+
+    Args:
+        y_test: The encoded true labels.
+        y_pred: The encoded predicted labels.
+        y_score: One row of class scores per sample.
+        classes: The original label of every encoded class.
+        probabilities (bool): Whether y_score holds probabilities, in which
+            case calibration metrics are added.
+
+    Returns:
+        dict: Accuracy, macro and per-class metrics, plus the raw labels
+            and scores used by the reporter.
+    """
+    accuracy = accuracy_score(y_test, y_pred)
+
+    # Calculate metrics for each class (Macro and Per-Class)
+    precision, recall, f1, _ = precision_recall_fscore_support(
+        y_test, y_pred, average=None, labels=range(len(classes))
+    )
+
+    # Macro averages
+    macro_precision, macro_recall, macro_f1, _ = precision_recall_fscore_support(
+        y_test, y_pred, average='macro'
+    )
+
+    # Plain Python labels, so the results can be serialized
+    classes = np.asarray(classes).tolist()
+    metrics = {
+        'accuracy': accuracy,
+        'macro_precision': macro_precision,
+        'macro_recall': macro_recall,
+        'macro_f1_score': macro_f1,
+        'per_class_metrics': {
+            classes[i]: {
+                'precision': precision[i],
+                'recall': recall[i],
+                'f1_score': f1[i]
+            } for i in range(len(classes))
+        },
+        'y_test': np.asarray(y_test).tolist(),
+        'y_pred': np.asarray(y_pred).tolist(),
+        'y_score': np.asarray(y_score).tolist(),
+        'classes': classes
+    }
+    if probabilities:
+        metrics.update(calibration_metrics(y_test, y_score))
+    return metrics
+
+
+class IncrementalTrainer:  # pylint: disable=too-many-instance-attributes
+    """
+    Trains linear models out of core with ``partial_fit``.
+
+    Embeddings are read from an embedding store in class-balanced
+    mini-batches, so memory stays flat however large the store is. An
+    optional compressor is fitted on the training rows chunk by chunk and
+    applied to every batch. Progress is checkpointed and an interrupted
+    run resumes from its last checkpoint.
+    """
+
+    # Classifier names mapped to the SGD loss that trains them
+    LOSSES = {'logistic_regression': 'log_loss', 'svm': 'hinge'}
+
+    # pylint: disable-next=too-many-arguments,too-many-positional-arguments
+    def __init__(
+        self,
+        store: EmbeddingStore,
+        batch_size: int = 1024,
+        epochs: int = 5,
+        checkpoint_dir: str = None,
+        checkpoint_every: int = 100,
+        seed: int = 42,
+        compressor: Compressor = None
+    ):
+        """
+        Initialize the trainer with an embedding store.
+
+        Args:
+            store (EmbeddingStore): The opened (memory-mapped) store.
+            batch_size (int): Rows per mini-batch, split evenly across classes.
+            epochs (int): Passes over the largest class.
+            checkpoint_dir (str): Where to checkpoint models, or None to disable.
+            checkpoint_every (int): Batches between checkpoints within an epoch.
+            seed (int): Seed for batch order and the SGD models.
+            compressor (Compressor): Compression fitted on the training split
+                and applied to every batch, or None.
+        """
+        self.embeddings = store.embeddings
+        self.fingerprint = store.meta.get('fingerprint', '')
+        self.batch_size = batch_size
+        self.epochs = epochs
+        self.checkpoint_dir = checkpoint_dir
+        self.checkpoint_every = checkpoint_every
+        self.seed = seed
+
+        # The store's memory-mapped label codes already index the sorted
+        # class names, as a LabelEncoder would, so no record is parsed
+        self.labels = store.label_codes
+        self.classes = np.array(store.label_names)
+        print(f"Detected {len(self.classes)} classes: {self.classes}")
+
+        # Same split as Trainer, but of row indices so nothing is copied
+        train_idx, test_idx = train_test_split(
+            np.arange(len(self.labels)), test_size=0.2, random_state=42
+        )
+        self.test_idx = np.sort(test_idx)
+        self.class_idx = [train_idx[self.labels[train_idx] == label]
+                          for label in range(len(self.classes))]
+        self.compressor = compressor if compressor is not None and compressor.enabled else None
+        if self.compressor is not None:
+            self.compressor.fit(_StoreRows(self.embeddings, np.sort(train_idx)))
+            print(f"Compressed embeddings ({self.compressor}) to "
+                  f"{self.compressor.bytes_per_vector(self.embeddings.shape[1]):.0f} bytes/vector")
+        self.models = {}
+
+    def train(self, name: str, alpha: float = 1e-4):
+        """
+        Train one classifier, resuming from its checkpoint if there is one.
+
+        The checkpoint is removed once the model is trained, so a later run
+        trains from scratch instead of returning the finished model.
+
+        Args:
+            name (str): 'logistic_regression' or 'svm' (a linear SVM).
+            alpha (float): The SGD regularization strength.
+        """
+        model, epoch, batch = self._load_checkpoint(name, alpha)
+        if model is None:
+            model = SGDClassifier(loss=self.LOSSES[name], alpha=alpha, random_state=self.seed)
+        else:
+            print(f"Resuming {name} at epoch {epoch + 1}, batch {batch}")
+
+        classes = np.arange(len(self.classes))
+        while epoch < self.epochs:
+            print(f"Training {name} incrementally (epoch {epoch + 1}/{self.epochs})...")
+            batches = self._balanced_batches(epoch)
+            for i in range(batch, len(batches)):
+                rows = np.sort(batches[i])
+                model.partial_fit(self._features(rows), self.labels[rows], classes=classes)
+                if self.checkpoint_every and (i + 1) % self.checkpoint_every == 0:
+                    self._save_checkpoint(name, alpha, model, (epoch, i + 1))
+            epoch, batch = epoch + 1, 0
+            if epoch < self.epochs:
+                self._save_checkpoint(name, alpha, model, (epoch, batch))
+
+        self._remove_checkpoint(name)
+        self.models[name] = model
+
+    def save_artifact(self, root: str, metadata: dict) -> str:
+        """
+        Save every trained model as a versioned inference artifact.
+
+        Args:
+            root (str): The artifact root directory.
+            metadata (dict): Embedding model, data fingerprint and any other
+                information stored in the artifact manifest.
+
+        Returns:
+            str: The directory of the new artifact version.
+        """
+        return save_artifact(root, self.models, self.classes.tolist(), {
+            'embedding_dim': int(self.embeddings.shape[1]),
+            **metadata
+        }, compressor=self.compressor)
+
+    def evaluate(self, chunk_size: int = 8192) -> dict:
+        """
+        Evaluate all trained models on the test split, reading it in chunks.
+
+        Args:
+            chunk_size (int): Test rows scored at a time.
+
+        Returns:
+            dict: Evaluation metrics for each model.
+        """
+        y_test = self.labels[self.test_idx]
+        results = {}
+        for name, model in self.models.items():
+            y_pred, y_score = [], []
+            for start in range(0, len(self.test_idx), chunk_size):
+                x = self._features(self.test_idx[start:start + chunk_size])
+                labels, scores = predict_with_scores(model, x)
+                y_pred.append(labels)
+                y_score.append(scores)
+            results[name] = compute_metrics(
+                y_test, np.concatenate(y_pred), np.concatenate(y_score), self.classes,
+                probabilities=hasattr(model, 'predict_proba')
+            )
         return results
+
+    def _features(self, rows) -> np.ndarray:
+        """Read sorted rows of the store as (compressed) float32 classifier inputs."""
+        x = np.asarray(self.embeddings[rows], dtype=np.float32)
+        return x if self.compressor is None else self.compressor.transform(x)
+
+    def _balanced_batches(self, epoch: int) -> list:
+        """
+        Split one epoch into batches holding the same number of rows per class.
+
+        Smaller classes are reshuffled and repeated until every row of the
+        largest class has been used once. The order only depends on the seed
+        and the epoch, so a resumed epoch sees the same batches.
+        """
+        rng = np.random.default_rng([self.seed, epoch])
+        per_class = max(1, self.batch_size // len(self.class_idx))
+        largest = max(len(idx) for idx in self.class_idx)
+        n_batches = -(-largest // per_class)
+
+        columns = []
+        for idx in self.class_idx:
+            if len(idx) == 0:
+                continue
+            repeats = -(-n_batches * per_class // len(idx))
+            cycled = np.concatenate([rng.permutation(idx) for _ in range(repeats)])
+            columns.append(cycled[:n_batches * per_class].reshape(n_batches, per_class))
+        return list(np.concatenate(columns, axis=1))
+
+    def _checkpoint_path(self, name: str) -> str:
+        return os.path.join(self.checkpoint_dir, f"{name}.joblib")
+
+    def _checkpoint_key(self, alpha: float) -> dict:
+        """Settings a checkpoint must match to be resumed."""
+        return {'fingerprint': self.fingerprint, 'batch_size': self.batch_size,
+                'epochs': self.epochs, 'seed': self.seed, 'alpha': alpha,
+                'compression': self.compressor.settings if self.compressor else None}
+
+    def _load_checkpoint(self, name: str, alpha: float) -> tuple:
+        """Return (model, epoch, batch) from a matching checkpoint, or a fresh start."""
+        if not self.checkpoint_dir or not os.path.exists(self._checkpoint_path(name)):
+            return None, 0, 0
+        checkpoint = joblib.load(self._checkpoint_path(name))
+        if checkpoint['key'] != self._checkpoint_key(alpha):
+            print(f"Ignoring stale checkpoint for {name}")
+            return None, 0, 0
+        return checkpoint['model'], checkpoint['epoch'], checkpoint['batch']
+
+    def _remove_checkpoint(self, name: str):
+        """Remove the checkpoint of a finished model."""
+        if self.checkpoint_dir and os.path.exists(self._checkpoint_path(name)):
+            os.remove(self._checkpoint_path(name))
+
+    def _save_checkpoint(self, name: str, alpha: float, model, position: tuple):
+        """Atomically checkpoint a model at an (epoch, next batch) position."""
+        if not self.checkpoint_dir:
+            return
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        tmp_path = self._checkpoint_path(name) + ".tmp"
+        joblib.dump({'key': self._checkpoint_key(alpha), 'model': model,
+                     'epoch': position[0], 'batch': position[1]}, tmp_path)
+        os.replace(tmp_path, self._checkpoint_path(name))
+
+
+class _StoreRows:
+    """
+    Read-only view of some rows of a memory-mapped matrix.
+
+    Slicing it reads only the sliced rows, so Compressor.fit can stream
+    the training split chunk by chunk instead of copying it.
+    """
+
+    def __init__(self, matrix, rows: np.ndarray):
+        self.matrix = matrix
+        self.rows = rows
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __getitem__(self, index: slice) -> np.ndarray:
+        return self.matrix[self.rows[index]]
+
+    @property
+    def shape(self) -> tuple:
+        """tuple: The (rows, width) shape of the view."""
+        return (len(self.rows), self.matrix.shape[1])
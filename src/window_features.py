@@ -0,0 +1,449 @@
+"""
+Sliding-window feature module.
+
+This module keeps the header fields that parse_bgl_line drops (timestamp,
+node, type, component and level) in compact typed columns, and counts the
+recent events of every node and component in a single streaming pass over
+the log. Counts live in fixed-size ring buffers of time buckets, so each
+line costs amortized constant time however long the window is. The counts
+of the sampled lines are joined onto their embeddings for the classifiers.
+"""
+
+import io
+import os
+from array import array
+
+import numpy as np
+
+from src.data_loader import CONTENT_START_INDEX, LABEL_ANOMALY, LABEL_NORMAL
+from src.log_sources import detect_compression, open_decompressed
+
+# Levels whose events count towards the node_severe features
+SEVERE_LEVELS = frozenset(("FATAL", "FAILURE", "SEVERE", "ERROR"))
+# Ring buffer slots per window; counts are exact to window / WINDOW_BUCKETS seconds
+WINDOW_BUCKETS = 60
+# Header fields interned into integer codes, with their array type codes
+CODED_FIELDS = {'node': 'I', 'type': 'H', 'component': 'H', 'level': 'H'}
+# Counts computed per window, in feature column order
+WINDOW_COUNTS = ("node_events", "node_severe", "component_events")
+
+
+class LogColumns:
+    """
+    Header fields of every log line as typed arrays.
+
+    Timestamps are int64 epoch seconds and labels one byte; node, type,
+    component and level strings are interned into integer codes, so a
+    line costs 17 bytes however long its fields are.
+    """
+
+    def __init__(self):
+        self.timestamps = array('q')
+        self.labels = array('B')
+        self.codes = {field: array(typecode) for field, typecode in CODED_FIELDS.items()}
+        self.vocab = {field: {} for field in CODED_FIELDS}
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def append(self, parts: list, timestamp: int):
+        """
+        Append the header fields of a line.
+
+        Args:
+            parts (list): The line split on whitespace, at least up to the
+                level field.
+            timestamp (int): The line's epoch seconds.
+        """
+        self.timestamps.append(timestamp)
+        self.labels.append(LABEL_NORMAL if parts[0] == "-" else LABEL_ANOMALY)
+        for field, index in (('node', 3), ('type', 6), ('component', 7), ('level', 8)):
+            vocab = self.vocab[field]
+            self.codes[field].append(vocab.setdefault(parts[index], len(vocab)))
+
+    def names(self, field: str) -> list:
+        """
+        Get the strings of a coded field, indexed by code.
+
+        Args:
+            field (str): 'node', 'type', 'component' or 'level'.
+
+        Returns:
+            list: The distinct values in order of first appearance.
+        """
+        return list(self.vocab[field])
+
+    def save(self, path: str):
+        """
+        Write the columns to an ``.npz`` file.
+
+        Args:
+            path (str): The file to write.
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        arrays = {
+            'timestamps': np.frombuffer(self.timestamps, dtype=np.int64),
+            'labels': np.frombuffer(self.labels, dtype=np.uint8),
+        }
+        for field, codes in self.codes.items():
+            arrays[field] = np.frombuffer(codes, dtype=np.dtype(codes.typecode))
+            arrays[f"{field}_names"] = np.array(self.names(field), dtype=str)
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path: str) -> "LogColumns":
+        """
+        Read columns written by save().
+
+        Args:
+            path (str): The ``.npz`` file.
+
+        Returns:
+            LogColumns: The loaded columns.
+        """
+        columns = cls()
+        # pylint: disable=no-member
+        with np.load(path) as arrays:
+            columns.timestamps.frombytes(arrays['timestamps'].tobytes())
+            columns.labels.frombytes(arrays['labels'].tobytes())
+            for field, codes in columns.codes.items():
+                codes.frombytes(arrays[field].tobytes())
+                columns.vocab[field] = {str(name): code for code, name
+                                        in enumerate(arrays[f"{field}_names"])}
+        return columns
+
+
+class SlidingWindowCounter:  # pylint: disable=too-few-public-methods
+    """
+    Per-key event counts over a sliding time window.
+
+    Every key owns a ring buffer of WINDOW_BUCKETS time buckets and a
+    running total. Moving a key forward in time only clears the buckets
+    that fell out of its window, and a key idle for a whole window is reset
+    in one step, so updates take amortized constant time.
+    """
+
+    def __init__(self, window: int, buckets: int = WINDOW_BUCKETS):
+        """
+        Args:
+            window (int): Window length in seconds.
+            buckets (int): Ring buffer slots; the window moves in steps of
+                window / buckets seconds (at least one second).
+        """
+        self.window = window
+        self.resolution = max(window // buckets, 1)
+        self.buckets = -(-window // self.resolution)
+        self._empty = array('I', bytes(4 * self.buckets))
+        self._rings = []
+        self._totals = []
+        # Latest bucket of every key, -1 before its first event
+        self._heads = []
+
+    def add(self, key: int, timestamp: int, amount: int = 1) -> int:
+        """
+        Count events of a key and get its count over the window.
+
+        Args:
+            key (int): The key code, e.g. an interned node.
+            timestamp (int): The event time in epoch seconds. Events older
+                than the key's latest one count as the latest.
+            amount (int): Events to add; 0 only reads the count.
+
+        Returns:
+            int: The key's events in the window ending at the timestamp.
+        """
+        if key >= len(self._heads):
+            grow = max(key + 1, 2 * len(self._heads)) - len(self._heads)
+            self._rings.extend([None] * grow)
+            self._totals.extend([0] * grow)
+            self._heads.extend([-1] * grow)
+
+        bucket = timestamp // self.resolution
+        head = self._heads[key]
+        if bucket > head:
+            ring = self._rings[key]
+            if ring is None or bucket - head >= self.buckets:
+                # First event, or idle for a whole window: start empty
+                self._rings[key] = self._empty * 1
+                self._totals[key] = 0
+            else:
+                total = self._totals[key]
+                for expired in range(head + 1, bucket + 1):
+                    slot = expired % self.buckets
+                    total -= ring[slot]
+                    ring[slot] = 0
+                self._totals[key] = total
+            self._heads[key] = head = bucket
+
+        if not amount:
+            return self._totals[key]
+        self._rings[key][head % self.buckets] += amount
+        total = self._totals[key] + amount
+        self._totals[key] = total
+        return total
+
+
+class WindowFeatures:
+    """
+    Window counts of a dataset's samples, one row per sample.
+    """
+
+    def __init__(self, counts: np.ndarray, names: list, windows: list, lines: int = None):
+        """
+        Args:
+            counts (np.ndarray): (samples, features) event counts.
+            names (list): The name of every feature column.
+            windows (list): The window length in seconds of every column.
+            lines (int): Log lines counted to compute them, if known.
+        """
+        self.counts = counts
+        self.names = list(names)
+        self.windows = list(windows)
+        self.lines = lines
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def save(self, path: str):
+        """
+        Write the features to an ``.npz`` file.
+
+        Args:
+            path (str): The file to write.
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez(path, counts=self.counts, names=np.array(self.names, dtype=str),
+                 windows=np.array(self.windows))
+
+    @classmethod
+    def load(cls, path: str) -> "WindowFeatures":
+        """
+        Read features written by save().
+
+        Args:
+            path (str): The ``.npz`` file.
+
+        Returns:
+            WindowFeatures: The loaded features.
+        """
+        with np.load(path) as arrays:
+            # pylint: disable-next=no-member
+            return cls(arrays['counts'], arrays['names'].tolist(), arrays['windows'].tolist())
+
+
+class WindowTracker:
+    """
+    Sliding-window counts of a stream of BGL lines.
+
+    For each window the counts of a line are the events of its node, the
+    node's events at a SEVERE_LEVELS level and the events of its
+    component, each including the line itself.
+    """
+
+    def __init__(self, windows: tuple = (60, 3600), vocab: dict = None):
+        """
+        Args:
+            windows (tuple): Window lengths in seconds.
+            vocab (dict): 'node' and 'component' dictionaries interning
+                names into codes, e.g. LogColumns.vocab, or None for new ones.
+        """
+        self.windows = tuple(windows)
+        vocab = vocab if vocab is not None else {'node': {}, 'component': {}}
+        self.nodes = vocab['node']
+        self.components = vocab['component']
+        self._counters = [
+            tuple(SlidingWindowCounter(window) for _ in WINDOW_COUNTS) for window in windows
+        ]
+        self.timestamp = 0
+
+    @property
+    def names(self) -> list:
+        """list: The feature column names, e.g. 'node_events_60s'."""
+        return [f"{count}_{window}s" for window in self.windows for count in WINDOW_COUNTS]
+
+    @property
+    def column_windows(self) -> list:
+        """list: The window length of every feature column."""
+        return [window for window in self.windows for _ in WINDOW_COUNTS]
+
+    def update(self, parts: list, counts: bool = True) -> list:
+        """
+        Count a line.
+
+        Args:
+            parts (list): The line split on whitespace, at least up to the
+                level field. A timestamp that is not a number repeats the
+                previous line's.
+            counts (bool): Return the line's counts; without them, severe
+                counters are only touched by severe lines.
+
+        Returns:
+            list: The line's counts in column order, or None.
+        """
+        if parts[1].isdigit():
+            self.timestamp = int(parts[1])
+        timestamp = self.timestamp
+        node = self.nodes.setdefault(parts[3], len(self.nodes))
+        component = self.components.setdefault(parts[7], len(self.components))
+        severe = parts[8] in SEVERE_LEVELS
+
+        row = [] if counts else None
+        for node_counter, severe_counter, component_counter in self._counters:
+            node_events = node_counter.add(node, timestamp)
+            component_events = component_counter.add(component, timestamp)
+            if counts:
+                row += (node_events, severe_counter.add(node, timestamp, int(severe)),
+                        component_events)
+            elif severe:
+                # Other lines leave severe counts alone; reads catch up lazily
+                severe_counter.add(node, timestamp)
+        return row
+
+
+def _open_text(file_path: str):
+    """Open a plain or compressed log in text mode, as the text parse engine reads it."""
+    compression = detect_compression(file_path)
+    if compression is None:
+        return open(file_path, "r", encoding="utf-8", errors="ignore")
+    return io.TextIOWrapper(open_decompressed(file_path, compression), encoding="utf-8",
+                            errors="ignore")
+
+
+def extract_window_features(files: list, dataset: list, windows: tuple = (60, 3600),
+                            columns: LogColumns = None) -> WindowFeatures:
+    """
+    Count recent node and component events for the samples of a dataset.
+
+    The log is read once. Every line updates a WindowTracker (and is
+    appended to the columns, if given); a sample takes the counts of the
+    first line with its text, which is the line load_bgl_data kept.
+
+    Args:
+        files (list): The log files, in order, plain or compressed.
+        dataset (list): Parsed log dictionaries with 'text'.
+        windows (tuple): Window lengths in seconds.
+        columns (LogColumns): Columns to append every line's header
+            fields to, or None.
+
+    Returns:
+        WindowFeatures: One row of counts per sample.
+    """
+    tracker = WindowTracker(windows, columns.vocab if columns is not None else None)
+    rows = {sample['text']: row for row, sample in enumerate(dataset)}
+    counts = np.zeros((len(dataset), len(tracker.names)), dtype=np.uint32)
+    lines = 0
+
+    for file_path in files:
+        with _open_text(file_path) as file:
+            for line in file:
+                parts = line.split(None, CONTENT_START_INDEX)
+                if len(parts) <= CONTENT_START_INDEX:
+                    continue
+                lines += 1
+                content = parts[CONTENT_START_INDEX].rstrip()
+                # Same whitespace normalization as parse_bgl_line
+                if "  " in content or not content.isprintable():
+                    content = " ".join(content.split())
+                row = rows.pop(content, None)
+
+                line_counts = tracker.update(parts, counts=row is not None)
+                if row is not None:
+                    counts[row] = line_counts
+                if columns is not None:
+                    columns.append(parts, tracker.timestamp)
+
+    if rows:
+        print(f"  Warning: {len(rows)} samples were not found in the log; their counts are 0")
+    print(f"  Counted {lines} lines from {len(tracker.nodes)} nodes and "
+          f"{len(tracker.components)} components")
+    return WindowFeatures(counts, tracker.names, tracker.column_windows, lines)
+
+
+class FeatureJoiner:
+    """
+    Appends window features to embedding rows.
+
+    Counts become log-scaled events per minute, standardized with the
+    statistics of the training split and scaled to the average spread of
+    an embedding dimension, so each feature weighs about as much as one
+    embedding dimension (times ``weight``).
+    """
+
+    def __init__(self, names: list, windows: list, weight: float = 1.0):
+        """
+        Args:
+            names (list): The feature column names.
+            windows (list): The window length in seconds of every column.
+            weight (float): Extra scale applied to every feature.
+        """
+        self.names = list(names)
+        self.windows = list(windows)
+        self.weight = weight
+        self.mean = None
+        self.scale = None
+
+    @property
+    def settings(self) -> dict:
+        """dict: Everything transform() needs, as JSON-serializable values."""
+        return {'names': self.names, 'windows': self.windows, 'weight': self.weight,
+                'mean': self.mean.tolist(), 'scale': self.scale.tolist()}
+
+    @classmethod
+    def from_settings(cls, settings: dict) -> "FeatureJoiner":
+        """
+        Restore a fitted joiner.
+
+        Args:
+            settings (dict): The settings of a fitted joiner.
+
+        Returns:
+            FeatureJoiner: The restored joiner.
+        """
+        joiner = cls(settings['names'], settings['windows'], settings['weight'])
+        joiner.mean = np.asarray(settings['mean'])
+        joiner.scale = np.asarray(settings['scale'])
+        return joiner
+
+    def _rates(self, counts) -> np.ndarray:
+        counts = np.asarray(counts, dtype=np.float64)
+        return np.log1p(counts * 60.0 / np.asarray(self.windows, dtype=np.float64))
+
+    def fit(self, embeddings: np.ndarray, counts) -> "FeatureJoiner":
+        """
+        Fit the scaling on the training split.
+
+        Args:
+            embeddings (np.ndarray): The training embeddings (as the
+                classifiers see them).
+            counts: The training rows' window counts.
+
+        Returns:
+            FeatureJoiner: self.
+        """
+        rates = self._rates(counts)
+        spread = float(np.asarray(embeddings, dtype=np.float64).std(axis=0).mean())
+        std = rates.std(axis=0)
+        self.mean = rates.mean(axis=0)
+        self.scale = np.where(std > 0, spread * self.weight / np.where(std > 0, std, 1), 0.0)
+        return self
+
+    def transform(self, embeddings: np.ndarray, counts) -> np.ndarray:
+        """
+        Append the scaled features to the embeddings.
+
+        Args:
+            embeddings (np.ndarray): One embedding per row.
+            counts: One row of window counts per embedding.
+
+        Returns:
+            np.ndarray: The joined rows, in the embeddings' float type.
+
+        Raises:
+            ValueError: If the counts do not match the embeddings or columns.
+        """
+        counts = np.asarray(counts)
+        if counts.shape != (len(embeddings), len(self.names)):
+            raise ValueError(f"Expected {len(embeddings)} rows of {len(self.names)} window "
+                             f"features, got shape {counts.shape}")
+        features = (self._rates(counts) - self.mean) * self.scale
+        return np.hstack([embeddings, features.astype(embeddings.dtype)])
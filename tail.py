@@ -0,0 +1,11 @@
+"""
+Live classification entry point for the sysadmin log classifier POC.
+
+Follows a growing BGL-format log and emits anomalies as JSON lines.
+"""
+
+from src.live import main
+
+
+if __name__ == "__main__":
+    main()